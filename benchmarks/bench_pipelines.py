@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmarks for the ETL pipelines.
+
+Each pipeline (notes, loans, owned listings, payments) is run against a local
+`mock_prosper_server` at several portfolio sizes and concurrency levels. Every case runs
+in a fresh child process so peak RSS and CPU time belong to that case alone. Results
+(pages/s, rows/s, peak RSS, output bytes, CPU and per-stage seconds) are appended as one
+JSON object per case to the output file, so runs can be compared over time.
+
+Concurrency: payments batches are split across that many threads; the other pipelines
+run that many simultaneous pulls against the server. `--workers` sets the in-flight page
+requests of each pull (see page_pipeline).
+
+`--transports` repeats every case with each http transport (see prosper_etl/http_transport.py);
+the protocol actually negotiated is recorded as `http_version`. The mock server speaks
+HTTP/1.1 only, so there httpx-h2 measures the httpx client without multiplexing.
+
+usage: python -m benchmarks.bench_pipelines [--sizes 200 2000] [--concurrency 1 4] [--pipelines notes payments]
+                                            [--latency 0.02] [--transports requests httpx-h2] [--workers 8]
+                                            [--output bench_results.jsonl]
+(from the repository root, or anywhere with the package installed)
+"""
+
+import os, sys, json, time, argparse, subprocess, tempfile, threading, platform, resource
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+PIPELINES = ('notes', 'loans', 'listings', 'payments')
+PAYMENTS_BATCH_SIZE = 25  # same as prosper_payments_ETL.py
+FAKE_CREDS = {'P2P_USER': 'eA==', 'P2P_PASSWORD': 'eA==', 'P2P_ID': 'eA==', 'P2P_SECRET': 'eA=='}
+
+
+# child: run one case
+#====================
+def _pipeline_jobs(pipeline, out_dir, concurrency, loan_numbers, workers=None):
+    '''Return a list of zero-argument callables, one per thread.'''
+    from prosper_etl import prosper_api_tools, column_schemas
+    from prosper_etl import listings_attributes as atts
+    tokens = prosper_api_tools.initiate_conn().json()
+    jobs = []
+    if pipeline == 'payments':
+        batches = [loan_numbers[i:i + PAYMENTS_BATCH_SIZE] for i in range(0, len(loan_numbers), PAYMENTS_BATCH_SIZE)]
+        for t in range(concurrency):
+            fpath = os.path.join(out_dir, f'payments_{t}.bz2')
+            mine = batches[t::concurrency]
+            def job(fpath=fpath, mine=mine):
+                for b in mine:
+                    prosper_api_tools.get_many_payments(
+                        fpath, tokens, loan_number=','.join(b), column_schema=column_schemas.payments_columns,
+                        workers=workers
+                    )
+            jobs.append(job)
+        return jobs
+    for t in range(concurrency):
+        fpath = os.path.join(out_dir, f'{pipeline}_{t}.bz2')
+        if pipeline == 'notes':
+            jobs.append(lambda fpath=fpath: prosper_api_tools.get_many_notes(
+                fpath, tokens, column_schema=column_schemas.notes_columns, workers=workers))
+        elif pipeline == 'loans':
+            jobs.append(lambda fpath=fpath: prosper_api_tools.get_many_loans(
+                fpath, tokens, column_schema=column_schemas.loans_columns, workers=workers))
+        elif pipeline == 'listings':
+            columns = list(set(atts.top_level_atributes) - set(atts.top_level_deprecated))
+            jobs.append(lambda fpath=fpath: prosper_api_tools.get_all_owned_listings(
+                fpath, tokens, column_schema=columns, workers=workers))
+    return jobs
+
+def run_case(pipeline, base_url, concurrency, loan_numbers, result_file, transport='requests', workers=None):
+    '''Run one pipeline in this process and write its measurements to `result_file`.'''
+    os.environ.update(FAKE_CREDS)
+    os.environ['PROSPER_API_BASE_URL'] = base_url
+    os.environ['PROSPER_TOKEN_CACHE'] = 'off'
+    os.environ['PROSPER_HTTP_CACHE'] = 'off'  # (every case pays for full responses)
+    os.environ['PROSPER_PAYMENTS_CACHE'] = 'off'  # (and for every payments window)
+    from prosper_etl import prosper_api_tools, metrics, http_transport
+    prosper_api_tools.BASE_URL = base_url
+    prosper_api_tools.set_transport(transport)
+    sys.stdout = open(os.devnull, 'w')  # silence the progress counters
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        jobs = _pipeline_jobs(pipeline, out_dir, concurrency, loan_numbers, workers)
+        probe = prosper_api_tools._get_transport().request('GET', base_url + '/')
+        metrics.reset()
+        cpu0 = time.process_time()
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=j) for j in jobs]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        wall = time.perf_counter() - t0
+        cpu = time.process_time() - cpu0
+        out_bytes = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+
+    summ = metrics.summary()
+    pages = sum(r['count'] for ep, r in summ['requests'].items())
+    result = {
+        'wall_seconds': round(wall, 4),
+        'cpu_seconds': round(cpu, 4),
+        'pages': pages,
+        'rows': summ['rows'],
+        'pages_per_second': round(pages / wall, 3) if wall else None,
+        'rows_per_second': round(summ['rows'] / wall, 3) if wall else None,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'output_bytes': out_bytes,
+        'bytes_received': summ['bytes_received'],
+        'stage_seconds': summ['stage_seconds'],
+        'retries': summ['counters'].get('retries', 0),
+        'http_version': http_transport.http_version(probe),
+    }
+    with open(result_file, 'w') as f:
+        json.dump(result, f)
+
+
+# parent: drive the cases
+#========================
+def run_suite(
+        sizes, concurrency_levels, pipelines, latency=0.0, seed=0, output=None, transports=('requests',), workers=None
+    ):
+    '''Run every (size, pipeline, concurrency, transport) case; returns the list of result
+    dicts and appends them to `output` as JSON lines.'''
+    from prosper_etl import mock_prosper_server as mock
+    run_id = time.strftime('%Y%m%dT%H%M%S')
+    git_rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                             capture_output=True, text=True).stdout.strip()
+    child = [sys.executable, '-m', __spec__.name] if __spec__ else [sys.executable, __file__]  # (as we were started)
+    results = []
+    for size in sizes:
+        portfolio = mock.make_portfolio(size, seed)
+        loan_numbers = [str(l['loan_number']) for l in sorted(portfolio['loans'], key=lambda l: l['origination_date'])]
+        server, base_url = mock.start_server(mock.MockState(portfolio, latency=latency))
+        try:
+            for pipeline in pipelines:
+                for conc in concurrency_levels:
+                    for transport in transports:
+                        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as tf:
+                            result_file = tf.name
+                        spec = json.dumps([pipeline, base_url, conc, loan_numbers, result_file, transport, workers])
+                        subprocess.run(child + ['--case', spec], check=True)
+                        with open(result_file) as f:
+                            res = json.load(f)
+                        os.remove(result_file)
+                        res = dict({
+                            'run_id': run_id, 'git_rev': git_rev, 'python': platform.python_version(),
+                            'pipeline': pipeline, 'portfolio_loans': size, 'concurrency': conc,
+                            'server_latency': latency, 'transport': transport, 'workers': workers,
+                        }, **res)
+                        results.append(res)
+                        print(f"{pipeline:9s} loans={size:<7d} conc={conc:<3d} {transport:9s} {res['http_version']:9s}"
+                              f"{res['wall_seconds']:8.2f}s {res['pages_per_second']:9.1f} pages/s "
+                              f"{res['rows_per_second']:10.1f} rows/s rss={res['peak_rss_kb'] // 1024}MB")
+        finally:
+            server.shutdown()
+    if output:
+        with open(output, 'a') as f:
+            for res in results:
+                f.write(json.dumps(res) + '\n')
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ETL pipelines against a local mock API.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 2000], help='portfolio sizes (loans)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--pipelines', nargs='+', choices=PIPELINES, default=list(PIPELINES))
+    parser.add_argument('--latency', type=float, default=0.0, help='mock server delay per request (seconds)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--transports', nargs='+', choices=['requests', 'httpx', 'httpx-h2'], default=['requests'],
+                        help='http transports to compare (see prosper_etl/http_transport.py)')
+    parser.add_argument('--workers', type=int, default=None, help='in-flight page requests per pull')
+    parser.add_argument('--output', default=os.path.join(BASE_DIR, 'bench_results.jsonl'))
+    parser.add_argument('--case', help=argparse.SUPPRESS)  # internal: run one case in this process
+    args = parser.parse_args()
+    if args.case:
+        run_case(*json.loads(args.case))
+        return
+    run_suite(args.sizes, args.concurrency, args.pipelines, args.latency, args.seed, args.output,
+              args.transports, args.workers)
+    print(f'results appended to {args.output}')
+
+if __name__ == '__main__':
+    main()
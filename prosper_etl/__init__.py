@@ -0,0 +1,31 @@
+"""
+The Prosper ETL tools as an importable library.
+
+Importing `prosper_etl` imports none of its modules; nothing is pulled, logged or read, and
+heavy dependencies (pandas, keyring) are imported by the functions that use them. Modules
+are loaded on first attribute access (or imported as usual, `from prosper_etl import datasets`):
+
+    import prosper_etl
+    api = prosper_etl.prosper_api_tools
+    tokens = api.get_tokens()
+    api.get_many_notes('mynotes.bz2', tokens, column_schema=prosper_etl.column_schemas.notes_columns)
+
+The command line entry point is `prosper-etl` (see `prosper_etl.cli`).
+"""
+
+import importlib
+
+MODULES = (
+    'prosper_api_tools', 'creds', 'token_cache', 'http_transport', 'http_cache', 'util_funcs', 'metrics',
+    'page_pipeline', 'payment_windows', 'workload_plan', 'datasets', 'bz2_reader', 'partitions', 'compaction',
+    'row_hashes', 'snapshot_diff', 'jsonl_stream', 'balance_panel', 'reconcile', 'synthetic_data',
+    'mock_prosper_server', 'column_schemas', 'listings_attributes', 'run_all_ETL',
+)
+
+def __getattr__(name):
+    if name in MODULES:
+        return importlib.import_module(f'.{name}', __name__)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+def __dir__():
+    return sorted(list(globals()) + list(MODULES))
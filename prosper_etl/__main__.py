@@ -0,0 +1,4 @@
+import sys
+from prosper_etl.cli import main
+
+sys.exit(main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Monthly per-note balance panel.
+
+One row per owned note and month, from the note's origination month until its loan is paid
+down to zero (or the last month in the data), with:
+    principal_balance_cents   loan's `resulting_principal_balance` at the end of the month
+    interest_received_cents   sum of the loan's `interest_amount` paid in the month
+    days_past_due             loan's `post_days_past_due` at the end of the month
+scaled to the note's ownership share (`note_ownership_amount / amount_borrowed`).
+Months without a payment carry the last balance and days past due forward.
+
+The panel is built with sorted-array operations only (lexsort, reduceat, searchsorted)
+rather than a pandas groupby/apply per note, and written as a compressed columnar `.npz`
+(or `.parquet` if the output path says so and pyarrow is installed).
+
+usage: python -m prosper_etl.balance_panel [--data-dir data] [--output panel.npz] [--end-month 2020-06]
+"""
+
+import os, logging, argparse, time
+import numpy as np
+from . import datasets
+
+PANEL_COLUMNS = ['loan_note_id', 'loan_number', 'month', 'principal_balance_cents', 'interest_received_cents', 'days_past_due']
+_M = 12 * 10000  # month indexes (year * 12 + month - 1) are below this
+
+
+def _month_index(dates):
+    '''Month index (year * 12 + month - 1) of each ISO date string, -1 where missing, and the
+    sorted date codes (for chronological ordering). Dates are parsed once per distinct value.'''
+    from pandas import factorize
+    codes, uniques = factorize(dates, sort=True)
+    um = np.array([int(u[:4]) * 12 + int(u[5:7]) - 1 for u in uniques.astype(str)], dtype=np.int64)
+    months = np.where(codes >= 0, um[codes] if len(um) else -1, -1)
+    return months, codes
+
+def _month_label(m):
+    '''Month index -> yyyymm int.'''
+    return (m // 12) * 100 + m % 12 + 1
+
+def _ints(series, fill=0):
+    return series.fillna(fill).to_numpy(dtype=np.int64)
+
+def build_panel(payments, notes, end_month=None):
+    '''Build the panel (dict of column -> array, see `PANEL_COLUMNS`) from a payments frame
+    (loan_number, transaction_id, transaction_effective_date, interest_amount,
+    resulting_principal_balance, post_days_past_due; money in cents) and a notes frame
+    (loan_note_id, loan_number, origination_date, note_ownership_amount, amount_borrowed;
+    money in cents). `end_month` is 'yyyy-mm' (default: the last payment month).'''
+    payments = payments[payments['resulting_principal_balance'].notna()]
+
+    # loan-month records: the last balance/dpd and the interest sum of each loan and month
+    loans_u, loan_idx = np.unique(payments['loan_number'].to_numpy(dtype=np.int64), return_inverse=True)
+    month, date_code = _month_index(payments['transaction_effective_date'])
+    order = np.lexsort((_ints(payments['transaction_id']), date_code, loan_idx))
+    key = loan_idx[order].astype(np.int64) * _M + month[order]
+    bal = _ints(payments['resulting_principal_balance'])[order]
+    dpd = _ints(payments['post_days_past_due'])[order]
+    interest = _ints(payments['interest_amount'])[order]
+    if not len(key):  # (a sentinel record that matches no loan keeps the lookups below simple)
+        key, bal, dpd, interest = (np.array([v], dtype=np.int64) for v in (-1, 1, 0, 0))
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    ends = np.r_[starts[1:], len(key)] - 1
+    rec_key, rec_bal, rec_dpd = key[starts], bal[ends], dpd[ends]
+    rec_int = np.add.reduceat(interest, starts)
+    rec_loan = rec_key // _M
+
+    # first month each loan is paid down to zero (the panel stops there)
+    zero = rec_bal <= 0
+    zero_month = np.full(len(loans_u), np.iinfo(np.int64).max, dtype=np.int64)
+    zl, zi = np.unique(rec_loan[zero], return_index=True)
+    zero_month[zl] = (rec_key[zero] % _M)[zi]
+
+    # note-month grid
+    if end_month:
+        last = int(end_month[:4]) * 12 + int(end_month[5:7]) - 1
+    else:
+        last = int(month.max()) if len(month) else int(_month_index(notes['origination_date'])[0].max(initial=0))
+    note_loan = notes['loan_number'].to_numpy(dtype=np.int64)
+    pos = np.searchsorted(loans_u, note_loan)
+    has_pay = pos < len(loans_u)
+    has_pay[has_pay] = loans_u[pos[has_pay]] == note_loan[has_pay]
+    pos = np.where(has_pay, pos, -1)
+    start, _ = _month_index(notes['origination_date'])
+    stop = np.where(has_pay, np.minimum(last, zero_month[np.maximum(pos, 0)]), last)
+    lengths = np.maximum(stop - start + 1, 0)
+    lengths[start < 0] = 0
+    total = int(lengths.sum())
+    g_note = np.repeat(np.arange(len(notes)), lengths)
+    g_month = np.repeat(start, lengths) + (np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths))
+    g_loan = pos[g_note]
+
+    # as-of lookup of each grid row's latest loan-month record
+    g_key = g_loan * _M + g_month
+    idx = np.searchsorted(rec_key, g_key, side='right') - 1
+    safe = np.maximum(idx, 0)
+    found = (idx >= 0) & (g_loan >= 0) & (rec_loan[safe] == g_loan)
+    exact = found & (rec_key[safe] == g_key)
+    amount = _ints(notes['amount_borrowed'])
+    loan_bal = np.where(found, rec_bal[safe], amount[g_note])  # (before the first payment: the amount borrowed)
+    loan_int = np.where(exact, rec_int[safe], 0)
+    g_dpd = np.where(found, rec_dpd[safe], 0)
+
+    share = _ints(notes['note_ownership_amount']) / np.maximum(amount, 1)
+    g_share = share[g_note]
+    return {
+        'loan_note_id': notes['loan_note_id'].to_numpy(dtype=str)[g_note],
+        'loan_number': note_loan[g_note],
+        'month': _month_label(g_month).astype(np.int32),
+        'principal_balance_cents': np.rint(loan_bal * g_share).astype(np.int64),
+        'interest_received_cents': np.rint(loan_int * g_share).astype(np.int64),
+        'days_past_due': g_dpd.astype(np.int32),
+    }
+
+def build_from_files(data_dir=None, end_month=None, processes=None):
+    '''Read payments and notes (money as cents) and build the panel.'''
+    payments = datasets.read_all(
+        'payments', data_dir=data_dir, cents=True, processes=processes,
+        columns=['loan_number', 'transaction_id', 'transaction_effective_date', 'interest_amount',
+                 'resulting_principal_balance', 'post_days_past_due'],
+    )
+    notes = datasets.read_all(
+        'notes', data_dir=data_dir, cents=True, latest=True,
+        columns=['loan_note_id', 'loan_number', 'origination_date', 'note_ownership_amount', 'amount_borrowed'],
+    )
+    return build_panel(payments, notes, end_month)
+
+def write_panel(panel, fpath):
+    '''Write the panel columns to `fpath` (.npz, or .parquet with pyarrow installed).'''
+    if fpath.endswith('.parquet'):
+        from pandas import DataFrame
+        DataFrame(panel).to_parquet(fpath, index=False)
+    else:
+        np.savez_compressed(fpath, **panel)
+
+def read_panel(fpath):
+    '''Read a panel written by `write_panel` as a DataFrame.'''
+    from pandas import DataFrame, read_parquet
+    if fpath.endswith('.parquet'):
+        return read_parquet(fpath)
+    with np.load(fpath, allow_pickle=False) as z:
+        return DataFrame({c: z[c] for c in PANEL_COLUMNS})
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the monthly per-note balance panel.')
+    parser.add_argument('--data-dir', default=None)
+    parser.add_argument('--output', default=None, help='panel file (default: <data>/mynotes/note_month_panel.npz)')
+    parser.add_argument('--end-month', default=None, help="last month 'yyyy-mm' (default: last payment month)")
+    parser.add_argument('--processes', type=int, default=None, help='parallel bz2 decompression of payments')
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s:%(levelname)s:%(message)s', level=logging.INFO)
+    output = args.output or os.path.join(args.data_dir or datasets.DATA_DIR, 'mynotes', 'note_month_panel.npz')
+    t0 = time.time()
+    panel = build_from_files(args.data_dir, args.end_month, args.processes)
+    write_panel(panel, output)
+    print(f'{len(panel["month"])} note-months written to {output} in {time.time() - t0:.1f}s')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Readers for the csv files written by `util_funcs.write_response_to_disk`.
+
+Every page written by the ETL scripts is appended as its own bz2 stream, so an output
+file (or its `.bak` copy) is a concatenation of independent streams. These functions
+find the stream boundaries and decompress/parse groups of streams in a process pool,
+yielding DataFrame chunks in file order.
+"""
+
+import bz2, io, logging, mmap, os, re
+from concurrent.futures import ProcessPoolExecutor
+
+# a stream header ('BZh' + block size) is always followed by either the first block
+# magic (pi) or the end-of-stream magic (sqrt(pi)) for an empty stream
+STREAM_HEADER = re.compile(rb'BZh[1-9](?:1AY&SY|\x17rE8P\x90)')
+
+
+# locate streams
+#===============
+def find_stream_offsets(file_path):
+    '''Return the byte offsets where each bz2 stream in `file_path` starts.'''
+    if os.path.getsize(file_path) == 0:
+        return []
+    with open(file_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            offsets = [m.start() for m in STREAM_HEADER.finditer(mm)]
+    if not offsets or offsets[0] != 0:
+        raise ValueError(f'{file_path} does not start with a bz2 stream')
+    return offsets
+
+def group_streams(offsets, file_size, chunk_bytes=1 << 22):
+    '''Group consecutive streams into (start, end) byte ranges of roughly `chunk_bytes`
+    compressed bytes each. One page per task is too small to be worth a process hop.'''
+    segments = []
+    if not offsets:
+        return segments
+    start = offsets[0]
+    for off in offsets[1:]:
+        if off - start >= chunk_bytes:
+            segments.append((start, off))
+            start = off
+    segments.append((start, file_size))
+    return segments
+
+def read_header(file_path):
+    '''Return the csv header (column names) from the first stream of `file_path`.'''
+    with bz2.open(file_path, 'rt') as f:
+        line = f.readline()
+    from pandas import read_csv
+    return list(read_csv(io.StringIO(line), nrows=0).columns)
+
+
+# parse streams
+#==============
+def _parse_segment(file_path, start, end, names, read_csv_kwargs):
+    '''Decompress the streams in bytes [start, end) of `file_path` and parse them as csv.
+    Runs in a worker process.'''
+    from pandas import read_csv
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        raw = bz2.decompress(f.read(end - start))
+    skiprows = 1 if start == 0 else None  # header lives in the first stream only
+    return read_csv(io.BytesIO(raw), header=None, names=names, skiprows=skiprows, **read_csv_kwargs)
+
+def read_bz2_chunks(file_path, processes=None, chunk_bytes=1 << 22, prefetch=2, **read_csv_kwargs):
+    '''Yield DataFrame chunks of a multi-stream bz2 csv file, in file order.
+    Stream groups are decompressed and parsed in parallel across `processes` workers
+    (default: cpu count). At most `prefetch` * `processes` chunks are held in memory.
+    Extra keyword arguments are passed to `pandas.read_csv` (e.g. `usecols`, `dtype`).'''
+    offsets = find_stream_offsets(file_path)
+    if not offsets:
+        return
+    names = read_header(file_path)
+    segments = group_streams(offsets, os.path.getsize(file_path), chunk_bytes)
+    logging.debug(f'{file_path}: {len(offsets)} bz2 streams in {len(segments)} segments')
+    if len(segments) == 1 or processes == 1:
+        for start, end in segments:
+            yield _parse_segment(file_path, start, end, names, read_csv_kwargs)
+        return
+    processes = processes or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        pending = []
+        segs = iter(segments)
+        for start, end in segs:
+            pending.append(pool.submit(_parse_segment, file_path, start, end, names, read_csv_kwargs))
+            if len(pending) >= prefetch * processes:
+                break
+        while pending:
+            chunk = pending.pop(0).result()
+            nxt = next(segs, None)
+            if nxt:
+                pending.append(pool.submit(_parse_segment, file_path, nxt[0], nxt[1], names, read_csv_kwargs))
+            yield chunk
+
+def read_bz2_file(file_path, processes=None, **read_csv_kwargs):
+    '''Read a whole multi-stream bz2 csv file into one DataFrame using parallel decompression.
+    Falls back to a single-threaded `read_csv` if the streams can't be split.'''
+    from pandas import concat, read_csv
+    try:
+        chunks = list(read_bz2_chunks(file_path, processes=processes, **read_csv_kwargs))
+    except (ValueError, OSError, EOFError) as e:
+        logging.warning(f'parallel read of {file_path} failed ({str(e)}); reading single-threaded')
+        return read_csv(file_path, compression='bz2', **read_csv_kwargs)
+    if not chunks:
+        return read_csv(file_path, compression='bz2', **read_csv_kwargs)
+    return concat(chunks, ignore_index=True)
@@ -0,0 +1,56 @@
+"""
+Single command line entry point for the ETL scripts and tools.
+
+usage: prosper-etl <command> [command args]   (or: python -m prosper_etl <command> ...)
+
+Each command runs the `main()` of the corresponding script or tool with the remaining
+arguments, e.g. `prosper-etl all --workers 4` is `python -m prosper_etl.run_all_ETL --workers 4`.
+Only the chosen command's module is imported.
+"""
+
+import sys, importlib
+
+# command: (module, description)
+COMMANDS = {
+    'loans': ('prosper_owned_loans_ETL', 'pull owned loans to data/myloans/myloans.bz2'),
+    'notes': ('prosper_notes_ETL', 'pull owned notes to data/mynotes/mynotes.bz2'),
+    'listings': ('prosper_owned_listing_data_ETL', 'pull (or --backfill) owned listings'),
+    'payments': ('prosper_payments_ETL', 'pull payments of the loans in myloans.bz2'),
+    'all': ('run_all_ETL', 'run the pipelines together as one DAG'),
+    'profile': ('profile_ETL', 'run an ETL script under cProfile'),
+    'stream': ('jsonl_stream', 'stream loans/notes/listings/payments as JSON lines'),
+    'diff': ('snapshot_diff', 'diff two notes/loans snapshots'),
+    'panel': ('balance_panel', 'build the monthly per-note balance panel'),
+    'plan': ('workload_plan', 'size a pull with limit=1 probes and print the work plan and ETA'),
+    'reconcile': ('reconcile', 'reconcile payments against the loans and notes snapshots'),
+    'compact': ('compaction', 'merge, dedupe and sort ETL outputs'),
+    'partition': ('partitions', 'build month partitions of ETL outputs'),
+    'synthetic': ('synthetic_data', 'generate a synthetic portfolio'),
+    'mock-server': ('mock_prosper_server', 'serve a mock Prosper API'),
+}
+
+def usage():
+    lines = ['usage: prosper-etl <command> [args]', '', 'commands:']
+    lines += [f'  {name:<12} {desc}' for name, (_, desc) in COMMANDS.items()]
+    lines += ['', 'run `prosper-etl <command> --help` for the arguments of a command']
+    return '\n'.join(lines)
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        return 0
+    command, args = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f'unknown command: {command}\n\n{usage()}', file=sys.stderr)
+        return 2
+    module = importlib.import_module(f'.{COMMANDS[command][0]}', __package__)
+    old_argv = sys.argv
+    sys.argv = [f'prosper-etl {command}'] + args
+    try:
+        return module.main()
+    finally:
+        sys.argv = old_argv
+
+if __name__ == '__main__':
+    sys.exit(main())
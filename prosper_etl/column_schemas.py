@@ -0,0 +1,131 @@
+# Column schemas for the notes, loans and payments outputs (see listings_attributes for listings).
+# The ETL scripts write these columns in this order; the synthetic data tools generate them.
+
+notes_columns = [
+    "age_in_months",
+    "amount_borrowed",
+    "borrower_rate",
+    "collection_fees_paid_pro_rata_share",
+    "days_past_due",
+    "debt_sale_proceeds_received_pro_rata_share",
+#    "group_leader_award",  # deprecated field
+    "interest_paid_pro_rata_share",
+    "is_sold",
+    "late_fees_paid_pro_rata_share",
+    "listing_number",
+    "loan_note_id",
+    "loan_number",
+    "next_payment_due_amount_pro_rata_share",
+    "next_payment_due_date",
+    "note_default_reason",
+    "note_default_reason_description",
+    "note_ownership_amount",
+    "note_sale_fees_paid",
+    "note_sale_gross_amount_received",
+    "note_status",
+    "note_status_description",
+    "origination_date",
+    "principal_balance_pro_rata_share",
+    "principal_paid_pro_rata_share",
+    "prosper_fees_paid_pro_rata_share",
+    "prosper_rating",
+    "service_fees_paid_pro_rata_share",
+    "term",
+]
+
+loans_columns = [
+    "age_in_months",
+    "amount_borrowed",
+    "borrower_rate",
+    "days_past_due",
+    "group_leader_award",
+    "collection_fees_paid",
+    "debt_sale_proceeds_received",
+    "interest_paid",
+    "late_fees_paid",
+    "loan_default_reason",
+    "loan_default_reason_description",
+    "loan_number",
+    "loan_status",
+    "loan_status_description",
+    "next_payment_due_date",
+    "next_payment_due_amount",
+    "origination_date",
+    "principal_balance",
+    "principal_paid",
+    "prosper_fees_paid",
+    "prosper_rating",
+    "service_fees_paid",
+    "term"
+]
+
+payments_columns = [
+    "loan_number",
+    "transaction_id",
+    "funds_available_date",
+    "investor_disbursement_date",
+    "transaction_effective_date",
+    "account_effective_date",
+    "payment_transaction_code",
+    "payment_status",
+    "match_back_id",
+    "prior_match_back_id",
+    "loan_payment_cashflow_type",
+    "payment_amount",
+    "principal_amount",
+    "interest_amount",
+    "origination_interest_amount",
+    "late_fee_amount",
+    "service_fee_amount",
+    "collection_fee_amount",
+    "gl_reward_amount",
+    "nsf_fee_amount",
+    "pre_days_past_due",
+    "post_days_past_due",
+    "resulting_principal_balance"
+]
+
+# monetary (dollar) columns of each output, for reading them as integer cents
+# (see `datasets.read_dataset(..., cents=True)`)
+money_columns = {
+    'notes': [
+        "amount_borrowed",
+        "collection_fees_paid_pro_rata_share",
+        "debt_sale_proceeds_received_pro_rata_share",
+        "interest_paid_pro_rata_share",
+        "late_fees_paid_pro_rata_share",
+        "next_payment_due_amount_pro_rata_share",
+        "note_ownership_amount",
+        "note_sale_fees_paid",
+        "note_sale_gross_amount_received",
+        "principal_balance_pro_rata_share",
+        "principal_paid_pro_rata_share",
+        "prosper_fees_paid_pro_rata_share",
+        "service_fees_paid_pro_rata_share",
+    ],
+    'loans': [
+        "amount_borrowed",
+        "group_leader_award",
+        "collection_fees_paid",
+        "debt_sale_proceeds_received",
+        "interest_paid",
+        "late_fees_paid",
+        "next_payment_due_amount",
+        "principal_balance",
+        "principal_paid",
+        "prosper_fees_paid",
+        "service_fees_paid",
+    ],
+    'payments': [
+        "payment_amount",
+        "principal_amount",
+        "interest_amount",
+        "origination_interest_amount",
+        "late_fee_amount",
+        "service_fee_amount",
+        "collection_fee_amount",
+        "gl_reward_amount",
+        "nsf_fee_amount",
+        "resulting_principal_balance",
+    ],
+}
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Compaction and dedupe for accumulated ETL outputs.
+
+Merges a dataset's output file (a concatenation of many small bz2 streams, possibly with
+duplicate rows from repeated appends) into one well-compressed file. For the append-only
+payments the `.bak` copy is merged in too; for the snapshot datasets (notes, loans,
+listings) `.bak` holds the previous snapshot, so it's only merged on request. A dataset
+stored only as month partitions (see `partitions`) is compacted from its partitions, and
+the changed months are rewritten in place.
+Rows are deduplicated on the dataset's natural key (`transaction_id`, `loan_note_id`,
+`listing_number`, `loan_number`), keeping the newest version, and sorted by a chosen column
+for better compression and faster range reads. Both steps use an external merge sort over
+temporary run files, so memory is bounded by `run_rows` whatever the input size.
+
+usage: python -m prosper_etl.compaction payments [--sort-by transaction_effective_date] [--backups | --no-backups]
+                                                 [--remove-backups] [--partitioned]
+"""
+
+import os, sys, bz2, csv, heapq, shutil, logging, tempfile, argparse
+from . import datasets
+
+csv.field_size_limit(sys.maxsize)  # listings carry large credit bureau payloads
+
+APPEND_ONLY = ('payments',)  # datasets whose `.bak` holds rows the output doesn't
+
+
+# external sort
+#==============
+def _sort_value(v):
+    '''Sort numbers numerically and everything else as text (numbers first).'''
+    try:
+        return (0, float(v), '')
+    except ValueError:
+        return (1, 0.0, v)
+
+def external_sort(rows, key, tmp_dir, run_rows=500000):
+    '''Sort an iterable of csv rows (lists of str) by `key(row)` using sorted run files of
+    at most `run_rows` rows and a k-way merge. Yields rows in order.'''
+    runs = []
+    buf = []
+
+    def flush():
+        buf.sort(key=key)
+        fd, path = tempfile.mkstemp(suffix='.run', dir=tmp_dir)
+        with os.fdopen(fd, 'w', newline='') as f:
+            csv.writer(f).writerows(buf)
+        runs.append(path)
+        buf.clear()
+
+    for row in rows:
+        buf.append(row)
+        if len(buf) >= run_rows:
+            flush()
+    if not runs:  # everything fit in memory
+        buf.sort(key=key)
+        yield from buf
+        return
+    if buf:
+        flush()
+    files = [open(p, newline='') for p in runs]
+    try:
+        yield from heapq.merge(*[csv.reader(f) for f in files], key=key)
+    finally:
+        for f in files:
+            f.close()
+        for p in runs:
+            os.remove(p)
+
+
+# compaction
+#===========
+def _source_rows(sources, header):
+    '''Rows of every source file mapped onto `header`, tagged with a version number
+    (later files and later rows within a file are newer). The version is appended
+    as the last field.'''
+    version = 0
+    for fpath in sources:
+        with bz2.open(fpath, 'rt', newline='') as f:
+            reader = csv.reader(f)
+            src_header = next(reader, None)
+            if src_header is None:
+                continue
+            pos = {c: i for i, c in enumerate(src_header)}
+            idx = [pos.get(c) for c in header]
+            for row in reader:
+                if not row or row == src_header:
+                    continue
+                version += 1
+                yield [row[i] if i is not None and i < len(row) else '' for i in idx] + [str(version)]
+
+def _partition_files(dataset, fpath, data_dir=None):
+    '''Month partitions of `dataset`, if it's stored only as partitions (else []).'''
+    from . import partitions
+    if os.path.exists(fpath):
+        return []
+    return [p for p in partitions.partition_files(dataset, data_dir=data_dir) if os.path.exists(p)]
+
+def uses_backups(dataset, include_backups=None, data_dir=None):
+    '''Whether `compact` merges the `.bak` copy of `dataset`: by default only for the
+    append-only datasets, and not when the dataset is stored as partitions (its `.bak` is
+    then the monolithic file they replaced).'''
+    if include_backups is not None:
+        return include_backups
+    fpath = datasets.dataset_path(dataset, data_dir)
+    return dataset in APPEND_ONLY and not _partition_files(dataset, fpath, data_dir)
+
+def compact(dataset, data_dir=None, sort_by=None, include_backups=None, run_rows=500000, compresslevel=9, output=None):
+    '''Merge, dedupe (newest version per natural key) and sort `dataset` into one bz2 stream.
+    Replaces the dataset file unless `output` is given; a dataset stored only as month
+    partitions has its changed partitions rewritten instead (rows within a month are then
+    stored in key order, see `partitions.MonthWriter`). `include_backups` defaults to
+    `uses_backups`. Returns a dict of row counts.'''
+    fpath = datasets.dataset_path(dataset, data_dir)
+    key_col = datasets.DATASETS[dataset][2]
+    sort_by = sort_by or key_col
+    part_files = _partition_files(dataset, fpath, data_dir)
+    # oldest first, so versions increase with recency
+    sources = [fpath + '.bak'] if uses_backups(dataset, include_backups, data_dir) and os.path.exists(fpath + '.bak') else []
+    sources += part_files or [p for p in (fpath,) if os.path.exists(p)]
+    if not sources:
+        raise FileNotFoundError(f'no files to compact for {dataset} at {fpath}')
+    with bz2.open(sources[-1], 'rt', newline='') as f:
+        header = next(csv.reader(f))
+    ki, si, vi = header.index(key_col), header.index(sort_by), len(header)
+
+    tmp_dir = tempfile.mkdtemp(prefix='.compact_', dir=os.path.dirname(fpath))
+    counts = {'rows_in': 0, 'duplicates': 0, 'rows_out': 0}
+    try:
+        def counted(rows):
+            for row in rows:
+                counts['rows_in'] += 1
+                yield row
+
+        # pass 1: group versions of a key together, newest first, and keep the first
+        by_key = external_sort(
+            counted(_source_rows(sources, header)),
+            key=lambda r: (_sort_value(r[ki]), -int(r[vi])), tmp_dir=tmp_dir, run_rows=run_rows
+        )
+
+        def deduped(rows):
+            last = None
+            for row in rows:
+                if row[ki] == last:
+                    counts['duplicates'] += 1
+                    continue
+                last = row[ki]
+                yield row
+
+        # pass 2: order by the requested column (skipped if it's the key itself)
+        rows = deduped(by_key)
+        if sort_by != key_col:
+            rows = external_sort(rows, key=lambda r: (_sort_value(r[si]), _sort_value(r[ki])), tmp_dir=tmp_dir, run_rows=run_rows)
+
+        out_tmp = os.path.join(tmp_dir, 'compacted.bz2')
+        with bz2.open(out_tmp, 'wt', newline='', compresslevel=compresslevel) as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(header)
+            for row in rows:
+                writer.writerow(row[:vi])
+                counts['rows_out'] += 1
+        if part_files and not output:
+            from . import partitions
+            partitions.write_partitioned(dataset, data_dir, source=out_tmp)
+        else:
+            os.replace(out_tmp, output or fpath)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    logging.info(
+        f'compacted {dataset}: {counts["rows_in"]} rows in, {counts["duplicates"]} duplicates dropped, '
+        f'{counts["rows_out"]} rows out (sorted by {sort_by})'
+    )
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description='Compact, dedupe and sort ETL outputs.')
+    parser.add_argument('datasets', nargs='+', choices=list(datasets.DATASETS))
+    parser.add_argument('--data-dir', default=None)
+    parser.add_argument('--sort-by', default=None, help='column to sort by (default: the natural key)')
+    backups = parser.add_mutually_exclusive_group()
+    backups.add_argument('--backups', action='store_const', const=True, default=None, dest='include_backups',
+                         help='merge in the .bak copies of snapshot datasets too (default: payments only)')
+    backups.add_argument('--no-backups', action='store_const', const=False, dest='include_backups',
+                         help="don't merge in the .bak copies")
+    parser.add_argument('--remove-backups', action='store_true', help='delete the .bak copies after compacting')
+    parser.add_argument('--partitioned', action='store_true', help='rebuild the month partitions from the result')
+    parser.add_argument('--run-rows', type=int, default=500000, help='rows per in-memory sort run')
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s:%(levelname)s:%(message)s', level=logging.INFO)
+    for ds in args.datasets:
+        fpath = datasets.dataset_path(ds, args.data_dir)
+        merged = uses_backups(ds, args.include_backups, args.data_dir)
+        counts = compact(ds, args.data_dir, args.sort_by, merged, args.run_rows)
+        print(f'{ds}: {counts}')
+        if args.remove_backups and merged and os.path.exists(fpath + '.bak'):
+            os.remove(fpath + '.bak')
+        if args.partitioned and os.path.exists(fpath):  # (partition-only datasets were compacted in place)
+            from . import partitions
+            partitions.write_partitioned(ds, args.data_dir)
+
+if __name__ == '__main__':
+    main()
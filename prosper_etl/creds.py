@@ -0,0 +1,38 @@
+import base64, os
+
+user_ns_id = 'p2p'
+user_key = 'p2p_user'
+pw_key = 'p2p_password'
+id_key = 'p2p_id'
+secret_key = 'p2p_secret'
+
+def _lookup(key, profile=None):
+	'''Credentials are stored base64 encoded in the local keyring. An environment variable
+	named after the key (e.g. P2P_USER) takes precedence, which is handy for runs against
+	a local mock server.
+	Additional accounts are stored under a keyring service per profile ('p2p_<profile>',
+	same keys), with environment variables like P2P_<PROFILE>_USER.'''
+	service, env_key = user_ns_id, key.upper()
+	if profile:
+		service = f'{user_ns_id}_{profile}'
+		env_key = f'{service}_{key[len(user_ns_id) + 1:]}'.upper()
+	value = os.environ.get(env_key)
+	if not value:
+		import keyring  # (only needed when the environment doesn't have it)
+		value = keyring.get_password(service, key)
+	if value is None:
+		raise KeyError(f'no {key} credential found for profile {profile or "default"}')
+	return base64.b64decode(value).decode('utf-8')
+
+def profiles():
+	'''Account profiles listed in the P2P_PROFILES environment variable (comma separated).'''
+	return [p.strip() for p in os.environ.get('P2P_PROFILES', '').split(',') if p.strip()]
+
+class ProsperClient():
+	'''Credentials for one Prosper account; `profile` None is the default account.'''
+	def __init__(self, profile=None):
+		self.profile = profile
+		self.username = _lookup(user_key, profile)
+		self.password = _lookup(pw_key, profile)
+		self.id = _lookup(id_key, profile)
+		self.secret = _lookup(secret_key, profile)
@@ -0,0 +1,244 @@
+"""
+Chunked, out-of-core readers for the ETL output files.
+
+`read_dataset` streams fixed-size chunks of an output file, only parsing the columns that
+are asked for (plus any needed by a predicate) and dropping rows that fail the predicates
+before the chunk is handed back. `aggregate` folds such a chunk stream into grouped
+sums/counts/min/max, so memory depends on the number of groups, not the size of the file.
+"""
+
+import os, sys, logging
+
+# where the ETL outputs and logs go: PROSPER_DATA_DIR and PROSPER_LOG_DIR, else data/ and logs/
+# under the current directory (not next to the code, which may be an installed package)
+DATA_DIR = os.path.abspath(os.environ.get('PROSPER_DATA_DIR', 'data'))
+LOG_DIR = os.path.abspath(os.environ.get('PROSPER_LOG_DIR', 'logs'))
+
+# dataset name: (path under DATA_DIR, date column, key column, status column)
+DATASETS = {
+    'loans': ('myloans/myloans.bz2', 'origination_date', 'loan_number', 'loan_status'),
+    'notes': ('mynotes/mynotes.bz2', 'origination_date', 'loan_note_id', 'note_status'),
+    'payments': ('myloans/myloan_payments.bz2', 'transaction_effective_date', 'transaction_id', 'payment_status'),
+    'listings': ('mylistings/mylistings.bz2', 'listing_start_date', 'listing_number', 'listing_status'),
+}
+
+
+def dataset_path(dataset, data_dir=None):
+    '''Return the file path for a dataset name, or `dataset` itself if it's already a path.'''
+    if dataset in DATASETS:
+        return os.path.join(data_dir or DATA_DIR, DATASETS[dataset][0])
+    return dataset
+
+def output_dirs(data_dir=None, log_dir=None, subdirs=()):
+    '''(data dir, log dir), by default `DATA_DIR` and `LOG_DIR`, created if they're missing
+    along with `subdirs` of the data dir (e.g. 'myloans').'''
+    data_dir = os.path.abspath(data_dir or DATA_DIR)
+    log_dir = os.path.abspath(log_dir or LOG_DIR)
+    for d in [log_dir] + [os.path.join(data_dir, sub) for sub in subdirs] + [data_dir]:
+        os.makedirs(d, exist_ok=True)
+    return data_dir, log_dir
+
+def exists(dataset, data_dir=None):
+    '''True if there's stored data for `dataset`: its file, or (for a dataset name) its month
+    partitions (see `partitions`).'''
+    if os.path.exists(dataset_path(dataset, data_dir)):
+        return True
+    if dataset in DATASETS:
+        from . import partitions
+        return bool(partitions.read_manifest(partitions.partition_dir(dataset, data_dir)))
+    return False
+
+def _dataset_columns(dataset, date_column, status_column):
+    if dataset in DATASETS:
+        _, dcol, _, scol = DATASETS[dataset]
+        return date_column or dcol, status_column or scol
+    return date_column, status_column
+
+
+# reading
+#========
+def read_dataset(
+        dataset, columns=None, start_date=None, end_date=None, loan_numbers=None, status=None,
+        chunksize=100000, date_column=None, status_column=None, data_dir=None, processes=None,
+        partitioned=None, cents=False
+    ):
+    '''Yield filtered DataFrame chunks of `dataset` (a name in `DATASETS` or a file path).
+    `columns` limits the columns parsed and returned (default: all).
+    `start_date`/`end_date` ('yyyy-mm-dd', inclusive/exclusive) filter on the dataset's date column.
+    `loan_numbers` is an iterable of loan numbers to keep; `status` a value or list of values
+    for the dataset's status column.
+    If `processes` is set, chunks are decompressed in parallel (see `bz2_reader`) and
+    `chunksize` is ignored.
+    With `partitioned`, the dataset's month partitions are read instead of the monolithic
+    file (see `partitions`), skipping months outside `start_date`/`end_date`; by default
+    they're read when there's no monolithic file (e.g. after a `--partitioned` pull).
+    With `cents`, the dataset's monetary columns are returned as integer cents (see `to_cents`).'''
+    from pandas import to_datetime
+    fpath = dataset_path(dataset, data_dir)
+    money = set(money_columns(dataset)) if cents else set()
+    date_column, status_column = _dataset_columns(dataset, date_column, status_column)
+    if (start_date or end_date) and not date_column:
+        raise ValueError('a date_column is needed to filter by date')
+    if status is not None and not status_column:
+        raise ValueError('a status_column is needed to filter by status')
+    if loan_numbers is not None:
+        loan_numbers = set(int(ln) for ln in loan_numbers)
+    if status is not None and isinstance(status, (str, int)):
+        status = [status]
+
+    # columns to parse: requested + those needed by predicates
+    usecols = None
+    if columns is not None:
+        usecols = list(columns)
+        for col, used in ((date_column, start_date or end_date), ('loan_number', loan_numbers is not None),
+                          (status_column, status is not None)):
+            if used and col not in usecols:
+                usecols.append(col)
+
+    if partitioned is None:
+        partitioned = dataset in DATASETS and not os.path.exists(fpath) and exists(dataset, data_dir)
+    if partitioned:
+        from . import partitions
+        fpaths = partitions.partition_files(dataset, start_date, end_date, data_dir)
+    else:
+        fpaths = [fpath]
+    chunks = _file_chunks(fpaths, usecols, chunksize, processes)
+
+    for chunk in chunks:
+        mask = None
+        if start_date or end_date:
+            dates = to_datetime(chunk[date_column], errors='coerce', utc=True).dt.tz_localize(None)
+            if start_date:
+                m = dates >= to_datetime(start_date)
+                mask = m if mask is None else mask & m
+            if end_date:
+                m = dates < to_datetime(end_date)
+                mask = m if mask is None else mask & m
+        if loan_numbers is not None:
+            m = chunk['loan_number'].isin(loan_numbers)
+            mask = m if mask is None else mask & m
+        if status is not None:
+            m = chunk[status_column].isin(status)
+            mask = m if mask is None else mask & m
+        if mask is not None:
+            chunk = chunk[mask]
+        if columns is not None:
+            chunk = chunk[list(columns)]
+        if money and len(chunk):
+            chunk = chunk.assign(**{c: to_cents(chunk[c]) for c in chunk.columns if c in money})
+        if len(chunk):
+            yield chunk
+
+def _file_chunks(fpaths, usecols, chunksize, processes):
+    from pandas import read_csv
+    for fpath in fpaths:
+        if processes:
+            from . import bz2_reader
+            yield from bz2_reader.read_bz2_chunks(fpath, processes=processes, usecols=usecols)
+        else:
+            yield from read_csv(fpath, compression='bz2', usecols=usecols, chunksize=chunksize)
+
+def read_all(dataset, latest=False, key=None, **kwargs):
+    '''Read the filtered dataset into one DataFrame (see `read_dataset` for arguments).
+    With `latest`, only the last (newest) row per key is kept, for outputs that incremental
+    pulls append changed rows to (see `row_hashes`); the key column (`key`, by default the
+    dataset's, and needed when `dataset` is a path) must be read.'''
+    from pandas import concat, DataFrame
+    if latest and key is None:
+        if dataset not in DATASETS:
+            raise ValueError('a key column is needed to keep the latest rows of a file')
+        key = DATASETS[dataset][2]
+    chunks = list(read_dataset(dataset, **kwargs))
+    if not chunks:
+        return DataFrame(columns=kwargs.get('columns'))
+    df = concat(chunks, ignore_index=True)
+    if latest:
+        df = df.drop_duplicates(subset=key, keep='last', ignore_index=True)
+    return df
+
+def missing_listing_numbers(data_dir=None):
+    '''Listing numbers of owned notes that aren't in the stored listings yet, sorted.'''
+    notes = read_all('notes', columns=['listing_number'], data_dir=data_dir)
+    owned = set(notes['listing_number'].dropna().astype('int64'))
+    if exists('listings', data_dir):
+        for chunk in read_dataset('listings', columns=['listing_number'], data_dir=data_dir):
+            owned.difference_update(chunk['listing_number'].dropna().astype('int64'))
+    return sorted(owned)
+
+
+# integer cents
+#==============
+def money_columns(dataset):
+    '''Monetary columns of `dataset` (empty for listings or arbitrary paths).'''
+    from . import column_schemas
+    return column_schemas.money_columns.get(dataset, [])
+
+def to_cents(values):
+    '''Dollar amounts (floats or numeric strings) as int64 cents, rounded to the nearest cent.
+    Missing values give a nullable 'Int64' column instead. Sums of cents are exact.'''
+    import numpy as np
+    from pandas import Series, to_numeric
+    dollars = to_numeric(Series(values), errors='coerce').to_numpy(dtype='float64')
+    cents = np.rint(dollars * 100)
+    index = values.index if isinstance(values, Series) else None
+    if np.isnan(cents).any():
+        return Series(cents, index=index).astype('Int64')
+    return Series(cents.astype(np.int64), index=index)
+
+def from_cents(cents):
+    '''Integer cents back to float dollars.'''
+    return cents / 100
+
+
+# aggregation
+#============
+COMBINE = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+
+def aggregate(chunks, agg, by=None):
+    '''Fold a stream of DataFrame chunks into one aggregate.
+    `agg` maps column -> one of 'sum', 'count', 'min', 'max', 'mean' (or a list of them).
+    `by` is an optional column (or list of columns) to group on.
+    Partial results are combined after every chunk, so memory is bounded by the
+    number of groups.'''
+    from pandas import concat
+    spec = {}
+    for col, funcs in agg.items():
+        funcs = [funcs] if isinstance(funcs, str) else list(funcs)
+        parts = set()
+        for fn in funcs:
+            if fn == 'mean':
+                parts.update(('sum', 'count'))
+            elif fn in COMBINE:
+                parts.add(fn)
+            else:
+                raise ValueError(f'unsupported aggregation: {fn}')
+        spec[col] = sorted(parts)
+
+    keys = by if by is not None else '_all'
+    total = None
+    for chunk in chunks:
+        if by is None:
+            chunk = chunk.assign(_all=0)
+        part = chunk.groupby(keys).agg(spec)
+        if total is not None:
+            both = concat([total, part])
+            part = both.groupby(level=list(range(both.index.nlevels))).agg(
+                {c: COMBINE[c[1]] for c in both.columns}
+            )
+        total = part
+    if total is None:
+        return None
+
+    from pandas import DataFrame
+    result = DataFrame(index=total.index)
+    for col, funcs in agg.items():
+        funcs = [funcs] if isinstance(funcs, str) else list(funcs)
+        for fn in funcs:
+            if fn == 'mean':
+                result[f'{col}_mean'] = total[(col, 'sum')] / total[(col, 'count')]
+            else:
+                result[f'{col}_{fn}'] = total[(col, fn)]
+    if by is None:
+        result = result.reset_index(drop=True)
+    logging.debug(f'aggregated {len(result)} groups')
+    return result
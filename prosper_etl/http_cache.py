@@ -0,0 +1,207 @@
+"""
+On-disk cache of Prosper GET responses, used by `prosper_api_tools.get_request`.
+
+Entries are keyed by account profile, timezone header and normalized url (scheme and host
+lower-cased, query parameters sorted), and stored under `~/.cache/prosper_etl/http/`
+(override with the PROSPER_HTTP_CACHE environment variable; 'off' disables the cache) in
+owner-only files. A 200 response is stored when it carries an ETag or Last-Modified
+validator (or when `TTL` > 0), and later requests for the same url
+  - are answered from disk without a request while the entry is younger than `TTL`
+    (PROSPER_HTTP_CACHE_TTL seconds, default 0: always revalidate);
+  - otherwise are sent with If-None-Match / If-Modified-Since, and a 304 is answered with
+    the stored body.
+Entries unused for `MAX_AGE` seconds are evicted, and the least recently used entries go
+once the cache exceeds `MAX_BYTES` (PROSPER_HTTP_CACHE_MAX_MB).
+
+Offline mode (PROSPER_HTTP_OFFLINE=1, `set_offline(True)` or `run_all_ETL.py --offline`)
+answers every request from the cache and never touches the network, for replaying a pull.
+"""
+
+import os, json, time, hashlib, logging, threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+CACHE_DIR = os.environ.get(
+    'PROSPER_HTTP_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'prosper_etl', 'http')
+)
+TTL = float(os.environ.get('PROSPER_HTTP_CACHE_TTL', 0))
+MAX_AGE = 30 * 24 * 3600
+MAX_BYTES = int(float(os.environ.get('PROSPER_HTTP_CACHE_MAX_MB', 512)) * 2**20)
+OFFLINE = os.environ.get('PROSPER_HTTP_OFFLINE') == '1'
+
+_lock = threading.Lock()
+_size = None  # bytes on disk, counted on first store
+
+
+def enabled():
+    return CACHE_DIR.lower() not in ('off', '0', 'false', '')
+
+def offline():
+    return OFFLINE
+
+def set_offline(flag=True):
+    '''Answer requests only from the cache (True) or normally (False).'''
+    global OFFLINE
+    OFFLINE = bool(flag)
+
+def normalize_url(url):
+    '''`url` with a lower-case scheme and host, no trailing slash on the path, and the query
+    parameters sorted, so equivalent urls share an entry.'''
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/') or '/', query, ''))
+
+def cache_key(url, profile=None, timezn=None):
+    return hashlib.sha256(f'{profile or ""}|{timezn or ""}|{normalize_url(url)}'.encode('utf-8')).hexdigest()
+
+def _entry_path(key):
+    return os.path.join(CACHE_DIR, key[:2], key)
+
+
+class CachedResponse():
+    '''A stored response, with the attributes of a transport response that the api tools use.'''
+    def __init__(self, meta, content):
+        self.meta = meta
+        self.status_code = meta.get('status', 200)
+        self.content = content
+        self.headers = meta.get('headers', {})
+        self.http_version = 'cache'
+        self.from_cache = True
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+def lookup(key):
+    '''The stored response for `key`, or None. Its `meta` holds the url, validators
+    ('etag', 'last_modified') and the time it was stored or last revalidated ('stored').'''
+    if not enabled():
+        return None
+    fpath = _entry_path(key)
+    try:
+        with open(fpath, 'rb') as f:
+            meta = json.loads(f.readline())
+            content = f.read()
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f'ignoring unreadable http cache entry {fpath}: {str(e)}')
+        return None
+    return CachedResponse(meta, content)
+
+def fresh(entry, now=None):
+    return entry is not None and (now or time.time()) - entry.meta.get('stored', 0) < TTL
+
+def conditional_headers(entry):
+    '''If-None-Match / If-Modified-Since headers revalidating `entry`.'''
+    headers = {}
+    if entry is None:
+        return headers
+    if entry.meta.get('etag'):
+        headers['If-None-Match'] = entry.meta['etag']
+    if entry.meta.get('last_modified'):
+        headers['If-Modified-Since'] = entry.meta['last_modified']
+    return headers
+
+def store(key, url, response):
+    '''Store a 200 `response` for `key` if it can be revalidated (or `TTL` allows reuse).
+    Returns True if stored.'''
+    if not enabled() or response.status_code != 200:
+        return False
+    etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+    if not (etag or last_modified or TTL > 0):
+        return False
+    meta = {
+        'url': normalize_url(url), 'status': 200, 'etag': etag, 'last_modified': last_modified,
+        'stored': time.time(), 'headers': {'Content-Type': response.headers.get('Content-Type', 'application/json')},
+    }
+    fpath = _entry_path(key)
+    os.makedirs(os.path.dirname(fpath), mode=0o700, exist_ok=True)
+    old = os.path.getsize(fpath) if os.path.exists(fpath) else 0
+    tmp = f'{fpath}.{os.getpid()}.{threading.get_ident()}.tmp'
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(json.dumps(meta).encode('utf-8') + b'\n')
+        f.write(response.content)
+    new = os.path.getsize(tmp)
+    os.replace(tmp, fpath)
+    _account(new - old)
+    return True
+
+def revalidated(key, entry):
+    '''Mark `entry` as confirmed unchanged by the server (a 304) now.'''
+    entry.meta['stored'] = time.time()
+    fpath = _entry_path(key)
+    tmp = f'{fpath}.{os.getpid()}.{threading.get_ident()}.tmp'
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(json.dumps(entry.meta).encode('utf-8') + b'\n')
+        f.write(entry.content)
+    os.replace(tmp, fpath)
+
+def touch(key):
+    '''Record a use of `key` (its mtime orders the size-based eviction).'''
+    try:
+        os.utime(_entry_path(key))
+    except OSError:
+        pass
+
+
+# eviction
+#=========
+def _entries():
+    for sub in os.listdir(CACHE_DIR) if os.path.isdir(CACHE_DIR) else []:
+        d = os.path.join(CACHE_DIR, sub)
+        if os.path.isdir(d):
+            for name in os.listdir(d):
+                if not name.endswith('.tmp'):
+                    yield os.path.join(d, name)
+
+def _account(delta):
+    '''Track the cache size after a store (the first store of a process also drops stale entries).'''
+    global _size
+    with _lock:
+        first = _size is None
+        if not first:
+            _size += delta
+        over = not first and _size > MAX_BYTES
+    if first or over:
+        evict()
+
+def evict(max_bytes=None, max_age=None):
+    '''Remove entries unused for `max_age` seconds, then the least recently used ones until
+    the cache is under 90% of `max_bytes`. Returns the number of entries removed.'''
+    global _size
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    max_age = MAX_AGE if max_age is None else max_age
+    now = time.time()
+    with _lock:
+        stats = []
+        for p in _entries():
+            try:
+                st = os.stat(p)
+            except FileNotFoundError:
+                continue
+            stats.append((st.st_mtime, st.st_size, p))
+        stats.sort()
+        total = sum(s for _, s, _ in stats)
+        removed = 0
+        for mtime, size, p in stats:
+            if now - mtime <= max_age and total <= 0.9 * max_bytes:
+                break
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        _size = total
+    if removed:
+        logging.info(f'http cache: evicted {removed} entries ({total} bytes left)')
+    return removed
+
+def clear():
+    '''Remove every cached response.'''
+    return evict(max_bytes=0, max_age=0)
@@ -0,0 +1,77 @@
+"""
+HTTP transports behind `prosper_api_tools.get_request`.
+
+A transport has one method, `request(method, url, headers=None, data=None)`, returning a
+response with `status_code`, `content`, `text`, `headers` and `json()` (the attributes the
+api tools use), and is shared by every thread of the process.
+    requests   `requests.Session` with a keep-alive pool (HTTP/1.1, one request per
+               connection at a time; the default)
+    httpx      `httpx.Client` over HTTP/1.1 (a connection pool, like requests)
+    httpx-h2   `httpx.Client` with HTTP/2: concurrent page fetchers multiplex their requests
+               as streams over one connection per host. Needs `pip install httpx[http2]`.
+               HTTP/2 is negotiated over TLS (ALPN); a plain http:// server gets HTTP/1.1
+               unless `PROSPER_HTTP2_PRIOR_KNOWLEDGE=1` (h2c without upgrade).
+Pick one with the PROSPER_HTTP_TRANSPORT environment variable, or at run time with
+`prosper_api_tools.set_transport(name)`.
+"""
+
+import os, logging
+
+TRANSPORTS = ('requests', 'httpx', 'httpx-h2')
+DEFAULT = os.environ.get('PROSPER_HTTP_TRANSPORT', 'requests')
+POOL_SIZE = 16  # max simultaneous connections per host
+
+
+class RequestsTransport():
+    name = 'requests'
+
+    def __init__(self, pool_size=POOL_SIZE):
+        import requests
+        self.session = requests.Session()
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size))
+        self.session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size))
+
+    def request(self, method, url, headers=None, data=None):
+        return self.session.request(method, url, headers=headers, data=data)
+
+    def close(self):
+        self.session.close()
+
+class HttpxTransport():
+    '''`httpx.Client` transport; with `http2`, requests from all threads share one multiplexed
+    connection per host.'''
+    def __init__(self, http2=False, pool_size=POOL_SIZE, prior_knowledge=None):
+        try:
+            import httpx
+        except ImportError:
+            logging.error('the httpx transport needs httpx: pip install httpx[http2]')
+            raise
+        if prior_knowledge is None:
+            prior_knowledge = os.environ.get('PROSPER_HTTP2_PRIOR_KNOWLEDGE') == '1'
+        self.name = 'httpx-h2' if http2 else 'httpx'
+        self.client = httpx.Client(
+            http1=not (http2 and prior_knowledge), http2=http2, timeout=None,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    def request(self, method, url, headers=None, data=None):
+        # (form bodies are pre-encoded strings, which httpx takes as `content`)
+        return self.client.request(method, url, headers=headers, content=data)
+
+    def close(self):
+        self.client.close()
+
+def make_transport(name=None, pool_size=POOL_SIZE):
+    '''A new transport by name (see `TRANSPORTS`; default: PROSPER_HTTP_TRANSPORT, else requests).'''
+    name = name or DEFAULT
+    if name == 'requests':
+        return RequestsTransport(pool_size)
+    if name in ('httpx', 'httpx-h2'):
+        return HttpxTransport(http2=name == 'httpx-h2', pool_size=pool_size)
+    raise ValueError(f'unknown transport {name!r}: choose one of {TRANSPORTS}')
+
+def http_version(response):
+    '''Protocol of a response ('HTTP/1.1', 'HTTP/2', ...).'''
+    if hasattr(response, 'http_version'):  # httpx
+        return response.http_version
+    return {10: 'HTTP/1.0', 11: 'HTTP/1.1'}.get(getattr(response.raw, 'version', None), 'HTTP/1.1')
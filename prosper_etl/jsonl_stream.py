@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Streaming JSONL output for the paginators.
+
+Any `get_many_*` function in `prosper_api_tools` accepts a stream target instead of a file
+path: '-' writes to stdout, 'unix:/path/to.sock' connects to a Unix socket that a consumer
+is listening on. Each record is written as one line of JSON as soon as its page arrives
+(pages in offset order), with no DataFrame, csv or bz2 step, so another process can consume
+loans, notes or payments while the pull is still running. The paginators print their
+progress to stderr when the target is a stream, so stdout carries only records. If the
+consumer goes away, the pull stops with `BrokenPipeError`.
+
+usage: python -m prosper_etl.jsonl_stream notes [--to unix:/tmp/notes.sock] [--workers 4]
+       python -m prosper_etl.jsonl_stream payments --loan-number 123,456 | consumer
+"""
+
+import os, sys, json, socket, logging, argparse, threading
+from . import metrics
+
+UNIX_PREFIX = 'unix:'
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+def is_stream_target(fpath):
+    '''True if `fpath` names a stream ('-' or 'unix:<path>') rather than a file.'''
+    return isinstance(fpath, str) and (fpath == '-' or fpath.startswith(UNIX_PREFIX))
+
+def progress_file(fpath):
+    '''Where the paginators report progress while writing `fpath`: stderr for stream targets.'''
+    return sys.stderr if is_stream_target(fpath) else sys.stdout
+
+class JsonlSink():
+    '''Line-oriented byte sink shared by every writer of one target. Writes are whole lines
+    and serialized, so concurrent paginators never interleave records.'''
+    def __init__(self, target):
+        self.target = target
+        self._lock = threading.Lock()
+        self._sock = None
+        if target == '-':
+            self._out = sys.stdout.buffer
+        else:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.connect(target[len(UNIX_PREFIX):])
+            self._out = self._sock.makefile('wb')
+
+    # (file-like, so it can stand in for an open output file; closing is a no-op because
+    # the sink is shared - see `close_all`)
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write(self, data):
+        with self._lock:
+            self._out.write(data)
+            self._out.flush()
+
+    def close(self):
+        with self._lock:
+            try:
+                self._out.flush()
+            except BrokenPipeError:
+                pass  # the consumer is gone: nothing left to deliver
+            if self._sock is not None:
+                self._out.close()
+                self._sock.close()
+
+def sink(target):
+    '''The (shared) sink for stream target `target`, opened on first use.'''
+    with _sinks_lock:
+        if target not in _sinks:
+            _sinks[target] = JsonlSink(target)
+        return _sinks[target]
+
+def close_all():
+    with _sinks_lock:
+        for s in _sinks.values():
+            s.close()
+        _sinks.clear()
+
+def encode_records(records, column_schema=None):
+    '''Records of one page as JSONL bytes, restricted to `column_schema` if given.'''
+    if column_schema:
+        records = ({c: rec.get(c) for c in column_schema} for rec in records)
+    return ''.join(json.dumps(rec, separators=(',', ':')) + '\n' for rec in records).encode('utf-8')
+
+def write_page(target, resp_json, column_schema=None):
+    '''Emit the records of a decoded page to `target`. Returns the number of records.'''
+    records = resp_json.get('result') or []
+    if records:
+        with metrics.timer('write'):
+            sink(target).write(encode_records(records, column_schema))
+        metrics.add_rows(len(records))
+    return len(records)
+
+
+def stream(dataset, target='-', workers=None, loan_numbers=None, profile=None):
+    '''Pull `dataset` ('loans', 'notes', 'listings' or 'payments') to a stream target.
+    Payments are pulled for `loan_numbers` (default: the loans in myloans.bz2), 25 at a time.'''
+    from . import prosper_api_tools, datasets, column_schemas
+    tokens = prosper_api_tools.account_tokens(profile)
+    try:
+        if dataset == 'loans':
+            prosper_api_tools.get_many_loans(target, tokens, column_schema=column_schemas.loans_columns, workers=workers)
+        elif dataset == 'notes':
+            prosper_api_tools.get_many_notes(target, tokens, column_schema=column_schemas.notes_columns, workers=workers)
+        elif dataset == 'listings':
+            prosper_api_tools.get_all_owned_listings(target, tokens, workers=workers)
+        elif dataset == 'payments':
+            if loan_numbers is None:
+                loans = datasets.read_all('loans', columns=['loan_number', 'origination_date'], latest=True)
+                loan_numbers = loans.sort_values(by='origination_date')['loan_number'].astype(str).tolist()
+            for i in range(0, len(loan_numbers), 25):
+                prosper_api_tools.get_many_payments(
+                    target, tokens, loan_number=','.join(loan_numbers[i:i + 25]),
+                    column_schema=column_schemas.payments_columns, workers=workers
+                )
+        else:
+            raise ValueError(f'unknown dataset: {dataset}')
+    finally:
+        close_all()
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream Prosper records as JSON lines.')
+    parser.add_argument('dataset', choices=['loans', 'notes', 'listings', 'payments'])
+    parser.add_argument('--to', default='-', help="'-' (stdout, default) or unix:/path/to.sock")
+    parser.add_argument('--workers', type=int, default=None, help='concurrent page fetchers')
+    parser.add_argument('--loan-number', default=None, help='payments: comma separated loan numbers')
+    parser.add_argument('--profile', default=None, help='credential profile (see creds)')
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s:%(levelname)s:%(message)s', level=logging.WARNING)
+    loan_numbers = args.loan_number.split(',') if args.loan_number else None
+    if args.to == '-':
+        # bind the sink to the real stdout before any other output is sent to stderr (through
+        # the imported module: run as a script, this one's `_sinks` isn't the paginators')
+        from . import jsonl_stream
+        jsonl_stream.sink('-')
+    sys.stdout, out = sys.stderr, sys.stdout
+    try:
+        stream(args.dataset, args.to, args.workers, loan_numbers, args.profile)
+    except BrokenPipeError:
+        logging.warning(f'{args.to}: the consumer closed the stream')
+        if args.to == '-':
+            # (keep the interpreter's final flush of stdout from failing again)
+            os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())
+        sys.exit(1)
+    finally:
+        sys.stdout = out
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+In-process metrics for the ETL pulls.
+
+`prosper_api_tools.get_request` records per-endpoint request latency, bytes received,
+retries and token refreshes; `util_funcs.write_response_to_disk` records rows written and
+the time spent on json decode, DataFrame build and compress/write. At the end of a run,
+`write_summary` dumps everything as a JSON summary and a Prometheus text file.
+"""
+
+import json, os, threading, time
+from contextlib import contextmanager
+
+# request latency histogram buckets (seconds)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+STAGES = ('network', 'json_decode', 'dataframe', 'write')
+
+_lock = threading.Lock()
+_state = {}
+
+
+def reset():
+    '''Clear all recorded metrics and restart the run clock.'''
+    with _lock:
+        _state.clear()
+        _state.update({
+            'started': time.time(),
+            'requests': {},  # endpoint -> {'buckets': [...], 'sum': s, 'count': n, 'status': {code: n}}
+            'counters': {},  # name -> value
+            'stages': {s: 0.0 for s in STAGES},
+            'rows': 0,
+            'bytes_received': 0,
+        })
+
+reset()
+
+
+# recording
+#==========
+def observe_request(endpoint, seconds, nbytes=0, status_code=None):
+    '''Record one HTTP request to `endpoint`.'''
+    with _lock:
+        req = _state['requests'].setdefault(
+            endpoint, {'buckets': [0] * len(LATENCY_BUCKETS), 'sum': 0.0, 'count': 0, 'status': {}}
+        )
+        for i, b in enumerate(LATENCY_BUCKETS):
+            if seconds <= b:
+                req['buckets'][i] += 1
+        req['sum'] += seconds
+        req['count'] += 1
+        code = str(status_code)
+        req['status'][code] = req['status'].get(code, 0) + 1
+        _state['stages']['network'] += seconds
+        _state['bytes_received'] += nbytes
+
+def incr(name, n=1):
+    '''Increment counter `name` (e.g. 'retries', 'token_refreshes').'''
+    with _lock:
+        _state['counters'][name] = _state['counters'].get(name, 0) + n
+
+def add_rows(n):
+    with _lock:
+        _state['rows'] += n
+
+def add_stage_time(stage, seconds):
+    with _lock:
+        _state['stages'][stage] = _state['stages'].get(stage, 0.0) + seconds
+
+@contextmanager
+def timer(stage):
+    '''Context manager adding the elapsed time of its block to `stage`.'''
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_stage_time(stage, time.perf_counter() - t0)
+
+
+# reporting
+#==========
+def summary():
+    '''Return a dict snapshot of the metrics recorded so far.'''
+    with _lock:
+        elapsed = time.time() - _state['started']
+        requests = {}
+        for ep, req in _state['requests'].items():
+            requests[ep] = {
+                'count': req['count'],
+                'latency_sum_seconds': round(req['sum'], 6),
+                'latency_mean_seconds': round(req['sum'] / req['count'], 6) if req['count'] else None,
+                'latency_buckets': {str(b): c for b, c in zip(LATENCY_BUCKETS, req['buckets'])},
+                'status_codes': dict(req['status']),
+            }
+        return {
+            'started': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(_state['started'])),
+            'elapsed_seconds': round(elapsed, 3),
+            'rows': _state['rows'],
+            'rows_per_second': round(_state['rows'] / elapsed, 3) if elapsed > 0 else None,
+            'bytes_received': _state['bytes_received'],
+            'counters': dict(_state['counters']),
+            'stage_seconds': {s: round(v, 6) for s, v in _state['stages'].items()},
+            'requests': requests,
+        }
+
+def prometheus_text(prefix='prosper_etl'):
+    '''Render the metrics in the Prometheus text exposition format.'''
+    s = summary()
+    lines = [
+        f'# TYPE {prefix}_request_seconds histogram',
+    ]
+    for ep, req in s['requests'].items():
+        for b, c in req['latency_buckets'].items():
+            le = '+Inf' if b == 'inf' else b
+            lines.append(f'{prefix}_request_seconds_bucket{{endpoint="{ep}",le="{le}"}} {c}')
+        lines.append(f'{prefix}_request_seconds_sum{{endpoint="{ep}"}} {req["latency_sum_seconds"]}')
+        lines.append(f'{prefix}_request_seconds_count{{endpoint="{ep}"}} {req["count"]}')
+    lines.append(f'# TYPE {prefix}_responses_total counter')
+    for ep, req in s['requests'].items():
+        for code, c in req['status_codes'].items():
+            lines.append(f'{prefix}_responses_total{{endpoint="{ep}",code="{code}"}} {c}')
+    for name, v in s['counters'].items():
+        lines.append(f'# TYPE {prefix}_{name}_total counter')
+        lines.append(f'{prefix}_{name}_total {v}')
+    lines.append(f'# TYPE {prefix}_stage_seconds_total counter')
+    for stage, v in s['stage_seconds'].items():
+        lines.append(f'{prefix}_stage_seconds_total{{stage="{stage}"}} {v}')
+    lines += [
+        f'# TYPE {prefix}_rows_total counter',
+        f'{prefix}_rows_total {s["rows"]}',
+        f'# TYPE {prefix}_bytes_received_total counter',
+        f'{prefix}_bytes_received_total {s["bytes_received"]}',
+        f'# TYPE {prefix}_rows_per_second gauge',
+        f'{prefix}_rows_per_second {s["rows_per_second"] or 0}',
+        f'# TYPE {prefix}_elapsed_seconds gauge',
+        f'{prefix}_elapsed_seconds {s["elapsed_seconds"]}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+def write_summary(log_dir, run_name):
+    '''Write `<run_name>_metrics.json` and `<run_name>_metrics.prom` to `log_dir`.
+    Returns the two file paths.'''
+    json_path = os.path.join(log_dir, f'{run_name}_metrics.json')
+    prom_path = os.path.join(log_dir, f'{run_name}_metrics.prom')
+    with open(json_path, 'w') as f:
+        json.dump(summary(), f, indent=2)
+    with open(prom_path, 'w') as f:
+        f.write(prometheus_text())
+    return json_path, prom_path
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+A local stand-in for the Prosper API, for offline benchmarks and load tests.
+
+Serves the OAuth token, loans, notes, listings and payments endpoints used by
+`prosper_api_tools`, backed by a synthetic portfolio from `synthetic_data` (records that
+follow the column schemas of the ETL scripts and `listings_attributes`). Latency,
+throttling and token expiry are configurable. Data responses carry ETag/Last-Modified validators, and conditional
+requests for unchanged data get a 304. With `--record DIR --upstream URL` it proxies to a
+real API and saves every GET response; with `--replay DIR` it serves those saved responses
+instead.
+
+Point the pipeline at it with:
+    PROSPER_API_BASE_URL=http://127.0.0.1:8765 P2P_USER=eA== P2P_PASSWORD=eA== P2P_ID=eA== P2P_SECRET=eA== \\
+        python -m prosper_etl.prosper_notes_ETL
+"""
+
+import os, ast, json, time, random, hashlib, logging, argparse, threading, uuid, email.utils
+import datetime as dt
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qsl, urlencode
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+
+INVALID_TOKEN = {"code": "SEC0002", "message": "Invalid token"}
+BUREAU_COLUMNS = ('credit_bureau_values_experian', 'credit_bureau_values_transunion', 'credit_bureau_values_transunion_indexed')
+
+
+# synthetic portfolio
+#====================
+def _fmt_date(d):
+    return d.strftime('%Y-%m-%d')
+
+def make_portfolio(n_loans=500, seed=0, today=None):
+    '''Build a synthetic portfolio with `synthetic_data` (so the API serves the same records
+    as the generated benchmark files): dict of lists of json records for 'loans', 'notes',
+    'listings' and 'payments'.'''
+    from . import synthetic_data
+    loans = synthetic_data.make_loans(n_loans, seed, today)
+    frames = {
+        'loans': loans.drop(columns='_default_month'),
+        'notes': synthetic_data.make_notes(loans, seed),
+        'listings': synthetic_data.make_listings(loans, seed=seed),
+        'payments': synthetic_data.make_payments(loans, seed=seed),
+    }
+    portfolio = {name: json.loads(df.to_json(orient='records')) for name, df in frames.items()}
+    for listing in portfolio['listings']:
+        for c in BUREAU_COLUMNS:
+            if listing.get(c):  # (written as str(dict), as the listings ETL does; the API returns objects)
+                listing[c] = ast.literal_eval(listing[c])
+    return portfolio
+
+
+# server
+#=======
+class MockState():
+    '''Configuration and mutable state shared by the request handlers.'''
+    def __init__(self, portfolio=None, latency=0.0, jitter=0.0, rate_limit=None, throttle='delay',
+                 token_ttl=3599, refresh_ttl=36000, replay_dir=None, record_dir=None, upstream=None):
+        self.portfolio = portfolio if portfolio is not None else {}
+        self.latency, self.jitter = latency, jitter
+        self.rate_limit, self.throttle = rate_limit, throttle
+        self.token_ttl, self.refresh_ttl = token_ttl, refresh_ttl
+        self.replay_dir, self.record_dir, self.upstream = replay_dir, record_dir, upstream
+        self.tokens, self.refresh_tokens = {}, {}
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+        self.requests_served = 0
+        self.last_modified = email.utils.formatdate(time.time(), usegmt=True)  # (the data never changes)
+        self.payments_by_loan = {}
+        for p in self.portfolio.get('payments', []):
+            self.payments_by_loan.setdefault(str(p['loan_number']), []).append(p)
+
+    def issue_token(self):
+        now = time.time()
+        access, refresh = str(uuid.uuid4()), str(uuid.uuid4())
+        with self.lock:
+            self.tokens[access] = now + self.token_ttl
+            self.refresh_tokens[refresh] = now + self.refresh_ttl
+        return {"access_token": access, "token_type": "bearer", "refresh_token": refresh,
+                "expires_in": int(self.token_ttl)}
+
+    def wait_for_slot(self):
+        '''Apply the rate limit. Returns False if the request should be rejected (429).'''
+        if not self.rate_limit:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            if slot > now and self.throttle == 'reject':
+                return False
+            self.next_slot = slot + 1.0 / self.rate_limit
+        if slot > now:
+            time.sleep(slot - now)
+        return True
+
+def recording_key(path, query):
+    '''File name for a recorded response: hash of the path and the sorted query.'''
+    q = urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+    return hashlib.sha1(f'{path}?{q}'.encode('utf-8')).hexdigest() + '.json'
+
+def _page(records, query, default_limit=25):
+    offset = int(query.get('offset', 0) or 0)
+    limit = int(query.get('limit', default_limit) or default_limit)
+    page = records[offset:offset + limit]
+    return {"result": page, "result_count": len(page), "total_count": len(records)}
+
+class MockProsperHandler(BaseHTTPRequestHandler):
+    state = None  # set by `make_server`
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, fmt, *args):
+        logging.debug('mock prosper: ' + fmt % args)
+
+    def _send(self, code, body, validators=False):
+        '''Send `body` as json. With `validators`, a 200 carries an ETag and Last-Modified and
+        conditional requests matching them get an empty 304.'''
+        data = json.dumps(body).encode('utf-8')
+        headers = {}
+        if validators and code == 200:
+            headers['ETag'] = '"' + hashlib.sha1(data).hexdigest()[:20] + '"'
+            headers['Last-Modified'] = self.state.last_modified
+            inm, ims = self.headers.get('If-None-Match'), self.headers.get('If-Modified-Since')
+            if (inm == headers['ETag']) if inm else (ims == headers['Last-Modified']):
+                code, data = 304, b''
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _delay(self):
+        st = self.state
+        if st.latency or st.jitter:
+            time.sleep(st.latency + random.random() * st.jitter)
+
+    def _proxy(self, method, body=None):
+        st = self.state
+        headers = {k: v for k, v in self.headers.items() if k.lower() in ('authorization', 'accept', 'timezone', 'content-type')}
+        req = Request(st.upstream + self.path, data=body, headers=headers, method=method)
+        try:
+            with urlopen(req) as resp:
+                code, payload = resp.status, resp.read()
+        except HTTPError as e:
+            code, payload = e.code, e.read()
+        try:
+            parsed = json.loads(payload)
+        except ValueError:
+            parsed = payload.decode('utf-8', 'replace')
+        return code, parsed
+
+    def do_POST(self):
+        st = self.state
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0) or 0))
+        if url.path.rstrip('/') != '/v1/security/oauth/token':
+            return self._send(404, {"code": "NOT_FOUND", "message": url.path})
+        if st.upstream:
+            return self._send(*self._proxy('POST', body))
+        form = dict(parse_qsl(body.decode('utf-8')))
+        self._delay()
+        if form.get('grant_type') == 'password':
+            return self._send(200, st.issue_token())
+        if form.get('grant_type') == 'refresh_token':
+            with st.lock:
+                expiry = st.refresh_tokens.pop(form.get('refresh_token'), 0)
+            if expiry > time.time():
+                return self._send(200, st.issue_token())
+            return self._send(401, {"code": "SEC0001", "message": "Invalid refresh token"})
+        return self._send(400, {"code": "SEC0003", "message": "unsupported grant_type"})
+
+    def do_GET(self):
+        st = self.state
+        url = urlparse(self.path)
+        with st.lock:
+            st.requests_served += 1
+        if not st.wait_for_slot():
+            return self._send(429, {"code": "RATE_LIMIT", "message": "Too many requests"})
+
+        # record / replay
+        if st.replay_dir:
+            fpath = os.path.join(st.replay_dir, recording_key(url.path, url.query))
+            if not os.path.exists(fpath):
+                return self._send(404, {"code": "NOT_RECORDED", "message": self.path})
+            with open(fpath) as f:
+                rec = json.load(f)
+            self._delay()
+            return self._send(rec['status'], rec['body'], validators=True)
+        if st.upstream:
+            code, body = self._proxy('GET')
+            if st.record_dir and code == 200:
+                with open(os.path.join(st.record_dir, recording_key(url.path, url.query)), 'w') as f:
+                    json.dump({'path': self.path, 'status': code, 'body': body}, f)
+            return self._send(code, body)
+
+        # synthetic data
+        token = self.headers.get('Authorization', '').replace('bearer ', '').replace('Bearer ', '')
+        with st.lock:
+            expiry = st.tokens.get(token, 0)
+        if expiry < time.time():
+            return self._send(403, INVALID_TOKEN)
+        self._delay()
+        query = dict(parse_qsl(url.query))
+        path = url.path.rstrip('/')
+        if path == '/v1/loans':
+            records = sorted(st.portfolio['loans'], key=lambda r: r.get(query.get('sort_by', 'origination_date')) or '')
+            return self._send(200, _page(records, query), validators=True)
+        if path == '/v1/notes':
+            records = sorted(st.portfolio['notes'], key=lambda r: r.get(query.get('sort_by', 'origination_date')) or '')
+            return self._send(200, _page(records, query), validators=True)
+        if path == '/listingsvc/v2/listings':
+            records = st.portfolio['listings'] if query.get('invested', 'true') != 'false' else []
+            if query.get('listing_number'):
+                wanted = set(query['listing_number'].split(','))
+                records = [r for r in records if str(r['listing_number']) in wanted]
+            records = sorted(records, key=lambda r: r.get(query.get('sort_by', 'listing_start_date')) or '')
+            return self._send(200, _page(records, query, default_limit=100), validators=True)
+        if path == '/v1/loans/payments':
+            loan_numbers = query.get('loan_number', '').split(',') if query.get('loan_number') else list(st.payments_by_loan)
+            records = [p for ln in loan_numbers for p in st.payments_by_loan.get(ln, [])]
+            if query.get('transaction_effective_date'):
+                start = query['transaction_effective_date']
+                end = _fmt_date(dt.datetime.strptime(start, '%Y-%m-%d').date() + dt.timedelta(days=90))
+                records = [p for p in records if start <= p['transaction_effective_date'] < end]
+            records.sort(key=lambda p: (p['transaction_effective_date'], p['transaction_id']))
+            return self._send(200, _page(records, query, default_limit=100), validators=True)
+        return self._send(404, {"code": "NOT_FOUND", "message": url.path})
+
+def make_server(state, host='127.0.0.1', port=8765):
+    '''Build (but don't start) a threaded mock server bound to `host`:`port` (0 = any free port).'''
+    handler = type('BoundMockProsperHandler', (MockProsperHandler,), {'state': state})
+    return ThreadingHTTPServer((host, port), handler)
+
+def start_server(state, host='127.0.0.1', port=0):
+    '''Start the mock server on a background thread. Returns (server, base_url);
+    call `server.shutdown()` when done.'''
+    server = make_server(state, host, port)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+def main():
+    parser = argparse.ArgumentParser(description='Local mock of the Prosper API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--loans', type=int, default=500, help='number of loans in the synthetic portfolio')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0, help='fixed delay per request (seconds)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random delay per request (seconds)')
+    parser.add_argument('--rate-limit', type=float, default=None, help='max GET requests per second')
+    parser.add_argument('--throttle', choices=['delay', 'reject'], default='delay',
+                        help='queue requests over the rate limit, or reject them with a 429')
+    parser.add_argument('--token-ttl', type=float, default=3599, help='access token lifetime (seconds)')
+    parser.add_argument('--replay', default=None, help='serve recorded responses from this directory')
+    parser.add_argument('--record', default=None, help='record upstream responses to this directory')
+    parser.add_argument('--upstream', default=None, help='proxy to this API (e.g. https://api.prosper.com)')
+    args = parser.parse_args()
+    if args.record and not args.upstream:
+        parser.error('--record needs --upstream')
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+
+    logging.basicConfig(format='%(asctime)s:%(levelname)s:%(message)s', level=logging.INFO)
+    portfolio = None if (args.replay or args.upstream) else make_portfolio(args.loans, args.seed)
+    state = MockState(
+        portfolio, latency=args.latency, jitter=args.jitter, rate_limit=args.rate_limit,
+        throttle=args.throttle, token_ttl=args.token_ttl, replay_dir=args.replay,
+        record_dir=args.record, upstream=args.upstream and args.upstream.rstrip('/'),
+    )
+    server = make_server(state, args.host, args.port)
+    logging.info(f'mock Prosper API listening on http://{args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
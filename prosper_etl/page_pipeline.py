@@ -0,0 +1,212 @@
+"""
+Staged producer/consumer version of the `get_many_*` paging loops.
+
+The sequential loops wait on the network, decode json, build a DataFrame and bz2-compress
+each page in turn on one thread. Here the work is split into stages connected by bounded
+queues:
+    fetch workers (threads) -> parse/transform (thread) -> compress (process pool) -> writer
+so the network stays busy while earlier pages are compressed, and compression runs outside
+the GIL. At most `max_inflight` pages are held in memory at any time: fetch workers block
+until the writer has flushed older pages (backpressure). Pages are written in offset order,
+each as its own bz2 stream, so the output is identical in format to the sequential loops.
+For stream targets (see `jsonl_stream`) pages are written uncompressed as JSON lines, and
+for partition targets (see `partitions`) each page's DataFrame is handed to the partition
+writer, which compresses the changed months once the pull is done.
+"""
+
+import bz2, logging, queue, threading, time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from . import util_funcs, metrics, jsonl_stream, partitions
+
+_END = object()
+
+
+def _compress(raw):
+    '''bz2-compress one page of csv text. Runs in a worker process; returns (bytes, seconds).'''
+    t0 = time.perf_counter()
+    return bz2.compress(raw), time.perf_counter() - t0
+
+def _parse_page(response, column_schema, row_filter=None, jsonl=False, frame=False):
+    '''Decode a page and serialize its rows (no header) as csv bytes, keeping only the rows
+    `row_filter` returns if it's given, or as JSON lines with `jsonl`. With `frame`, the
+    (filtered) DataFrame itself is returned instead of csv bytes.
+    Returns (bytes or DataFrame, result_count, total_count).'''
+    from pandas import DataFrame
+    with metrics.timer('json_decode'):
+        resp_json = response.json()
+    if jsonl:
+        raw = jsonl_stream.encode_records(resp_json.get('result') or [], column_schema)
+        return raw, int(resp_json['result_count']), int(resp_json['total_count'])
+    with metrics.timer('dataframe'):
+        if column_schema:
+            df = DataFrame(resp_json['result'], columns=column_schema)
+        else:
+            df = DataFrame(resp_json['result'])
+        if row_filter is not None:
+            df = row_filter(df)
+        if frame:
+            return df, int(resp_json['result_count']), int(resp_json['total_count'])
+        raw = df.to_csv(index=False, header=False).encode('utf-8') if len(df) else b''
+    return raw, int(resp_json['result_count']), int(resp_json['total_count'])
+
+def _run_round(fetch_page, fpath, column_schema, offsets, limit, fetch_workers, max_inflight, compress_pool, label,
+               on_page=None, row_filter=None):
+    '''Fetch, parse, compress and append the pages at `offsets`, in order (calling `on_page`
+    with each page's response as it's written).
+    The offsets assume full pages: if a page before the end of the data holds other than
+    `limit` rows (the API capped the page size, or rows shifted while paging), the round
+    stops after writing that page and the later pages are dropped.
+    Returns (records written, last total_count seen, True if every page was full).'''
+    inflight = threading.BoundedSemaphore(max_inflight)
+    parse_q = queue.Queue()  # bounded by `inflight`
+    write_q = queue.Queue()
+    stop = threading.Event()
+    jsonl = jsonl_stream.is_stream_target(fpath)
+    frames = partitions.is_partition_target(fpath)
+
+    def fetch(index, offset):
+        try:
+            parse_q.put((index, fetch_page(offset, limit)))
+        except BaseException as e:  # (including sys.exit from get_request)
+            parse_q.put((index, e))
+
+    def feed(pool):
+        for index, offset in enumerate(offsets):
+            inflight.acquire()  # backpressure: wait for the writer to free a slot
+            if stop.is_set():
+                return
+            pool.submit(fetch, index, offset)
+
+    def parse():
+        while True:
+            item = parse_q.get()
+            if item is _END:
+                return
+            index, response = item
+            if isinstance(response, BaseException):
+                write_q.put((index, response, 0, 0, None))
+                continue
+            try:
+                raw, res_cnt, tcnt = _parse_page(response, column_schema, row_filter, jsonl, frames)
+            except Exception as e:
+                write_q.put((index, e, 0, 0, None))
+                continue
+            if not len(raw):
+                data = None
+            elif jsonl or frames:
+                data = (raw, 0.0)  # streamed uncompressed, or staged by the partition writer
+            elif compress_pool:
+                data = compress_pool.submit(_compress, raw)
+            else:
+                data = _compress(raw)
+            write_q.put((index, data, res_cnt, tcnt, response))
+
+    written, total_count, aligned = 0, None, True
+    parser = threading.Thread(target=parse, name='page-parse', daemon=True)
+    parser.start()
+    try:
+        with ThreadPoolExecutor(fetch_workers, thread_name_prefix='page-fetch') as fetch_pool:
+            feeder = threading.Thread(target=feed, args=(fetch_pool,), name='page-feed', daemon=True)
+            feeder.start()
+            pending, next_index = {}, 0
+            try:
+                out = jsonl_stream.sink(fpath) if jsonl else partitions.writer(fpath) if frames else open(fpath, 'ab')
+                with out as f:
+                    while aligned and next_index < len(offsets):
+                        index, data, res_cnt, tcnt, response = write_q.get()
+                        pending[index] = (data, res_cnt, tcnt, response)
+                        while next_index in pending:
+                            data, res_cnt, tcnt, response = pending.pop(next_index)
+                            if isinstance(data, BaseException):
+                                raise data
+                            if data is not None:
+                                if not isinstance(data, tuple):
+                                    data = data.result()
+                                payload, secs = data
+                                metrics.add_stage_time('write', secs)
+                                with metrics.timer('write'):
+                                    f.write(payload)
+                                metrics.add_rows(res_cnt)
+                            if on_page:
+                                on_page(response)
+                            written += res_cnt
+                            total_count = tcnt
+                            next_index += 1
+                            inflight.release()
+                            if res_cnt != limit and offsets[0] + written < tcnt:
+                                # (a short or long page before the end: the later offsets are off)
+                                aligned = False
+                                break
+                        progress_rep = f'{label} processed: {offsets[0] + written}  total_count: {total_count}'
+                        print(progress_rep, end='\r', file=jsonl_stream.progress_file(fpath))
+            finally:
+                stop.set()
+                for _ in range(max_inflight):  # unblock the feeder if we're bailing out early
+                    try:
+                        inflight.release()
+                    except ValueError:
+                        break
+                feeder.join()
+    finally:
+        parse_q.put(_END)
+        parser.join()
+    return written, total_count, aligned
+
+def _sequential_pages(fetch_page, fpath, column_schema, processed, total_count, limit, on_page=None, row_filter=None):
+    '''Append pages one at a time from offset `processed`, moving on by each page's actual
+    result_count (as the `get_many_*` loops do). Returns (records processed, total_count).'''
+    while processed < total_count:
+        response = fetch_page(processed, limit)
+        res_cnt, total_count = util_funcs.write_response_to_disk(
+            response, fpath, column_schema, 'a', cur_iter=processed, total_count=total_count, row_filter=row_filter
+        )
+        if on_page:
+            on_page(response)
+        if res_cnt == 0:
+            break
+        processed += res_cnt
+    return processed, total_count
+
+def pipelined_pages(
+        fetch_page, fpath, column_schema=None, limit=25, mode='w',
+        fetch_workers=4, max_inflight=16, compress_processes=1, label='records', on_page=None, row_filter=None
+    ):
+    '''Pull every page of a paged endpoint into `fpath` using the staged pipeline.
+    `fetch_page(offset, limit)` returns a response (e.g. a wrapped `get_notes_page`).
+    The first page is written with `mode` ('w' writes the csv header); later pages are appended.
+    `compress_processes` = 0 compresses on the parse thread instead of a process pool.
+    `on_page(response)`, if given, is called for every page after it's written, in offset order.
+    `row_filter(df)`, if given, selects the rows of each page to write (see `util_funcs`).
+    Concurrent offsets assume every page but the last holds `limit` rows; as soon as one
+    doesn't, the rest is paged sequentially from the actual record count.
+    Returns (records processed, total_count).'''
+    response = fetch_page(0, limit)
+    processed, total_count = util_funcs.write_response_to_disk(response, fpath, column_schema, mode, row_filter=row_filter)
+    if on_page:
+        on_page(response)
+    aligned = processed == min(limit, total_count)
+    compress = compress_processes and aligned and not partitions.is_partition_target(fpath)
+    compress_pool = ProcessPoolExecutor(compress_processes) if compress else None
+    try:
+        while aligned and processed < total_count:  # (total_count can grow while we pull)
+            offsets = list(range(processed, total_count, limit))
+            written, tcnt, aligned = _run_round(
+                fetch_page, fpath, column_schema, offsets, limit, fetch_workers, max_inflight, compress_pool, label,
+                on_page, row_filter
+            )
+            processed += written
+            if written == 0 or tcnt is None:
+                break
+            total_count = tcnt
+    finally:
+        if compress_pool:
+            compress_pool.shutdown()
+    if not aligned:
+        logging.warning(f'{label}: page sizes differ from limit={limit}; paging the rest of {fpath} sequentially')
+        metrics.incr('pipeline_fallbacks')
+        processed, total_count = _sequential_pages(
+            fetch_page, fpath, column_schema, processed, total_count, limit, on_page, row_filter
+        )
+    print(f'{label} processed: {processed}  total_count: {total_count}', file=jsonl_stream.progress_file(fpath))
+    logging.debug(f'pipelined pull of {fpath}: {processed} of {total_count} {label}')
+    return processed, total_count
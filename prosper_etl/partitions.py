@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Optional month-partitioned layout for the ETL outputs.
+
+A dataset's rows are split by the month of its date column (payments by
+`transaction_effective_date`, listings by `listing_start_date`, notes/loans by
+`origination_date`) into one bz2 csv per month next to the monolithic file, e.g.
+    data/myloans/myloan_payments/2019-03.bz2
+A `_manifest.json` records each partition's row count and content hash, so a refresh only
+rewrites the partitions whose rows actually changed. Readers (`datasets.read_dataset`)
+skip partitions outside the requested date range.
+
+Pulls can write straight into the partitions: `partition_target` gives a target name that
+the `get_many_*` functions accept in place of a file path, so each page's rows are staged
+in their months and only the changed months are compressed when the pull finishes, without
+a monolithic file. `write_partitioned` splits an existing monolithic file the same way.
+
+usage: python -m prosper_etl.partitions payments listings [--keep-missing]
+"""
+
+import os, sys, bz2, json, shutil, hashlib, logging, tempfile, argparse, threading, contextlib
+from . import datasets
+
+MANIFEST = '_manifest.json'
+UNKNOWN = 'unknown'  # partition for rows without a usable date
+PREFIX = 'months:'  # partition targets: PREFIX + partition directory
+
+_targets = {}
+_targets_lock = threading.Lock()
+
+
+def partition_dir(dataset, data_dir=None):
+    '''Directory holding the partitions of `dataset` (the monolithic path without .bz2).'''
+    fpath = datasets.dataset_path(dataset, data_dir)
+    return fpath[:-len('.bz2')] if fpath.endswith('.bz2') else fpath + '_partitions'
+
+def read_manifest(part_dir):
+    fpath = os.path.join(part_dir, MANIFEST)
+    if not os.path.exists(fpath):
+        return {}
+    with open(fpath) as f:
+        return json.load(f)
+
+def _write_manifest(part_dir, manifest):
+    tmp = os.path.join(part_dir, MANIFEST + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, os.path.join(part_dir, MANIFEST))
+
+def _months(dates):
+    '''Partition ('yyyy-mm') of each date, or 'unknown' where there's no usable date.'''
+    text = dates.astype(str)
+    return text.str[:7].where((text.str.len() >= 7) & text.str[:1].str.isdigit(), UNKNOWN)
+
+def _sort_staged(fpath, header, key):
+    '''Rewrite the staged csv rows (no header) in `fpath` ordered by `key`, then by the other
+    columns, so a month's content (and hash) doesn't depend on the order its rows arrived in.'''
+    from pandas import read_csv
+    if not os.path.getsize(fpath):
+        return
+    # read as text so values round-trip unchanged
+    df = read_csv(fpath, header=None, names=header, dtype=str, keep_default_na=False)
+    by = [key] + [c for c in header if c != key] if key in header else list(header)
+    df.sort_values(by, kind='mergesort').to_csv(fpath, index=False, header=False)
+
+def _copy(src, dst, digest, bufsize=1 << 20):
+    '''Copy `src` to `dst` (if given), feeding everything copied to `digest`.'''
+    while True:
+        buf = src.read(bufsize)
+        if not buf:
+            return
+        digest.update(buf)
+        if dst is not None:
+            dst.write(buf)
+
+
+# writing
+#========
+class MonthWriter():
+    '''Stages rows of `dataset` per month and, on `commit`, rewrites the partitions whose
+    content changed. Without `append` the rows written are the whole dataset, and partitions
+    left without rows are deleted (unless `delete_missing` is off); with `append` they're
+    added to the stored partitions (in the stored column order) and nothing is deleted.
+    Rows are staged uncompressed on disk, so memory stays bounded to a month at a time, and
+    only the partitions that are rewritten get compressed. Without `append` each month's rows
+    are sorted by the dataset's key before they're hashed and written, so pulling the same
+    rows in another order (e.g. with concurrent fetches) leaves the partitions unchanged;
+    appended rows keep their arrival order (newest last). File-like (`write` takes a DataFrame), so it can
+    stand in for an open output file. If a `write` fails, `commit` refuses to write anything
+    (a writer that logs and carries on would otherwise drop those rows).'''
+    def __init__(self, dataset, data_dir=None, date_column=None, append=False, delete_missing=True):
+        self.dataset = dataset
+        self.date_column = date_column or datasets.DATASETS[dataset][1]
+        self.key = datasets.DATASETS[dataset][2] if dataset in datasets.DATASETS else None
+        self.part_dir = partition_dir(dataset, data_dir)
+        self.append, self.delete_missing = append, delete_missing and not append
+        os.makedirs(self.part_dir, exist_ok=True)
+        self.manifest = read_manifest(self.part_dir)
+        self.header = self._stored_header() if append else None
+        self._staging = tempfile.mkdtemp(prefix='.staging_', dir=self.part_dir)
+        self._handles, self._rows = {}, {}
+        self._lock = threading.Lock()
+        self.failed = None
+
+    def _stored_header(self):
+        for month in sorted(self.manifest):
+            fpath = os.path.join(self.part_dir, f'{month}.bz2')
+            if os.path.exists(fpath):
+                with bz2.open(fpath, 'rt') as f:
+                    return f.readline().rstrip('\n').split(',')
+        return None
+
+    # (closing is `commit` or `abort`, so the writer can be shared by several pulls)
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write(self, df):
+        '''Stage the rows of `df` in their month partitions.'''
+        if not len(df):
+            return
+        with self._lock:
+            try:
+                if self.header is None:
+                    self.header = list(df.columns)
+                elif list(df.columns) != self.header:
+                    if set(df.columns) != set(self.header):
+                        raise ValueError(f'columns differ from the stored partitions of {self.dataset}')
+                    df = df[self.header]
+                for month, g in df.groupby(_months(df[self.date_column]), sort=False):
+                    if month not in self._handles:
+                        self._handles[month] = open(os.path.join(self._staging, month), 'w')
+                        self._rows[month] = 0
+                    self._handles[month].write(g.to_csv(index=False, header=False))
+                    self._rows[month] += len(g)
+            except Exception as e:
+                self.failed = e
+                raise
+
+    def commit(self):
+        '''Rewrite the changed partitions and the manifest. Returns a dict with lists of
+        'written', 'unchanged' and 'deleted' partition names.'''
+        if self.failed is not None:
+            self.abort()
+            raise RuntimeError(f'{self.dataset} partitions not written: a write failed') from self.failed
+        result = {'written': [], 'unchanged': [], 'deleted': []}
+        with self._lock:
+            try:
+                for h in self._handles.values():
+                    h.close()
+                header = (','.join(self.header) + '\n').encode('utf-8') if self.header else b''
+                for month in sorted(self._handles):
+                    staged = os.path.join(self._staging, month)
+                    fpath = os.path.join(self.part_dir, f'{month}.bz2')
+                    tmp = staged + '.bz2'
+                    digest, rows = hashlib.sha1(header), self._rows[month]
+                    if self.append and month in self.manifest and os.path.exists(fpath):
+                        # stored rows, then the new ones
+                        rows += self.manifest[month]['rows']
+                        with bz2.open(fpath, 'rb') as old, open(staged, 'rb') as src, bz2.open(tmp, 'wb') as dst:
+                            old.readline()
+                            dst.write(header)
+                            _copy(old, dst, digest)
+                            _copy(src, dst, digest)
+                    else:
+                        _sort_staged(staged, self.header, self.key)
+                        with open(staged, 'rb') as src:
+                            _copy(src, None, digest)
+                        if self.manifest.get(month, {}).get('sha1') == digest.hexdigest() and os.path.exists(fpath):
+                            result['unchanged'].append(month)
+                            continue
+                        with open(staged, 'rb') as src, bz2.open(tmp, 'wb') as dst:
+                            dst.write(header)
+                            shutil.copyfileobj(src, dst)
+                    os.replace(tmp, fpath)
+                    self.manifest[month] = {'rows': rows, 'sha1': digest.hexdigest()}
+                    result['written'].append(month)
+                if self.delete_missing:
+                    for month in sorted(set(self.manifest) - set(self._handles)):
+                        fpath = os.path.join(self.part_dir, f'{month}.bz2')
+                        if os.path.exists(fpath):
+                            os.remove(fpath)
+                        del self.manifest[month]
+                        result['deleted'].append(month)
+                _write_manifest(self.part_dir, self.manifest)
+            finally:
+                shutil.rmtree(self._staging, ignore_errors=True)
+        logging.info(
+            f'{self.dataset} partitions: {len(result["written"])} written, {len(result["unchanged"])} unchanged, '
+            f'{len(result["deleted"])} deleted'
+        )
+        return result
+
+    def abort(self):
+        '''Drop the staged rows, leaving the partitions as they were.'''
+        with self._lock:
+            for h in self._handles.values():
+                h.close()
+            shutil.rmtree(self._staging, ignore_errors=True)
+
+def write_partitioned(dataset, data_dir=None, source=None, date_column=None, delete_missing=True, chunksize=200000):
+    '''Split `source` (default: the dataset's monolithic file) into month partitions,
+    rewriting only partitions whose content changed since the last run (see `MonthWriter`).
+    `delete_missing` removes partitions that no longer have any rows (full snapshot refresh).
+    Returns a dict with lists of 'written', 'unchanged' and 'deleted' partition names.'''
+    from pandas import read_csv
+    source = source or datasets.dataset_path(dataset, data_dir)
+    writer = MonthWriter(dataset, data_dir, date_column, delete_missing=delete_missing)
+    try:
+        # read as text so values round-trip unchanged
+        for chunk in read_csv(source, compression='bz2', chunksize=chunksize, dtype=str, keep_default_na=False):
+            writer.write(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.commit()
+
+
+# partition targets
+#==================
+def is_partition_target(fpath):
+    '''True if `fpath` names an open partition target rather than a file.'''
+    return isinstance(fpath, str) and fpath.startswith(PREFIX)
+
+def writer(target):
+    '''The `MonthWriter` of the open partition target `target`.'''
+    with _targets_lock:
+        return _targets[target]
+
+@contextlib.contextmanager
+def partition_target(dataset, data_dir=None, append=False):
+    '''Open a `MonthWriter` for `dataset` (see there for `append`) and yield its target name,
+    to pass to the `get_many_*` functions instead of a file path. The partitions are
+    committed when the block finishes, and left untouched if it raises.'''
+    w = MonthWriter(dataset, data_dir, append=append)
+    target = PREFIX + w.part_dir
+    with _targets_lock:
+        if target in _targets:
+            w.abort()
+            raise ValueError(f'partitions of {dataset} are already being written')
+        _targets[target] = w
+    try:
+        yield target
+    except BaseException:
+        w.abort()
+        raise
+    else:
+        w.commit()
+    finally:
+        with _targets_lock:
+            del _targets[target]
+
+
+# reading
+#========
+def partition_files(dataset, start_date=None, end_date=None, data_dir=None):
+    '''Partition files of `dataset` that can hold rows in [start_date, end_date), in month order.
+    The 'unknown' partition is only included when no date range is given.'''
+    part_dir = partition_dir(dataset, data_dir)
+    months = sorted(read_manifest(part_dir))
+    lo = start_date[:7] if start_date else None
+    hi = end_date[:7] if end_date else None
+    files = []
+    for month in months:
+        if month == UNKNOWN:
+            if lo or hi:
+                continue
+        elif (lo and month < lo) or (hi and month > hi):
+            continue
+        files.append(os.path.join(part_dir, f'{month}.bz2'))
+    return files
+
+def main():
+    parser = argparse.ArgumentParser(description='(Re)build month partitions of ETL outputs.')
+    parser.add_argument('datasets', nargs='+', choices=list(datasets.DATASETS))
+    parser.add_argument('--data-dir', default=None)
+    parser.add_argument('--keep-missing', action='store_true', help="don't delete partitions that have no rows anymore")
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s:%(levelname)s:%(message)s', level=logging.INFO)
+    for ds in args.datasets:
+        res = write_partitioned(ds, args.data_dir, delete_missing=not args.keep_missing)
+        print(f'{ds}: {len(res["written"])} written, {len(res["unchanged"])} unchanged, {len(res["deleted"])} deleted')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Permanent cache of closed payment windows for `prosper_api_tools.get_many_payments`.
+
+Payments are pulled per batch of loans in 90 day windows. Once a window has ended (plus
+`SETTLE_DAYS` for late postings and reversals), its payments for a fixed set of loans never
+change, so its rows are stored once under a content address - a hash of the API base url,
+the sorted loan numbers and the window start - and every later run writes them straight from
+disk without a request. Windows still open are always fetched.
+
+Entries live in `~/.cache/prosper_etl/payments/` (override with PROSPER_PAYMENTS_CACHE;
+'off' disables the cache) as bz2 compressed JSON pages, and are never evicted: delete the
+directory to start over. PROSPER_PAYMENTS_SETTLE_DAYS (default 30) sets how long after its
+end a window is considered final.
+"""
+
+import os, bz2, json, hashlib, logging, threading
+import datetime as dt
+
+CACHE_DIR = os.environ.get(
+    'PROSPER_PAYMENTS_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'prosper_etl', 'payments')
+)
+WINDOW_DAYS = 90
+SETTLE_DAYS = int(os.environ.get('PROSPER_PAYMENTS_SETTLE_DAYS', 30))
+
+
+def enabled():
+    return CACHE_DIR.lower() not in ('off', '0', 'false', '')
+
+def is_closed(window_start, today=None):
+    '''True if the window starting on `window_start` (a date) ended at least `SETTLE_DAYS` ago.'''
+    today = today or dt.date.today()
+    return window_start + dt.timedelta(days=WINDOW_DAYS + SETTLE_DAYS) <= today
+
+def window_key(base_url, loan_numbers, window_start):
+    '''Content address of a window: `loan_numbers` is a comma separated string or an iterable.'''
+    if isinstance(loan_numbers, str):
+        loan_numbers = loan_numbers.split(',')
+    loans = ','.join(sorted(str(ln).strip() for ln in loan_numbers))
+    return hashlib.sha256(f'{base_url}|{loans}|{window_start:%Y-%m-%d}'.encode('utf-8')).hexdigest()
+
+def _path(key):
+    return os.path.join(CACHE_DIR, key[:2], key + '.json.bz2')
+
+
+class WindowPage():
+    '''All payments of a cached window as one page, with the `json()` of an API response (so it
+    can be written with `util_funcs.write_response_to_disk`).'''
+    def __init__(self, records):
+        self.records = records
+        self.status_code = 200
+
+    def json(self):
+        return {'result': self.records, 'result_count': len(self.records), 'total_count': len(self.records)}
+
+def cached(key):
+    '''True if the window `key` is in the cache (without reading it).'''
+    return enabled() and os.path.exists(_path(key))
+
+def cached_keys():
+    '''Keys of every window in the cache, from one pass over the cache directory (empty if
+    the cache is off), for checking many windows without a file lookup each.'''
+    keys = set()
+    if not enabled() or not os.path.isdir(CACHE_DIR):
+        return keys
+    for sub in os.scandir(CACHE_DIR):
+        if sub.is_dir():
+            keys.update(e.name[:-len('.json.bz2')] for e in os.scandir(sub.path) if e.name.endswith('.json.bz2'))
+    return keys
+
+def load(key):
+    '''The cached window for `key` as a `WindowPage`, or None.'''
+    if not enabled():
+        return None
+    fpath = _path(key)
+    try:
+        with bz2.open(fpath, 'rt') as f:
+            return WindowPage(json.load(f)['result'])
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        logging.warning(f'ignoring unreadable payments window {fpath}: {str(e)}')
+        return None
+
+def save(key, records):
+    '''Store a closed window's records (write once; an existing entry is kept).'''
+    if not enabled():
+        return
+    fpath = _path(key)
+    if os.path.exists(fpath):
+        return
+    os.makedirs(os.path.dirname(fpath), mode=0o700, exist_ok=True)
+    tmp = f'{fpath}.{os.getpid()}.{threading.get_ident()}.tmp'
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as raw, bz2.open(raw, 'wt') as f:
+        json.dump({'result': records}, f, separators=(',', ':'))
+    os.replace(tmp, fpath)
+
+class Recorder():
+    '''Wraps a `fetch_page(offset, limit)` function and keeps the pages it returns, so a fully
+    fetched window can be saved with `records()`.'''
+    def __init__(self, fetch_page):
+        self.fetch_page = fetch_page
+        self.pages = {}  # offset -> response
+        self.lock = threading.Lock()
+
+    def __call__(self, offset, limit):
+        response = self.fetch_page(offset, limit)
+        with self.lock:
+            self.pages[offset] = response
+        return response
+
+    def records(self):
+        '''The window's records, following the pages from offset 0 by their result counts (pages
+        at other offsets, such as ones a pipelined round dropped, are ignored), or None if they
+        don't add up to the endpoint's total_count (a partial pull is never cached).'''
+        records, total, offset = [], None, 0
+        while offset in self.pages:
+            page = self.pages[offset].json()
+            result = page.get('result') or []
+            records.extend(result)
+            total = page.get('total_count')
+            if not result:
+                break
+            offset += len(result)
+        if total is None or len(records) != int(total):
+            return None
+        return records
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Runs one of the ETL scripts under cProfile, including the threads it starts (page fetchers,
+pipeline stages); worker processes aren't profiled.
+Writes the raw profile (`<script>_<timestamp>.prof`, loadable with pstats/snakeviz) and a
+top-N hot-function report (`<script>_<timestamp>_profile.txt`) to the script's `--log-dir`
+if it's given one, else the logs directory (PROSPER_LOG_DIR, else logs/ under the current
+directory).
+
+usage: prosper-etl profile prosper_notes_ETL [--top 30] [--sort cumulative] [script args] [-- script args]
+(--top and --sort are the profiler's own; any other arguments, and everything after `--`,
+are passed to the script, which is named by its `prosper_etl` module, with or without .py)
+"""
+
+import os, sys, argparse, cProfile, pstats, io, runpy, time, threading
+
+class _ThreadProfilers():
+    '''`threading.setprofile` hook giving every thread started while it's set its own
+    profiler (before Python 3.12 a cProfile profiler only sees the thread that enabled it).'''
+    def __init__(self):
+        self.profilers = []
+        self._lock = threading.Lock()
+
+    def __call__(self, frame, event, arg):
+        # first event in a new thread: hand the thread over to a profiler of its own
+        profiler = cProfile.Profile()
+        with self._lock:
+            self.profilers.append(profiler)
+        profiler.enable()
+
+def _script_log_dir(script_args):
+    '''The `--log-dir` given to the profiled script, if any.'''
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    parser.add_argument('--log-dir', default=None)
+    return parser.parse_known_args(list(script_args))[0].log_dir
+
+def profile_script(script, script_args=(), top=30, sort='cumulative', log_dir=None):
+    '''Run the `prosper_etl` module `script` as __main__ under cProfile and write the profile and report to `log_dir`
+    (default: the script's `--log-dir`, else `datasets.LOG_DIR`). Threads the script starts
+    are profiled too and merged into the same stats. Returns (profile path, report path).'''
+    from . import datasets
+    log_dir = log_dir or _script_log_dir(script_args) or datasets.LOG_DIR
+    os.makedirs(log_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(script))[0]
+    stamp = time.strftime('%Y%m%d_%H%M%S')
+    prof_path = os.path.join(log_dir, f'{name}_{stamp}.prof')
+    report_path = os.path.join(log_dir, f'{name}_{stamp}_profile.txt')
+
+    # run the script the way `python -m` would
+    old_argv = sys.argv
+    sys.argv = [name] + list(script_args)
+    profiler = cProfile.Profile()
+    # (from 3.12 one profiler sees every thread)
+    threads = _ThreadProfilers() if sys.version_info < (3, 12) else None
+    if threads:
+        threading.setprofile(threads)
+    t0 = time.time()
+    exit_code = 0
+    try:
+        profiler.runcall(runpy.run_module, f'{__package__}.{name}', run_name='__main__', alter_sys=True)
+    except SystemExit as e:
+        exit_code = e.code
+    finally:
+        sys.argv = old_argv
+        if threads:
+            threading.setprofile(None)
+    elapsed = time.time() - t0
+
+    out = io.StringIO()
+    out.write(f'{name}: {elapsed:.2f}s wall, exit code {exit_code}')
+    stats = pstats.Stats(profiler, stream=out)
+    if threads and threads.profilers:
+        stats.add(*threads.profilers)
+        out.write(f', {len(threads.profilers)} threads')
+    out.write('\n\n')
+    stats.dump_stats(prof_path)
+    stats.strip_dirs().sort_stats(sort)
+    stats.print_stats(top)
+    with open(report_path, 'w') as f:
+        f.write(out.getvalue())
+    return prof_path, report_path
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile an ETL script.')
+    parser.add_argument('script', help='ETL script to run, e.g. prosper_notes_ETL')
+    parser.add_argument('--top', type=int, default=30, help='number of functions in the report')
+    parser.add_argument('--sort', default='cumulative', help='pstats sort key (cumulative, tottime, ncalls...)')
+    argv = sys.argv[1:]
+    split = argv.index('--') if '--' in argv else len(argv)
+    # (unknown options go to the script, as does everything after `--`)
+    args, script_args = parser.parse_known_args(argv[:split])
+    script_args += argv[split + 1:]
+    prof_path, report_path = profile_script(args.script, script_args, top=args.top, sort=args.sort)
+    print(f'profile written to {prof_path}')
+    print(f'report written to {report_path}')
+
+if __name__ == '__main__':
+    main()
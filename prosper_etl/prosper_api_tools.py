@@ -0,0 +1,572 @@
+"""
+The request functions enable the password-flow described on the prosper website:
+https://developers.prosper.com/docs/authenticating-with-oauth-2-0/password-flow/
+"""
+
+import logging, time, sys, os, threading, bz2
+from . import util_funcs, metrics, page_pipeline, http_transport, http_cache, jsonl_stream
+import datetime as dt
+from urllib.parse import urlparse
+
+# base address of the Prosper API; point this at a local stand-in (see mock_prosper_server.py)
+# with the PROSPER_API_BASE_URL environment variable to run the pipelines offline
+BASE_URL = os.environ.get('PROSPER_API_BASE_URL', 'https://api.prosper.com').rstrip('/')
+
+
+# shared transport and rate budget
+#=================================
+# one connection pool for every call in the process, so pipelines running in threads
+# share keep-alive connections, the token and the request rate budget; the transport
+# (requests, httpx or httpx over HTTP/2) is chosen by PROSPER_HTTP_TRANSPORT or `set_transport`
+_transport = None
+_transport_lock = threading.Lock()
+_rate_limiter = None
+_account_limiters = {}  # profile -> RateLimiter
+_refresh_lock = threading.Lock()
+
+class RateLimiter():
+    '''Token bucket allowing `rate` requests per second (bursts of up to `burst`),
+    shared by all threads calling `get_request`.'''
+    def __init__(self, rate, burst=1):
+        self.rate, self.burst = float(rate), float(burst)
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+            self.tokens -= 1
+        if wait > 0:
+            time.sleep(wait)
+
+def set_rate_limit(requests_per_second, burst=1, profile=None):
+    '''Cap the request rate of every `get_request` call in this process (None to remove the cap).
+    With `profile`, the cap applies only to requests made with that account's token
+    (see `initiate_conn`), giving each account its own rate budget.'''
+    global _rate_limiter
+    limiter = RateLimiter(requests_per_second, burst) if requests_per_second else None
+    if profile:
+        _account_limiters[profile] = limiter
+    else:
+        _rate_limiter = limiter
+
+def set_transport(name=None):
+    '''Use the transport `name` (see `http_transport.TRANSPORTS`) for every request from now on.'''
+    global _transport
+    new = http_transport.make_transport(name)
+    with _transport_lock:
+        old, _transport = _transport, new
+    if old is not None:
+        old.close()
+    logging.info(f'http transport: {new.name}')
+
+def _get_transport():
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = http_transport.make_transport()
+    return _transport
+
+# setup session access
+#=====================
+def request_access(client_id, client_secret, username, password):
+    '''Use this function on first access. A dictionary is returned with the following format:
+        {
+           "access_token": "22a5aaaf-bb7b-4278",
+           "token_type": "bearer",
+           "refresh_token": "7fcb8a8a-e7dd-4fa9",
+           "expires_in": 3599
+        }
+    The refresh_token expires in 10 hours. This may be used to get a new token with the 
+    request_refresh method. While active, the access_token may be used to make calls to Prosper APIs.'''
+    url = f"{BASE_URL}/v1/security/oauth/token"
+    payload = ("grant_type=password&client_id=%s&client_secret=%s" %(client_id, client_secret) +
+               "&username=%s&password=%s" %(username, password))
+    headers = { 'accept': "application/json",
+                'content-type': "application/x-www-form-urlencoded" }
+    response = _get_transport().request("POST", url, data=payload, headers=headers)
+    return response
+
+def request_refresh(client_id, client_secret, token):
+    '''Use this function to get a new access_token within the refresh token window.'''
+    url = f"{BASE_URL}/v1/security/oauth/token"
+    payload = ("grant_type=refresh_token&client_id=%s&client_secret=%s" %(client_id, client_secret) +
+               "&refresh_token=%s" %(token))
+    headers = { 'accept': "application/json",
+                'content-type': "application/x-www-form-urlencoded" }
+    response = _get_transport().request("POST", url, data=payload, headers=headers)
+    return response
+
+def initiate_conn(profile=None):
+    '''Password grant for the default account, or for the credentials `profile` (see creds).'''
+    from . import creds
+    pc = creds.ProsperClient(profile)
+    for i in range(3):
+        access_response = request_access(pc.id, pc.secret, pc.username, pc.password)
+        if access_response.status_code != 200:
+            logging.error(f'try #{i+1}: trouble with connection to Prosper: code {access_response.status_code}')
+            time.sleep(2)
+            if i == 2:
+                sys.exit(1)
+        else:
+            logging.info(f'established connection to prosper{f" for {profile}" if profile else ""}')
+        break
+    del pc
+    return access_response
+
+def get_tokens(profile=None):
+    '''Token dict for the default account or `profile`, reusing the on-disk token cache (see
+    token_cache): a still-valid cached access token is returned as is, else the cached refresh
+    token is used, and the password grant (`initiate_conn`) is the last resort.'''
+    from . import token_cache
+    if http_cache.offline():  # (replaying from the response cache: no token needed)
+        return {'access_token': 'offline', 'token_type': 'bearer', 'refresh_token': 'offline', 'expires_in': 0}
+    cached = token_cache.load(profile, BASE_URL)
+    if token_cache.access_valid(cached):
+        logging.info('reusing cached access token')
+        return cached
+    if token_cache.refresh_valid(cached):
+        from . import creds
+        pc = creds.ProsperClient(profile)
+        refresh_response = request_refresh(pc.id, pc.secret, cached['refresh_token'])
+        del pc
+        if refresh_response.status_code == 200:
+            logging.info('refreshed cached token')
+            tokens = refresh_response.json()
+            token_cache.save(profile, BASE_URL, tokens, previous=cached)
+            return tokens
+        logging.info(f'cached refresh token rejected (code {refresh_response.status_code}); using password grant')
+    tokens = initiate_conn(profile).json()
+    token_cache.save(profile, BASE_URL, tokens)
+    return tokens
+
+def account_tokens(profile=None):
+    '''Token dict for `profile`, tagged so that refreshes use that account's credentials and
+    requests draw on that account's rate budget. Pass it wherever `token_json` is expected.'''
+    tokens = get_tokens(profile)
+    tokens['_profile'] = profile
+    return tokens
+
+# General API
+#============
+def get_request(url, token_json, timezn='America/Denver', tries=3):
+    '''GET `url`, retrying and refreshing the token as needed. Responses are cached on disk and
+    revalidated with conditional requests (see http_cache); in offline mode they come from the
+    cache only.'''
+    headers={
+        'Authorization': f'bearer {token_json["access_token"]}',
+        'Accept': 'application/json',
+        'timezone': timezn
+    }
+    endpoint = urlparse(url).path
+    key = http_cache.cache_key(url, token_json.get('_profile'), timezn)
+    cached = http_cache.lookup(key)
+    if http_cache.offline() or http_cache.fresh(cached):
+        if cached is None:
+            logging.error(f'offline: no cached response for {url}')
+            sys.exit(1)
+        http_cache.touch(key)
+        metrics.incr('http_cache_hits')
+        return cached
+    headers.update(http_cache.conditional_headers(cached))
+    for i in range(tries):
+        if i > 0:
+            metrics.incr('retries')
+        limiter = _account_limiters.get(token_json.get('_profile'), _rate_limiter)
+        if limiter:
+            limiter.acquire()
+        t0 = time.perf_counter()
+        response = _get_transport().request("GET", url, headers=headers)
+        metrics.observe_request(endpoint, time.perf_counter() - t0, len(response.content), response.status_code)
+        if response.status_code == 200:  # success!
+            if http_cache.store(key, url, response):
+                metrics.incr('http_cache_stores')
+            break
+        elif response.status_code == 304 and cached is not None:  # unchanged since cached
+            http_cache.revalidated(key, cached)
+            metrics.incr('http_cache_revalidated')
+            return cached
+        elif ((response.status_code == 403) & (response.json() == {"code":"SEC0002","message":"Invalid token"})):
+            logging.info('token expired; attempting refresh ...')
+            metrics.incr('token_refreshes')
+            # refresh token (in place, so every caller sharing `token_json` picks up the new one)
+            with _refresh_lock:
+                if headers['Authorization'] == f'bearer {token_json["access_token"]}':  # not refreshed by another thread yet
+                    from . import creds, token_cache
+                    profile = token_json.get('_profile')
+                    pc = creds.ProsperClient(profile)
+                    refresh_tkn = token_json['refresh_token']
+                    refresh_response = request_refresh(pc.id, pc.secret, refresh_tkn)
+                    del pc
+                    previous = token_cache.load(profile, BASE_URL)
+                    if refresh_response.status_code == 200:
+                        token_json.update(refresh_response.json())
+                        logging.info('token refreshed')
+                    else:
+                        # (e.g. a cached refresh token that was revoked) start over with the password grant
+                        logging.warning(f'token refresh failed: code {refresh_response.status_code}; using password grant')
+                        token_json.update(initiate_conn(profile).json())
+                        previous = None
+                    token_cache.save(profile, BASE_URL, token_json, previous=previous)
+            headers['Authorization'] = f'bearer {token_json["access_token"]}'
+        elif ((response.status_code == 401)):
+            logging.error(f'bad Prosper credentials: {response.text}')
+            sys.exit(1)
+        else:
+            logging.warning(
+                f'try #{i+1}: trouble getting data: code {response.status_code}: response: {response.text}'
+            )
+            if i+1 == tries:  # fail at 3 tries
+                logging.error('script failed after too many tries')
+                sys.exit(1)
+    return response
+
+
+def _append_schema(fpath, column_schema):
+    '''Columns to append rows to `fpath` with: the stored header, so appended rows line up
+    with the existing file whatever order `column_schema` lists them in. Refuses to append
+    when the stored columns differ from `column_schema`.'''
+    with bz2.open(fpath, 'rt') as f:
+        header = f.readline().rstrip('\n').split(',')
+    if column_schema is not None and set(header) != set(column_schema):
+        raise ValueError(
+            f'columns of {fpath} differ from the requested schema; rewrite it instead of appending '
+            f'(stored only: {sorted(set(header) - set(column_schema))}, '
+            f'requested only: {sorted(set(column_schema) - set(header))})'
+        )
+    return header
+
+
+# Loans API
+#==========
+def get_loans_page(token_json, offset, limit=25, sort_by='origination_date', timezn='America/Denver'):
+    '''Get loan data from Prosper on loans that are owned. See API documentation for full details,
+    query parameters, and examples:
+        https://developers.prosper.com/docs/investor/loans-api/
+    Note that the offset default is 0, and the limit default/max is 25.
+    '''
+    url = f'{BASE_URL}/v1/loans/?offset={offset}&limit={limit}&sort_by={sort_by}'
+    response = get_request(url, token_json, timezn)
+    return response  # only returns on success
+
+def get_many_loans(
+        fpath, token_json, limit=25, column_schema=None, timezn='America/Denver', on_page=None, workers=None,
+        row_filter=None
+    ):
+    '''Get all of my loans from Prosper (same paging as `prosper_owned_loans_ETL.py`).
+    `on_page`, if given, is called with each page's response after it's written, so
+    downstream work (e.g. payments) can start before the whole pull finishes.
+    With `workers`, pages are pulled by that many concurrent fetchers (see `page_pipeline`).
+    With `row_filter` (e.g. a `row_hashes.RowHashStore`), only the rows it returns are
+    written, appended to `fpath` if it exists.'''
+    mode = 'a' if row_filter is not None and os.path.exists(fpath) else 'w'
+    if mode == 'a':
+        column_schema = _append_schema(fpath, column_schema)
+    if workers:
+        page_pipeline.pipelined_pages(
+            lambda offset, lim: get_loans_page(token_json, offset, lim, timezn=timezn),
+            fpath, column_schema, limit=limit, mode=mode, fetch_workers=workers, label='loans', on_page=on_page,
+            row_filter=row_filter
+        )
+        return 1
+    response = get_loans_page(token_json, 0, limit, timezn=timezn)
+    loans_processed, total_count = util_funcs.write_response_to_disk(
+        response, fpath, column_schema=column_schema, mode=mode, cur_iter=0, row_filter=row_filter
+    )
+    if on_page:
+        on_page(response)
+    while loans_processed < total_count:
+        progress_rep = f'loans processed: {loans_processed}  total_count: {total_count}'
+        print(progress_rep, end='\r', file=jsonl_stream.progress_file(fpath))
+        response = get_loans_page(token_json, loans_processed, limit, timezn=timezn)
+        res_count, tcnt = util_funcs.write_response_to_disk(
+            response, fpath, column_schema=column_schema, mode='a', cur_iter=loans_processed, total_count=total_count,
+            row_filter=row_filter
+        )
+        if on_page:
+            on_page(response)
+        # update iters
+        total_count = tcnt  # (note: this could increase if loans are purchased during query)
+        loans_processed += res_count
+        print('\b'*len(progress_rep), end='\r', file=jsonl_stream.progress_file(fpath))
+    progress_rep = f'loans processed: {loans_processed}  total_count: {total_count}'
+    print(progress_rep, file=jsonl_stream.progress_file(fpath))
+    return 1
+
+
+# Notes API
+#==========
+def get_notes_page(token_json, offset, limit=25, sort_by='origination_date', timezn='America/Denver'):
+    '''Get a page of notes from Prosper.'''
+    url = f'{BASE_URL}/v1/notes/?offset={offset}&limit={limit}&sort_by={sort_by}'
+    response = get_request(url, token_json, timezn)
+    return response  # only returns on success
+
+def get_many_notes(fpath, token_json, limit=50, column_schema=None, timezn='America/Denver', workers=None, row_filter=None):
+    '''Get all of my notes from Prosper.
+    With `workers`, pages are pulled by that many concurrent fetchers (see `page_pipeline`).
+    With `row_filter`, only the rows it returns are written (see `get_many_loans`).'''
+    # get first page
+    offset = 0
+    limit = 50
+    mode = 'a' if row_filter is not None and os.path.exists(fpath) else 'w'
+    if mode == 'a':
+        column_schema = _append_schema(fpath, column_schema)
+    if workers:
+        page_pipeline.pipelined_pages(
+            lambda offset, lim: get_notes_page(token_json, offset, lim, timezn=timezn),
+            fpath, column_schema, limit=limit, mode=mode, fetch_workers=workers, label='notes', row_filter=row_filter
+        )
+        return 1
+    logging.debug('getting first page...')
+    response = get_notes_page(token_json, offset, limit)
+    logging.debug('writing first page to disk...')
+    notes_processed, total_notes = util_funcs.write_response_to_disk(
+        response, fpath, column_schema, mode, row_filter=row_filter
+    )
+    logging.debug('finished first page write')
+    #get subsequent pages
+    logging.debug('getting subsequent pages...')
+    while notes_processed < total_notes:
+        progress_rep = f'notes processed: {notes_processed}  total_notes: {total_notes}'
+        print(progress_rep, end='', file=jsonl_stream.progress_file(fpath))
+        response = get_notes_page(token_json, notes_processed, limit)
+        notes_proc, tnts = util_funcs.write_response_to_disk(
+            response, fpath, column_schema, 'a', cur_iter=notes_processed, total_count=total_notes, row_filter=row_filter
+        )
+        # update iters
+        notes_processed += notes_proc
+        total_notes = tnts
+        print('\b'*len(progress_rep), end='', file=jsonl_stream.progress_file(fpath))
+    progress_rep = f'notes processed: {notes_processed}  total_notes: {total_notes}'
+    print(progress_rep, file=jsonl_stream.progress_file(fpath))
+    return 1
+
+
+# Listings API
+#=============
+def get_listings_page(
+        token_json, offset, limit=100,
+        include_credit_bureau_values='experian,transunion',
+        biddable='false',
+        invested='true',
+        sort_by='listing_start_date',
+        timezn='America/Denver',
+        listing_number=None
+    ):
+    '''Get a page from Prosper listings.
+    See API details at: https://developers.prosper.com/docs/investor/listings-api/
+    `listing_number` optionally restricts the page to a comma separated list of listings.
+    
+    Note: All listings objects that were generated prior to March 31st, 2017 contained Experian credit bureau data. After March 31st, 2017, all new listings contain only TransUnion credit bureau data.'''
+    
+    BASE_ADDRESS = f'{BASE_URL}/listingsvc/v2/listings/'  # (Different for listings)
+    q1 = f'?offset={offset}&limit={limit}&include_credit_bureau_values={include_credit_bureau_values}'
+    if invested not in ('null','Null','NULL', None):
+        q2 = f'&biddable={biddable}&invested={invested}&sort_by={sort_by}'
+    else:
+        q2 = f'&biddable={biddable}&sort_by={sort_by}'
+    q3 = f'&listing_number={listing_number}' if listing_number else ''
+    url = BASE_ADDRESS + q1 + q2 + q3
+    response = get_request(url, token_json, timezn)
+    return response
+
+def get_many_listings(
+        fpath, token_json, biddable, invested, column_schema=None, sort_by='listing_start_date', workers=None,
+        row_filter=None
+    ):
+    mode = 'a' if row_filter is not None and os.path.exists(fpath) else 'w'
+    if mode == 'a':
+        column_schema = _append_schema(fpath, column_schema)
+    if workers:
+        page_pipeline.pipelined_pages(
+            lambda offset, lim: get_listings_page(token_json, offset, lim, biddable=biddable, invested=invested),
+            fpath, column_schema, limit=100, mode=mode, fetch_workers=workers, label='listings', row_filter=row_filter
+        )
+        return 1
+    # get first page
+    response = get_listings_page(token_json, 0, biddable=biddable, invested=invested)
+    listings_processed, total_count = util_funcs.write_response_to_disk(
+        response, fpath, column_schema, mode, row_filter=row_filter
+    )
+    while listings_processed < total_count:
+        # print progress
+        progress_rep = f'listings processed: {listings_processed}  total_count: {total_count}'
+        print(progress_rep, end='\r', file=jsonl_stream.progress_file(fpath))
+        # get next page, write to file
+        response = get_listings_page(token_json, listings_processed, biddable=biddable, invested=invested)
+        li_proc, tcnt = util_funcs.write_response_to_disk(
+            response, fpath, column_schema, mode='a', cur_iter=listings_processed, total_count=total_count,
+            row_filter=row_filter
+        )
+        # update iters
+        listings_processed += li_proc
+        total_count = tcnt  # (count may change as query runs; although this is probably rare)
+        print('\b'*len(progress_rep), end='\r', file=jsonl_stream.progress_file(fpath))
+    progress_rep = f'listings processed: {listings_processed}  total_count: {total_count}'
+    print(progress_rep, end='\n', file=jsonl_stream.progress_file(fpath))
+    return 1
+        
+    
+def get_all_owned_listings(fpath, token_json, column_schema=None, sort_by='listing_start_date', workers=None, row_filter=None):
+    res = get_many_listings(
+        fpath, token_json, biddable='false', invested='true', column_schema=column_schema, sort_by='listing_start_date',
+        workers=workers, row_filter=row_filter
+    )
+    return res
+    
+def get_owned_listings_by_number(fpath, token_json, listing_numbers, column_schema=None, batch_size=25, workers=None):
+    '''Get owned listings by listing number, `batch_size` listings per request, appending
+    them to `fpath` (created if it doesn't exist). Used to backfill only the listings that
+    are missing from `fpath`.'''
+    listing_numbers = [str(ln) for ln in listing_numbers]
+    if os.path.exists(fpath):
+        column_schema = _append_schema(fpath, column_schema)
+    for i in range(0, len(listing_numbers), batch_size):
+        batch = ','.join(listing_numbers[i:i + batch_size])
+        fetch = lambda offset, lim: get_listings_page(
+            token_json, offset, lim, biddable='false', invested='true', listing_number=batch
+        )
+        mode = 'a' if os.path.exists(fpath) else 'w'
+        if workers:
+            page_pipeline.pipelined_pages(
+                fetch, fpath, column_schema, limit=batch_size, mode=mode, fetch_workers=workers, compress_processes=0,
+                label='listings'
+            )
+        else:
+            processed, total_count = util_funcs.write_response_to_disk(fetch(0, batch_size), fpath, column_schema, mode)
+            while processed < total_count:
+                res_cnt, total_count = util_funcs.write_response_to_disk(
+                    fetch(processed, batch_size), fpath, column_schema, 'a', cur_iter=processed, total_count=total_count
+                )
+                if res_cnt == 0:
+                    break
+                processed += res_cnt
+        logging.info(f'listings backfilled: {min(i + batch_size, len(listing_numbers))} of {len(listing_numbers)}')
+    return 1
+
+def get_active_listings(fpath, token_json, sort_by='listing_start_date'):
+    res = get_many_listings(fpath, token_json, biddable='true', invested='null', sort_by='listing_start_date')
+    return res
+
+def get_unbid_active_listings(fpath, token_json, sort_by='listing_start_date'):
+    res = get_many_listings(fpath, token_json, biddable='true', invested='false', sort_by='listing_start_date')
+    return res
+
+def get_bid_on_active_listings(fpath, token_json, sort_by='listing_start_date'):
+    res = get_many_listings(fpath, token_json, biddable='true', invested='true', sort_by='listing_start_date')
+    return res
+
+def update_owned_listings():
+    pass
+
+
+# Get payments
+#=============
+def get_payment_page(
+        token_json, offset, loan_number, limit=100,
+        transaction_effective_date=None,
+        timezn='America/Denver'
+    ):
+    '''Get a page from Prosper listings.
+    See API details at: https://developers.prosper.com/docs/investor/payments-api/
+    '''
+    BASE_ADDRESS = f'{BASE_URL}/v1/loans/payments/'
+    q1 = f'?offset={offset}&limit={limit}'
+    q2 = f'&transaction_effective_date={transaction_effective_date}' if transaction_effective_date else ''
+    q3 = f'&loan_number={loan_number}' if loan_number else ''
+    url = BASE_ADDRESS + q1 + q2 + q3
+    response = get_request(url, token_json, timezn)
+    return response
+
+def get_many_payments(
+        fpath, token_json, loan_number, limit=100,
+        # file_mode='w',
+        column_schema=None, transaction_effective_date=None,
+        timezn='America/Denver', workers=None
+        ):
+    '''note: loan_number can be a list of loans separated by commas.
+    transaction_effective_date format is 'yyyy-mm-dd'
+    With `workers`, the pages of each 90 day period are pulled by that many concurrent
+    fetchers (see `page_pipeline`; compression stays in-thread since periods are short).
+    Periods that closed long enough ago are written from the payments window cache without a
+    request, and stored there once fetched (see `payment_windows`).
+    '''
+    from pandas import date_range
+    from . import payment_windows
+    print(f'Retrieving payments for loans: {loan_number}', file=jsonl_stream.progress_file(fpath))
+    if transaction_effective_date:
+        # get transactions for each 90 day period
+        te_date = dt.datetime.strptime(transaction_effective_date, '%Y-%m-%d').date()
+        date_periods = date_range(te_date, dt.datetime.now().date(), freq='90D')
+    else:
+        # get first loan date
+        try:
+            first_owned_loan = get_loans_page(token_json, 0, limit=1)
+            first_date = first_owned_loan.json()['result'][0]['origination_date']
+        except Exception as e:
+            logging.exception(f'couldn\'t get first loan date: {str(e)}')
+        date_periods = date_range(first_date, dt.datetime.now().date(), freq='90D')
+
+    # look up closed periods in the window cache before any request is made
+    periods = []
+    for d in date_periods:
+        key = payment_windows.window_key(BASE_URL, loan_number, d.date()) if payment_windows.is_closed(d.date()) else None
+        periods.append((d, key, payment_windows.load(key) if key else None))
+
+    for i, (d, key, cached) in enumerate(periods):
+        if cached is not None:
+            metrics.incr('payment_windows_cached')
+            util_funcs.write_response_to_disk(
+                cached, fpath, mode='a' if os.path.exists(fpath) else 'w', column_schema=column_schema
+            )
+            continue
+        # get first page
+        stmt = f'Retrieving payments for 90 day period starting: {d.strftime("%Y-%m-%d")}    '
+        logging.debug(stmt)
+        fetch = lambda offset, lim, d=d: get_payment_page(
+            token_json, offset, loan_number=loan_number, limit=lim, transaction_effective_date=d.strftime('%Y-%m-%d')
+        )
+        if key is not None:  # closed period: keep its pages for the window cache
+            fetch = payment_windows.Recorder(fetch)
+        if workers:
+            page_pipeline.pipelined_pages(
+                fetch, fpath, column_schema, limit=limit, mode='a' if os.path.exists(fpath) else 'w',
+                fetch_workers=workers, compress_processes=0, label='payments'
+            )
+        else:
+            response = fetch(0, limit)
+#            if (file_mode == 'w') and (i==0):  # on very first iteration check file_mode; overwrite previous file if 'w'
+            if not os.path.exists(fpath):
+                logging.debug('overwriting old payments file')
+                payments_processed, total_count = util_funcs.write_response_to_disk(
+                    response, fpath, mode='w', column_schema=column_schema
+                )
+#            elif (file_mode == 'a') | ((file_mode == 'w') and (i > 0)):  # append on subsequent iterations, or if file_mode is 'a''
+            else:
+                payments_processed, total_count = util_funcs.write_response_to_disk(
+                    response, fpath, mode='a', column_schema=column_schema
+                )
+            # get subsequent pages
+            while payments_processed < total_count:
+                progress_rep = f'payments processed: {payments_processed}  total_count: {total_count}'
+                print(progress_rep, end='', file=jsonl_stream.progress_file(fpath))
+                response = fetch(payments_processed, limit)
+                pay_proc, tcnt = util_funcs.write_response_to_disk(
+                    response, fpath, mode='a', column_schema=column_schema,
+                    cur_iter=payments_processed, total_count=total_count
+                )
+                # update iters
+                payments_processed += pay_proc
+                total_count = tcnt
+                print('\b'*len(progress_rep), end='', file=jsonl_stream.progress_file(fpath))  # reset progress bar
+        if key is not None:
+            records = fetch.records()
+            if records is not None:
+                payment_windows.save(key, records)
+    return 1
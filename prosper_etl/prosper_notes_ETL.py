@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Retrieves owned notes from Prosper API.
+See https://developers.prosper.com/docs/investor/notes-api/
+for API details.
+
+usage: python -m prosper_etl.prosper_notes_ETL [--data-dir data] [--log-dir logs]
+"""
+
+# imports
+import os, sys, logging, argparse
+from . import column_schemas
+
+def main():
+    parser = argparse.ArgumentParser(description='Pull owned notes from Prosper.')
+    parser.add_argument('--data-dir', default=None,
+                        help='output directory (default: PROSPER_DATA_DIR, else ./data; created if missing)')
+    parser.add_argument('--log-dir', default=None,
+                        help='log directory (default: PROSPER_LOG_DIR, else ./logs; created if missing)')
+    args = parser.parse_args()
+
+    from . import prosper_api_tools, metrics, snapshot_diff, datasets
+    data_dir, log_dir = datasets.output_dirs(args.data_dir, args.log_dir, ['mynotes'])
+
+    # logging setup
+    LOGGING_LEVEL = logging.INFO
+    logfile = os.path.join(log_dir, 'prosper_notes_ETL.log')
+    logging.basicConfig(
+        filename=logfile,
+        format='%(asctime)s:%(levelname)s:%(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        level=LOGGING_LEVEL
+    )
+    logging.info('Starting prosper_notes_ETL.py script...')
+
+    # column schema
+    #==============
+    COLUMN_SCHEMA = column_schemas.notes_columns
+    # get prosper connection tokens
+    #==============================
+    logging.info('initiating conn. to prosper...')
+    tokens = prosper_api_tools.get_tokens()  # (cached token if still valid)
+    logging.info('connection obtained')
+
+    # get data and write to file
+    #===========================
+    file_dir = os.path.join(data_dir, 'mynotes')
+    file_path = 'mynotes.bz2'
+    full_path = os.path.join(file_dir, file_path)
+
+    #backup old file first
+    if os.path.exists(full_path):
+        logging.info(f'backing up old file {full_path} to {full_path + ".bak"}')
+        os.rename(full_path, full_path + '.bak')
+        logging.info('finished backing up')
+
+    logging.info('initiating data pull...')
+    prosper_api_tools.get_many_notes(full_path, tokens, column_schema=COLUMN_SCHEMA, timezn='America/Denver')
+    snapshot_diff.write_change_log('notes', data_dir)
+    metrics.write_summary(log_dir, 'prosper_notes_ETL')
+    logging.info('done')
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
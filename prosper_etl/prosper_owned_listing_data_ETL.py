@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Retrieves owned listings (with credit bureau data) from Prosper API.
+
+A listing never changes after origination, so with `--backfill` only the listings of owned
+notes that aren't stored yet are fetched (by listing number) and appended, instead of
+re-downloading every invested listing.
+
+usage: python -m prosper_etl.prosper_owned_listing_data_ETL [--backfill] [--data-dir data] [--log-dir logs]
+"""
+
+import os, sys, logging, argparse
+from . import listings_attributes as atts
+
+def main():
+    parser = argparse.ArgumentParser(description='Pull owned listings from Prosper.')
+    parser.add_argument('--backfill', action='store_true',
+                        help='only fetch listings of owned notes missing from mylistings.bz2 (needs mynotes.bz2)')
+    parser.add_argument('--data-dir', default=None,
+                        help='output directory (default: PROSPER_DATA_DIR, else ./data; created if missing)')
+    parser.add_argument('--log-dir', default=None,
+                        help='log directory (default: PROSPER_LOG_DIR, else ./logs; created if missing)')
+    args = parser.parse_args()
+
+    from . import prosper_api_tools, metrics, datasets
+    data_dir, log_dir = datasets.output_dirs(args.data_dir, args.log_dir, ['mylistings'])
+
+    # logging setup
+    logfile = os.path.join(log_dir, 'prosper_owned_listing_data_ETL.log')
+    logging.basicConfig(
+        filename=logfile,
+        format='%(asctime)s:%(levelname)s:%(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        level=logging.INFO
+    )
+
+    logging.info('Starting prosper_owned_listing_data_ETL.py script...')
+
+    # column schema
+    #==============
+    all_cols = set(atts.top_level_atributes)
+    deprecated_cols = set(atts.top_level_deprecated)
+    columns = sorted(all_cols - deprecated_cols)
+
+    # get prosper connection tokens
+    #==============================
+    logging.info('initiating conn. to prosper...')
+    tokens = prosper_api_tools.get_tokens()  # (cached token if still valid)
+    logging.info('connection obtained')
+
+    # get data and write to file
+    #===========================
+    file_dir = os.path.join(data_dir, 'mylistings')
+    file_path = 'mylistings.bz2'
+    full_path = os.path.join(file_dir, file_path)
+
+    if args.backfill:
+        missing = datasets.missing_listing_numbers(data_dir)
+        logging.info(f'backfilling {len(missing)} missing listings...')
+        prosper_api_tools.get_owned_listings_by_number(full_path, tokens, missing, column_schema=columns)
+    else:
+        logging.info('initiating data pull...')
+        prosper_api_tools.get_all_owned_listings(full_path, tokens, column_schema=columns)
+    metrics.write_summary(log_dir, 'prosper_owned_listing_data_ETL')
+    logging.info('done')
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
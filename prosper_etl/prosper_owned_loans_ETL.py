@@ -0,0 +1,58 @@
+#!/usr/bin/python
+
+'''This is a script to get current loan data from Prosper on loans that I own.
+(For now, the script will get all loans.)
+
+usage: python -m prosper_etl.prosper_owned_loans_ETL [--data-dir data] [--log-dir logs]
+'''
+
+import os, sys, logging, argparse
+from . import column_schemas
+
+def main():
+    parser = argparse.ArgumentParser(description='Pull owned loans from Prosper.')
+    parser.add_argument('--data-dir', default=None,
+                        help='output directory (default: PROSPER_DATA_DIR, else ./data; created if missing)')
+    parser.add_argument('--log-dir', default=None,
+                        help='log directory (default: PROSPER_LOG_DIR, else ./logs; created if missing)')
+    args = parser.parse_args()
+
+    from . import prosper_api_tools
+    from . import metrics
+    from . import datasets
+    data_dir, log_dir = datasets.output_dirs(args.data_dir, args.log_dir, ['myloans'])
+
+    # logging setup
+    logfile = os.path.join(log_dir, 'prosper_owned_loans_ETL.log')
+    logging.basicConfig(
+        filename=logfile,
+        format='%(asctime)s:%(levelname)s:%(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        level=logging.INFO
+    )
+
+    logging.info('Starting prosper_owned_loans_ETL.py script...')
+
+    # get prosper connection tokens
+    #==============================
+    logging.info('initiating conn. to prosper...')
+    tokens = prosper_api_tools.get_tokens()  # (cached token if still valid)
+    logging.info('connection obtained')
+
+    # column schema specification
+    #============================
+    COLUMN_SCHEMA = column_schemas.loans_columns
+
+    # get data and write to file
+    #===========================
+    file_dir = os.path.join(data_dir, 'myloans')
+    file_path = 'myloans.bz2'
+    full_path = os.path.join(file_dir, file_path)
+
+    logging.info('initiating data pull...')
+    prosper_api_tools.get_many_loans(full_path, tokens, column_schema=COLUMN_SCHEMA)
+    metrics.write_summary(log_dir, 'prosper_owned_loans_ETL')
+    logging.info('done')
+
+if __name__ == '__main__':
+    main()
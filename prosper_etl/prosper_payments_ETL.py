@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+import os, sys, logging, argparse
+from . import column_schemas
+
+def main():
+    parser = argparse.ArgumentParser(description='Pull payments of the loans in myloans.bz2 from Prosper.')
+    parser.add_argument('--data-dir', default=None,
+                        help='output directory (default: PROSPER_DATA_DIR, else ./data; created if missing)')
+    parser.add_argument('--log-dir', default=None,
+                        help='log directory (default: PROSPER_LOG_DIR, else ./logs; created if missing)')
+    args = parser.parse_args()
+
+    from . import prosper_api_tools
+    from . import datasets
+    from . import metrics
+    data_dir, log_dir = datasets.output_dirs(args.data_dir, args.log_dir, ['myloans'])
+
+    # logging setup
+    LOGGING_LEVEL = logging.INFO
+    logfile = os.path.join(log_dir, 'prosper_payments_ETL.log')
+    logging.basicConfig(
+        filename=logfile,
+        format='%(asctime)s:%(levelname)s:%(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        level=LOGGING_LEVEL
+    )
+
+    logging.info('Starting prosper_payments_ETL.py script...')
+
+    # get prosper connection tokens
+    #==============================
+    logging.info('initiating conn. to prosper...')
+    tokens = prosper_api_tools.get_tokens()  # (cached token if still valid)
+    logging.info('connection obtained')
+
+    # column schema
+    #==============
+    COLUMN_SCHEMA = column_schemas.payments_columns
+
+    # get loan ids
+    #=============
+    LOAN_DIR = os.path.join(data_dir, 'myloans')
+    myloans_file = 'myloans.bz2'
+    BATCH_SIZE = 25
+    if myloans_file in os.listdir(LOAN_DIR):
+        # get loan numbers from file
+        try:
+            logging.info(f'retrieving loan numbers from {myloans_file} in {LOAN_DIR}')
+            loan_nums = datasets.read_all(
+                os.path.join(LOAN_DIR, myloans_file), columns=['loan_number', 'origination_date'], latest=True,
+                key='loan_number'
+            )
+            # (this reduces the amount of payment queries; a stable sort keeps the batches the same every run)
+            loan_nums = loan_nums.sort_values(by='origination_date', kind='stable')
+            loan_nums = loan_nums['loan_number'].values.flatten().astype(str)
+        except Exception as e:
+            logging.exception(f'issue retrieving loan numbers: {str(e)}')
+            logging.debug(f'directory: {LOAN_DIR}  file: {myloans_file}')
+            sys.exit(1)
+    else:
+        logging.error(f'could not find {myloans_file} in {LOAN_DIR}')
+        sys.exit(1)
+        # (note: perhaps we should initiate loan number retrieval from  Prosper in this case)
+
+    batches = [loan_nums[i:min(i+BATCH_SIZE, len(loan_nums))] for i in range(0, len(loan_nums), BATCH_SIZE)]
+    # unit test for no duplicate loan numbers
+    decomposed_batches = []
+    [decomposed_batches.extend(b) for b in batches]
+    duplicated = len(set(decomposed_batches)) != len(decomposed_batches)
+    logging.debug(f'duplicated loan numbers in batches: {duplicated}')
+    assert duplicated == False
+
+    # get payment data and write to file
+    #===================================
+    file_dir = LOAN_DIR
+    file_path = 'myloan_payments.bz2'
+    full_path = os.path.join(file_dir, file_path)
+    logging.info(f'backing up old file: {full_path} to {full_path+".bak"}')
+    if os.path.exists(full_path):  # backup old file first
+        os.rename(full_path, full_path+'.bak')
+    logging.info(f'backed up old file')
+
+    logging.info('initiating payment data pull...')
+    for i, loan_batch in enumerate(batches):
+    #    fmode = 'w' if i==0 else 'a'
+    #    logging.debug(f'fmode set to {fmode} on iteration {i}')
+        try:
+            logging.debug(f"initiating query for loans: {','.join(loan_batch)}")
+            prosper_api_tools.get_many_payments(
+                full_path, tokens, column_schema=COLUMN_SCHEMA, loan_number=','.join(loan_batch)#, file_mode=fmode
+            )
+        except Exception as e:
+            logging.exception(f'couldn\'t pull data: {str(e)}')
+            sys.exit(1)
+        progress_stmt = f'{(i+1)*BATCH_SIZE} loans processed of {len(loan_nums)}'
+        if i*BATCH_SIZE % 200 == 0:
+            print()
+    metrics.write_summary(log_dir, 'prosper_payments_ETL')
+    logging.info('done')
+
+if __name__ == '__main__':
+    main()
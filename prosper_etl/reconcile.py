@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Reconcile the payments pull against the loans and notes snapshots.
+
+Payments are summed per loan in one streaming pass (integer cents, see
+`datasets.read_dataset(..., cents=True)`), then joined against
+  - loans: `principal_paid`, `interest_paid` and the fee totals must equal the sums;
+  - notes: each note's `*_pro_rata_share` must equal the sums scaled by the note's ownership
+    share (`note_ownership_amount / amount_borrowed`), within a cent per payment for rounding.
+Every divergence is reported as one row:
+    check, loan_number, loan_note_id, field, expected_cents, actual_cents, diff_cents
+
+usage: python -m prosper_etl.reconcile [--data-dir data] [--tolerance-cents 1] [--output mismatches.csv]
+"""
+
+import os, sys, logging, argparse, time
+import numpy as np
+from . import datasets
+
+# payments column: (loans column, notes column)
+FIELDS = {
+    'principal_amount': ('principal_paid', 'principal_paid_pro_rata_share'),
+    'interest_amount': ('interest_paid', 'interest_paid_pro_rata_share'),
+    'late_fee_amount': ('late_fees_paid', 'late_fees_paid_pro_rata_share'),
+    'service_fee_amount': ('service_fees_paid', 'service_fees_paid_pro_rata_share'),
+    'collection_fee_amount': ('collection_fees_paid', 'collection_fees_paid_pro_rata_share'),
+}
+REPORT_COLUMNS = ['check', 'loan_number', 'loan_note_id', 'field', 'expected_cents', 'actual_cents', 'diff_cents']
+
+
+def payment_sums(data_dir=None, processes=None):
+    '''Per-loan sums (cents) of the payments fields in `FIELDS`, plus the payment row count
+    ('payments'), indexed by loan_number.'''
+    chunks = datasets.read_dataset(
+        'payments', columns=['loan_number', 'transaction_id'] + list(FIELDS), cents=True, data_dir=data_dir,
+        processes=processes
+    )
+    agg = {c: 'sum' for c in FIELDS}
+    agg['transaction_id'] = 'count'
+    sums = datasets.aggregate(chunks, agg, by='loan_number')
+    if sums is None:
+        from pandas import DataFrame
+        return DataFrame(columns=list(FIELDS) + ['payments'])
+    return sums.rename(columns={**{f'{c}_sum': c for c in FIELDS}, 'transaction_id_count': 'payments'})
+
+def reconcile(sums, loans=None, notes=None, tolerance_cents=1):
+    '''Mismatches (DataFrame with `REPORT_COLUMNS`) between per-loan payment `sums` and the
+    `loans` and/or `notes` snapshots (money in cents).'''
+    from pandas import concat, DataFrame
+    found = []
+
+    def emit(check, j, field, expected, actual, tolerance):
+        diff = actual - expected
+        bad = np.abs(diff) > tolerance
+        if bad.any():
+            found.append(DataFrame({
+                'check': check,
+                'loan_number': j['loan_number'].to_numpy()[bad],
+                'loan_note_id': j['loan_note_id'].to_numpy()[bad] if 'loan_note_id' in j else None,
+                'field': field,
+                'expected_cents': expected[bad],
+                'actual_cents': actual[bad],
+                'diff_cents': diff[bad],
+            }))
+
+    if loans is not None:
+        j = loans.merge(sums, left_on='loan_number', right_index=True, how='left')
+        for pay_col, (loan_col, _) in FIELDS.items():
+            emit('loans', j, loan_col, j[pay_col].fillna(0).to_numpy(dtype=np.int64),
+                 j[loan_col].fillna(0).to_numpy(dtype=np.int64), tolerance_cents)
+    if notes is not None:
+        j = notes.merge(sums, left_on='loan_number', right_index=True, how='left')
+        share = j['note_ownership_amount'].fillna(0).to_numpy(dtype=np.int64) / np.maximum(
+            j['amount_borrowed'].fillna(0).to_numpy(dtype=np.int64), 1)
+        allowance = tolerance_cents + j['payments'].fillna(0).to_numpy(dtype=np.int64)  # a cent per payment
+        for pay_col, (_, note_col) in FIELDS.items():
+            expected = np.rint(j[pay_col].fillna(0).to_numpy(dtype=np.int64) * share).astype(np.int64)
+            emit('notes', j, note_col, expected, j[note_col].fillna(0).to_numpy(dtype=np.int64), allowance)
+    if not found:
+        return DataFrame(columns=REPORT_COLUMNS)
+    return concat(found, ignore_index=True)[REPORT_COLUMNS]
+
+def reconcile_files(data_dir=None, tolerance_cents=1, processes=None):
+    '''Reconcile the stored payments against the stored loans and notes (whichever exist).'''
+    sums = payment_sums(data_dir, processes)
+    loans = notes = None
+    if datasets.exists('loans', data_dir):
+        loans = datasets.read_all(
+            'loans', columns=['loan_number'] + [l for l, _ in FIELDS.values()], cents=True, latest=True, data_dir=data_dir
+        )
+    if datasets.exists('notes', data_dir):
+        notes = datasets.read_all(
+            'notes', columns=['loan_note_id', 'loan_number', 'note_ownership_amount', 'amount_borrowed']
+                             + [n for _, n in FIELDS.values()],
+            cents=True, latest=True, data_dir=data_dir
+        )
+    return reconcile(sums, loans, notes, tolerance_cents)
+
+def summarize(mismatches):
+    '''Count of diverging loans per check and field, as a dict.'''
+    if not len(mismatches):
+        return {}
+    return mismatches.groupby(['check', 'field'])['loan_number'].nunique().to_dict()
+
+def run(data_dir=None, tolerance_cents=1, output=None, processes=None):
+    '''Reconcile, log a summary and optionally write the mismatches. Returns the mismatches.'''
+    t0 = time.time()
+    mismatches = reconcile_files(data_dir, tolerance_cents, processes)
+    if len(mismatches):
+        logging.warning(
+            f'reconciliation: {mismatches["loan_number"].nunique()} loans diverge: {summarize(mismatches)}'
+        )
+    else:
+        logging.info('reconciliation: payments match loans and notes')
+    if output:
+        mismatches.to_csv(output, index=False)
+    logging.info(f'reconciliation took {time.time() - t0:.1f}s')
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconcile payments against loans and notes.')
+    parser.add_argument('--data-dir', default=None)
+    parser.add_argument('--tolerance-cents', type=int, default=1)
+    parser.add_argument('--processes', type=int, default=None, help='parallel bz2 decompression of payments')
+    parser.add_argument('--output', default=None, help='write the mismatches to this csv')
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s:%(levelname)s:%(message)s', level=logging.INFO)
+    mismatches = run(args.data_dir, args.tolerance_cents, args.output, args.processes)
+    print(f'{mismatches["loan_number"].nunique() if len(mismatches) else 0} loans diverge')
+    for (check, field), n in summarize(mismatches).items():
+        print(f'  {check}.{field}: {n}')
+    sys.exit(1 if len(mismatches) else 0)
+
+if __name__ == '__main__':
+    main()
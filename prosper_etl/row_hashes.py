@@ -0,0 +1,139 @@
+"""
+Per-row content hashes to skip unchanged records between pulls.
+
+Every pull of notes, loans and owned listings returns the whole portfolio, but on a
+typical day only a small fraction of rows differ from the previous pull. A `RowHashStore`
+keeps a 64-bit content hash per natural key (`loan_note_id`, `loan_number`,
+`listing_number`) between runs; used as the `row_filter` of the `get_many_*` writers, it
+drops rows whose hash is unchanged so only new or changed rows are serialized, compressed
+and appended to the output. The output file then holds one version of a row per change,
+newest last (`datasets.read_all(..., latest=True)` and `compaction` keep the newest).
+
+The store is saved next to the output as `<file>.hashes.npz`, and only when `save()` is
+called, so a failed pull leaves the previous hashes in place. When there is no store yet
+(e.g. the first incremental pull after a full one) or it was made by an older `hash_rows`,
+it is rebuilt from the rows already in the output.
+"""
+
+import os, logging, threading
+import numpy as np
+from . import metrics
+
+STORE_SUFFIX = '.hashes.npz'
+HASH_VERSION = 3  # bump when `hash_rows` changes; older stores are rebuilt from the output
+
+
+def _value_text(v):
+    from pandas import isna
+    if isinstance(v, str):
+        return v
+    if isinstance(v, (bool, np.bool_)):
+        return str(bool(v))
+    if isna(v):
+        return ''
+    if isinstance(v, (int, np.integer)):
+        return str(int(v))
+    if isinstance(v, (float, np.floating)):
+        v = float(v)
+        return str(int(v)) if v.is_integer() else repr(v)
+    return str(v)
+
+def _canonical(col):
+    '''Text of each value of `col`: strings as they arrived (so '0012' and '12' differ),
+    missing values '', booleans 'True'/'False', and numbers in one form whatever dtype pandas
+    gave the column (a null elsewhere in a page turns a column's ints into floats, so 5 and
+    5.0 are both '5').'''
+    return col.astype(object).map(_value_text)
+
+def hash_rows(df, columns=None):
+    '''64-bit content hash of each row of `df` over `columns` (default: all), as a uint64 array.
+    Values are hashed by a canonical text form (see `_canonical`), so a row hashes the same
+    whether it came from an API page, where a null elsewhere in a column turns its ints into
+    floats, or was read back from the output csv; columns are taken in name order, so column
+    order doesn't matter either.'''
+    from pandas import DataFrame
+    from pandas.util import hash_pandas_object
+    cols = sorted(columns if columns is not None else df.columns)
+    frame = df.reindex(columns=cols)
+    text = DataFrame({c: _canonical(frame[c]) for c in cols}, index=frame.index)
+    return hash_pandas_object(text, index=False).to_numpy(dtype=np.uint64)
+
+class RowHashStore():
+    '''Key -> row hash store for one output file. Call it on a page DataFrame to get back only
+    the new or changed rows; `counts` tallies 'new', 'changed' and 'unchanged' rows.
+    With `dataset` (a `datasets` name, in `data_dir`), the stored rows are that dataset's
+    file or month partitions rather than just `fpath`.'''
+    def __init__(self, fpath, key, columns=None, dataset=None, data_dir=None):
+        from . import datasets
+        self.path = fpath + STORE_SUFFIX
+        self.key, self.columns = key, columns
+        self.counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+        self._lock = threading.Lock()
+        self._hashes = {}
+        source = dataset or fpath
+        if datasets.exists(source, data_dir):
+            if not (os.path.exists(self.path) and self._load()):
+                self._seed(source, data_dir)
+        elif os.path.exists(self.path):
+            # the output this store describes is gone: every row has to be written again
+            logging.warning(f'{fpath} is missing; ignoring stale row hashes in {self.path}')
+
+    def _load(self):
+        with np.load(self.path, allow_pickle=False) as z:
+            version = int(z['version']) if 'version' in z.files else 1
+            if version != HASH_VERSION:
+                logging.info(f'{self.path} was made by an older hash_rows; rebuilding it')
+                return False
+            self._hashes = dict(zip(z['keys'].tolist(), z['hashes'].tolist()))
+        return True
+
+    def _seed(self, source, data_dir=None):
+        '''Hash the rows already stored for `source` (the last version of each key wins).'''
+        from . import datasets
+        rows = 0
+        for chunk in datasets.read_dataset(source, data_dir=data_dir):
+            keys = chunk[self.key].astype(str).tolist()
+            self._hashes.update(zip(keys, hash_rows(chunk, self.columns).tolist()))
+            rows += len(chunk)
+        logging.info(f'row hashes for {os.path.basename(self.path[:-len(STORE_SUFFIX)])} built from {rows} stored rows ({len(self._hashes)} keys)')
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __call__(self, df):
+        return self.filter(df)
+
+    def filter(self, df):
+        '''Return the rows of `df` that are new or changed since the stored hashes, and
+        record their hashes (in memory until `save`).'''
+        if not len(df):
+            return df
+        keys = df[self.key].astype(str).tolist()
+        new_hashes = hash_rows(df, self.columns)
+        with self._lock:
+            missing = np.fromiter((k not in self._hashes for k in keys), dtype=bool, count=len(keys))
+            old_hashes = np.fromiter((self._hashes.get(k, 0) for k in keys), dtype=np.uint64, count=len(keys))
+            keep = missing | (old_hashes != new_hashes)
+            for k, h, m in zip(keys, new_hashes.tolist(), keep.tolist()):
+                if m:
+                    self._hashes[k] = h
+            n_new = int(missing.sum())
+            n_keep = int(keep.sum())
+            self.counts['new'] += n_new
+            self.counts['changed'] += n_keep - n_new
+            self.counts['unchanged'] += len(keys) - n_keep
+        metrics.incr('rows_unchanged', len(keys) - n_keep)
+        return df[keep]
+
+    def save(self):
+        '''Write the store to disk (atomically).'''
+        with self._lock:
+            keys = np.array(list(self._hashes), dtype=str)
+            hashes = np.fromiter(self._hashes.values(), dtype=np.uint64, count=len(self._hashes))
+        tmp = self.path + '.tmp.npz'
+        np.savez(tmp, keys=keys, hashes=hashes, version=HASH_VERSION)
+        os.replace(tmp, self.path)
+        logging.info(
+            f'{os.path.basename(self.path)}: {self.counts["new"]} new, {self.counts["changed"]} changed, '
+            f'{self.counts["unchanged"]} unchanged rows'
+        )
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Runs the loans, notes, owned listings and payments ETLs in one process.
+
+The pipelines are modelled as a DAG (loans -> payments; notes and owned listings are
+independent). Every stage runs on its own thread under one shared session, access token
+and request rate budget, with a single password grant for the whole run. Payments depend
+on loans but don't wait for `myloans.bz2` to be finished: loan numbers are streamed to the
+payments stage as each loans page arrives, and payment batches start as soon as they fill.
+
+With `--incremental`, loans, notes and owned listings only append rows that are new or
+changed since the last run (see prosper_etl/row_hashes.py) instead of rewriting the whole file.
+With `--backfill-listings`, only listings of owned notes missing from mylistings.bz2 are
+fetched (after the notes stage, if it runs).
+
+After the DAG, the stored payments are reconciled against the loans and notes snapshots
+(see prosper_etl/reconcile.py); diverging loans are written to myloans/reconciliation.csv and
+fail the run. `--no-reconcile` skips the check.
+
+Responses are cached on disk and revalidated with conditional requests (prosper_etl/http_cache.py);
+`--offline` replays a pull from that cache without touching the network.
+
+Before pulling, each account's work is sized with `limit=1` probes (prosper_etl/workload_plan.py):
+the plan (requests per stage, payments batch size, fetchers per stage and ETA) is printed,
+and unless `--workers` is given, its payments batch size is used. Stages page serially
+unless `--workers` is given or `--tune-workers` asks for the plan's tuned fetchers per stage.
+The ETA is re-estimated on stderr while the pull runs. `--plan-only` stops after the plan;
+`--no-plan` skips it.
+
+With `--profiles`, the DAG runs once per Prosper account (see creds), all accounts
+concurrently. Each account has its own token lifecycle and rate budget, and its output
+goes to data/accounts/<profile>/ instead of data/.
+
+Outputs go to `--data-dir` and logs to `--log-dir` (default: PROSPER_DATA_DIR and
+PROSPER_LOG_DIR, else data/ and logs/ under the current directory; created if missing).
+
+usage: python -m prosper_etl.run_all_ETL [--stages loans notes listings payments] [--workers 4] [--rate-limit 5]
+                                         [--profiles acct1 acct2] [--incremental] [--backfill-listings]
+                                         [--no-reconcile] [--transport requests|httpx|httpx-h2] [--offline]
+                                         [--plan-only | --no-plan] [--tune-workers] [--data-dir data] [--log-dir logs]
+"""
+
+import os, sys, logging, argparse, threading, queue, time, contextlib
+
+from . import column_schemas
+from . import listings_attributes as atts
+
+PAYMENTS_BATCH_SIZE = 25  # same as prosper_payments_ETL.py
+_END = object()  # end-of-stream marker
+
+
+# DAG
+#====
+class Stage():
+    '''A pipeline stage. `deps` are stage names that must be `ready` before this one starts.
+    A stage sets `ready` itself once dependents can start (for streaming producers, after
+    their first output), and `done` when it finishes.'''
+    def __init__(self, name, func, deps=()):
+        self.name, self.func, self.deps = name, func, tuple(deps)
+        self.ready = threading.Event()
+        self.done = threading.Event()
+        self.error = None
+
+def run_dag(stages, ctx, name_prefix=''):
+    '''Run `stages` (dict of name -> Stage) concurrently, respecting dependencies.
+    Returns a dict of name -> exception (or None) per stage.'''
+    for st in stages.values():
+        missing = [d for d in st.deps if d not in stages]
+        if missing:
+            raise ValueError(f'stage {st.name} depends on stages not being run: {missing}')
+
+    def runner(st):
+        for d in st.deps:
+            stages[d].ready.wait()
+            if stages[d].error:
+                st.error = RuntimeError(f'upstream stage {d} failed')
+                logging.error(f'{st.name}: skipped, upstream stage {d} failed')
+                st.ready.set()
+                st.done.set()
+                return
+        t0 = time.time()
+        logging.info(f'{st.name}: starting')
+        try:
+            st.func(ctx, st)
+            logging.info(f'{st.name}: finished in {time.time() - t0:.1f}s')
+        except BaseException as e:  # (sys.exit from the api tools included)
+            st.error = e
+            logging.exception(f'{st.name}: failed: {str(e)}')
+        finally:
+            st.ready.set()
+            st.done.set()
+
+    threads = [threading.Thread(target=runner, args=(st,), name=name_prefix + st.name) for st in stages.values()]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    return {name: st.error for name, st in stages.items()}
+
+
+# stages
+#=======
+def _backup(full_path):
+    if os.path.exists(full_path):
+        logging.info(f'backing up old file {full_path} to {full_path + ".bak"}')
+        os.replace(full_path, full_path + '.bak')
+
+def _workers(ctx, stage):
+    '''Concurrent page fetchers for `stage`: `--workers`, else the work plan's with `--tune-workers`,
+    else serial.'''
+    return ctx['stage_workers'].get(stage, ctx['workers'])
+
+def _hash_store(ctx, dataset, full_path, columns):
+    '''Row hash store for an incremental pull of `dataset`, or None for a full rewrite.'''
+    if not ctx['incremental']:
+        return None
+    from . import row_hashes, datasets
+    return row_hashes.RowHashStore(
+        full_path, datasets.DATASETS[dataset][2], columns, dataset=dataset, data_dir=ctx['data_dir']
+    )
+
+def _output(ctx, dataset, full_path, append=False):
+    '''Context manager giving what to pull `dataset` into: `full_path`, or with `--partitioned`
+    a target writing straight into its month partitions, committed when the pull succeeds (see
+    partitions). The monolithic file is moved aside then, so readers use the partitions; when
+    appending, it's split into the partitions first (e.g. after a run without `--partitioned`).
+    Appends to a dataset that's only stored in partitions always go to the partitions.'''
+    from . import partitions, datasets
+    stored_in_partitions = not os.path.exists(full_path) and datasets.exists(dataset, ctx['data_dir'])
+    if not (ctx['partitioned'] or append and stored_in_partitions):
+        return contextlib.nullcontext(full_path)
+    if append and os.path.exists(full_path):
+        partitions.write_partitioned(dataset, ctx['data_dir'])
+    _backup(full_path)
+    return partitions.partition_target(dataset, ctx['data_dir'], append=append)
+
+def loans_stage(ctx, st):
+    from . import prosper_api_tools
+    full_path = os.path.join(ctx['data_dir'], 'myloans/myloans.bz2')
+    store = _hash_store(ctx, 'loans', full_path, column_schemas.loans_columns)
+
+    def on_page(response):
+        # stream loan numbers (in origination_date order) to the payments stage
+        for rec in response.json().get('result', []):
+            ctx['loan_stream'].put((str(rec['loan_number']), rec.get('origination_date')))
+        st.ready.set()
+
+    try:
+        prosper_api_tools.get_many_loans(
+            full_path, ctx['tokens'], column_schema=column_schemas.loans_columns, on_page=on_page,
+            workers=_workers(ctx, 'loans'), row_filter=store
+        )
+        if store is not None:
+            store.save()
+    finally:
+        ctx['loan_stream'].put(_END)
+
+def notes_stage(ctx, st):
+    from . import prosper_api_tools
+    full_path = os.path.join(ctx['data_dir'], 'mynotes/mynotes.bz2')
+    store = _hash_store(ctx, 'notes', full_path, column_schemas.notes_columns)
+    if store is not None:
+        # the appended rows are the change set; there's no previous snapshot to diff
+        prosper_api_tools.get_many_notes(
+            full_path, ctx['tokens'], column_schema=column_schemas.notes_columns, workers=_workers(ctx, 'notes'),
+            row_filter=store
+        )
+        store.save()
+        return
+    _backup(full_path)
+    prosper_api_tools.get_many_notes(
+        full_path, ctx['tokens'], column_schema=column_schemas.notes_columns, workers=_workers(ctx, 'notes')
+    )
+    from . import snapshot_diff
+    snapshot_diff.write_change_log('notes', ctx['data_dir'])
+
+def listings_stage(ctx, st):
+    from . import prosper_api_tools
+    # (sorted for a stable column order; incremental appends follow the stored header instead)
+    columns = sorted(set(atts.top_level_atributes) - set(atts.top_level_deprecated))
+    full_path = os.path.join(ctx['data_dir'], 'mylistings/mylistings.bz2')
+    if ctx['backfill']:
+        from . import datasets
+        missing = datasets.missing_listing_numbers(ctx['data_dir'])
+        logging.info(f'listings: backfilling {len(missing)} missing listings')
+        with _output(ctx, 'listings', full_path, append=True) as target:
+            prosper_api_tools.get_owned_listings_by_number(
+                target, ctx['tokens'], missing, column_schema=columns, workers=_workers(ctx, 'listings')
+            )
+        return
+    store = _hash_store(ctx, 'listings', full_path, columns)
+    with _output(ctx, 'listings', full_path, append=store is not None) as target:
+        prosper_api_tools.get_all_owned_listings(
+            target, ctx['tokens'], column_schema=columns, workers=_workers(ctx, 'listings'), row_filter=store
+        )
+    if store is not None:
+        store.save()
+
+def _loan_numbers_from_file(data_dir):
+    from . import datasets
+    loans = datasets.read_all('loans', columns=['loan_number', 'origination_date'], latest=True, data_dir=data_dir)
+    loans = loans.sort_values(by='origination_date', kind='stable')  # (same batches every run, see payment_windows)
+    yield from zip(loans['loan_number'].astype(str), loans['origination_date'])
+
+def _loan_numbers_from_stream(q):
+    while True:
+        item = q.get()
+        if item is _END:
+            return
+        yield item
+
+def payments_stage(ctx, st):
+    from . import prosper_api_tools
+    full_path = os.path.join(ctx['data_dir'], 'myloans/myloan_payments.bz2')
+    _backup(full_path)
+    loans = _loan_numbers_from_stream(ctx['loan_stream']) if ctx['streaming'] else _loan_numbers_from_file(ctx['data_dir'])
+    seen, batch, first_date = set(), [], None
+    n_loans = 0
+
+    def pull(target, batch):
+        prosper_api_tools.get_many_payments(
+            target, ctx['tokens'], column_schema=column_schemas.payments_columns,
+            loan_number=','.join(batch), transaction_effective_date=first_date, workers=_workers(ctx, 'payments')
+        )
+
+    with _output(ctx, 'payments', full_path) as target:
+        for loan_number, orig_date in loans:
+            if loan_number in seen:
+                continue
+            seen.add(loan_number)
+            if first_date is None and orig_date:
+                first_date = str(orig_date)[:10]  # loans arrive oldest first: start windows here
+            batch.append(loan_number)
+            if len(batch) == ctx['payments_batch_size']:
+                pull(target, batch)
+                n_loans += len(batch)
+                logging.info(f'payments: {n_loans} loans processed')
+                batch = []
+        if batch:
+            pull(target, batch)
+            n_loans += len(batch)
+            logging.info(f'payments: {n_loans} loans processed')
+
+STAGES = {
+    'loans': (loans_stage, ()),
+    'notes': (notes_stage, ()),
+    'listings': (listings_stage, ()),
+    'payments': (payments_stage, ('loans',)),
+}
+
+
+def run_account(
+        profile, stage_names, workers=None, rate_limit=None, partitioned=False, incremental=False, backfill=False,
+        reconcile=True, plan=True, plan_only=False, eta=None, tune_workers=False, data_dir=None
+    ):
+    '''Run the DAG for one account. Returns a dict of stage name -> exception (or None).
+    With `plan`, the pull is sized first (see workload_plan) and its planned requests are added
+    to the `eta` reporter; `plan_only` stops there. With `tune_workers` (and no `workers`),
+    each stage uses the plan's fetchers instead of paging serially. Output goes to `data_dir`
+    (default: `datasets.DATA_DIR`), under accounts/<profile>/ for a named profile.'''
+    from . import prosper_api_tools, datasets
+    data_dir = data_dir or datasets.DATA_DIR
+    if profile:
+        data_dir = os.path.join(data_dir, 'accounts', profile)
+    data_dir, _ = datasets.output_dirs(data_dir, subdirs=('myloans', 'mynotes', 'mylistings'))
+    prosper_api_tools.set_rate_limit(rate_limit, profile=profile)
+
+    # get prosper connection tokens (once per account, shared by every stage)
+    #=========================================================================
+    logging.info(f'initiating conn. to prosper for {profile or "default account"}...')
+    tokens = prosper_api_tools.account_tokens(profile)
+    logging.info('connection obtained')
+
+    # size the pull (and tune the payments batch size, and fetchers if asked, unless `workers` is set)
+    #==================================================================================================
+    from . import http_cache
+    stage_workers, batch_size = {}, PAYMENTS_BATCH_SIZE
+    if plan and not http_cache.offline():
+        from . import workload_plan
+        planned_workers = workers or (None if tune_workers else 1)  # (serial unless tuned)
+        p = workload_plan.plan(tokens, stage_names, data_dir, rate_limit, workers=planned_workers)
+        report = workload_plan.format_plan(p, title=f'work plan for {profile or "default account"}')
+        print(report)
+        logging.info(report)
+        if plan_only:
+            return {}
+        if eta is not None:
+            eta.add_planned(p['total_requests'])
+        if workers is None:
+            if tune_workers:
+                stage_workers = {name: st['workers'] for name, st in p['stages'].items()}
+            batch_size = p['payments_batch_size']
+
+    # payments streams loan numbers from the loans stage when both run; otherwise it
+    # reads them from the last loans pull and needs no upstream stage
+    streaming = 'loans' in stage_names
+    stages = {}
+    for name in stage_names:
+        func, deps = STAGES[name]
+        if name == 'payments' and not streaming:
+            deps = ()
+        if name == 'listings' and backfill and 'notes' in stage_names:
+            deps = ('notes',)  # backfill compares against this run's notes
+        stages[name] = Stage(name, func, deps)
+    ctx = {
+        'tokens': tokens, 'loan_stream': queue.Queue(), 'streaming': streaming, 'workers': workers,
+        'data_dir': data_dir, 'partitioned': partitioned, 'incremental': incremental,
+        'backfill': backfill, 'stage_workers': stage_workers, 'payments_batch_size': batch_size,
+    }
+    results = run_dag(stages, ctx, name_prefix=f'{profile}:' if profile else '')
+    if reconcile and not any(results.values()):
+        results['reconcile'] = reconcile_account(data_dir)
+    return results
+
+def reconcile_account(data_dir):
+    '''Reconcile an account's payments against its loans and notes. Returns an exception if
+    loans diverge (or the check fails), else None.'''
+    from . import reconcile, datasets
+    if not datasets.exists('payments', data_dir):
+        return None
+    try:
+        mismatches = reconcile.run(data_dir, output=os.path.join(data_dir, 'myloans', 'reconciliation.csv'))
+    except Exception as e:
+        logging.exception(f'reconciliation failed: {str(e)}')
+        return e
+    if len(mismatches):
+        return RuntimeError(f'{mismatches["loan_number"].nunique()} loans diverge from their payments')
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the Prosper ETLs as one dependency-aware pipeline.')
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--workers', type=int, default=None,
+                        help='concurrent page fetchers per stage (pipelined fetch/parse/compress/write)')
+    parser.add_argument('--rate-limit', type=float, default=None,
+                        help='max API requests per second, all stages of an account combined')
+    parser.add_argument('--profiles', nargs='+', default=None,
+                        help='credential profiles to pull concurrently (default: P2P_PROFILES, else the default account)')
+    parser.add_argument('--partitioned', action='store_true',
+                        help='write payments and listings straight into month partitions (only changed months are rewritten)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='append only new or changed loans, notes and listings instead of rewriting the files')
+    parser.add_argument('--backfill-listings', action='store_true',
+                        help='only fetch owned listings missing from mylistings.bz2 (listings never change)')
+    parser.add_argument('--transport', choices=['requests', 'httpx', 'httpx-h2'], default=None,
+                        help='http transport (default: PROSPER_HTTP_TRANSPORT, else requests); httpx-h2 multiplexes '
+                             'concurrent page requests over one HTTP/2 connection')
+    parser.add_argument('--offline', action='store_true',
+                        help='replay: answer every request from the http response cache (see http_cache)')
+    parser.add_argument('--plan-only', action='store_true', help='print the work plan and ETA, then stop')
+    parser.add_argument('--no-plan', action='store_true',
+                        help="don't size the pull first (no tuned batch size or fetchers, no ETA)")
+    parser.add_argument('--tune-workers', action='store_true',
+                        help='without --workers, use the work plan\'s concurrent page fetchers per stage')
+    parser.add_argument('--no-reconcile', action='store_true',
+                        help="don't reconcile payments against loans and notes after the pull")
+    parser.add_argument('--data-dir', default=None,
+                        help='output directory (default: PROSPER_DATA_DIR, else ./data; created if missing)')
+    parser.add_argument('--log-dir', default=None,
+                        help='log directory (default: PROSPER_LOG_DIR, else ./logs; created if missing)')
+    args = parser.parse_args()
+
+    from . import datasets
+    data_dir, log_dir = datasets.output_dirs(args.data_dir, args.log_dir)
+    logging.basicConfig(
+        filename=os.path.join(log_dir, 'run_all_ETL.log'),
+        format='%(asctime)s:%(levelname)s:%(threadName)s:%(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        level=logging.INFO
+    )
+    from . import creds, metrics, prosper_api_tools
+    if args.transport:
+        prosper_api_tools.set_transport(args.transport)
+    if args.offline:
+        from . import http_cache
+        http_cache.set_offline()
+    profiles = args.profiles or creds.profiles() or [None]
+    logging.info(f'Starting run_all_ETL.py with stages {args.stages} for accounts {profiles}...')
+
+    from . import workload_plan
+    eta = workload_plan.EtaReporter().start() if not (args.no_plan or args.plan_only) else None
+    results = {}
+    def account_runner(profile):
+        try:
+            results[profile] = run_account(
+                profile, args.stages, args.workers, args.rate_limit, args.partitioned, args.incremental,
+                args.backfill_listings, not args.no_reconcile, not args.no_plan, args.plan_only, eta,
+                args.tune_workers, data_dir
+            )
+        except BaseException as e:
+            logging.exception(f'{profile or "default account"}: failed: {str(e)}')
+            results[profile] = {'connection': e}
+
+    threads = [threading.Thread(target=account_runner, args=(p,), name=p or 'default') for p in profiles]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    if eta is not None:
+        eta.stop()
+
+    if args.plan_only:
+        return
+    metrics.write_summary(log_dir, 'run_all_ETL')
+    failed = [f'{p or "default"}:{name}' for p, errs in results.items() for name, e in errs.items() if e]
+    if failed:
+        logging.error(f'stages failed: {failed}')
+        sys.exit(1)
+    logging.info('done')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Diff two snapshots of notes or loans (e.g. `mynotes.bz2.bak` vs `mynotes.bz2`).
+
+Both snapshots are read with only the columns the diff needs, hash-joined on the key
+(`loan_note_id` / `loan_number`) and compared column-wise, producing a compact change log
+with one row per change:
+    key, change, old_value, new_value
+where change is one of 'added', 'removed', 'status', 'late', 'defaulted' or 'principal_balance'.
+
+usage: python -m prosper_etl.snapshot_diff notes [--old path] [--new path] [--output changes.csv]
+"""
+
+import os, logging, argparse
+from . import datasets
+
+# dataset: (key, status, status description, principal balance, days past due)
+SNAPSHOT_COLUMNS = {
+    'notes': ('loan_note_id', 'note_status', 'note_status_description', 'principal_balance_pro_rata_share', 'days_past_due'),
+    'loans': ('loan_number', 'loan_status', 'loan_status_description', 'principal_balance', 'days_past_due'),
+}
+DEFAULT_DESCRIPTIONS = ('CHARGEOFF', 'DEFAULTED')
+CHANGE_LOG_COLUMNS = ['key', 'change', 'old_value', 'new_value']
+
+
+def _read_snapshot(fpath, columns):
+    from . import bz2_reader
+    return bz2_reader.read_bz2_file(fpath, usecols=list(columns))
+
+def diff_snapshots(old, new, dataset='notes', balance_tolerance=0.005):
+    '''Return the change log (DataFrame with `CHANGE_LOG_COLUMNS`) between two snapshot
+    DataFrames of `dataset`.'''
+    from pandas import concat, DataFrame
+    key, status, desc, balance, dpd = SNAPSHOT_COLUMNS[dataset]
+    old = old.drop_duplicates(subset=key, keep='last')
+    new = new.drop_duplicates(subset=key, keep='last')
+    j = old.merge(new, on=key, how='outer', suffixes=('_old', '_new'), indicator=True)
+
+    changes = []
+    def emit(mask, change, old_col=None, new_col=None):
+        if not mask.any():
+            return
+        sub = j.loc[mask]
+        changes.append(DataFrame({
+            'key': sub[key].values,
+            'change': change,
+            'old_value': sub[old_col].values if old_col else None,
+            'new_value': sub[new_col].values if new_col else None,
+        }))
+
+    both = (j['_merge'] == 'both').values
+    emit(j['_merge'] == 'right_only', 'added', None, f'{desc}_new')
+    emit(j['_merge'] == 'left_only', 'removed', f'{desc}_old', None)
+    emit(both & (j[f'{status}_old'] != j[f'{status}_new']).values, 'status', f'{desc}_old', f'{desc}_new')
+    old_dpd = j[f'{dpd}_old'].fillna(0)
+    new_dpd = j[f'{dpd}_new'].fillna(0)
+    emit(both & ((old_dpd <= 0) & (new_dpd > 0)).values, 'late', f'{dpd}_old', f'{dpd}_new')
+    was_default = j[f'{desc}_old'].isin(DEFAULT_DESCRIPTIONS)
+    is_default = j[f'{desc}_new'].isin(DEFAULT_DESCRIPTIONS)
+    emit(both & (is_default & ~was_default).values, 'defaulted', f'{desc}_old', f'{desc}_new')
+    delta = (j[f'{balance}_new'].fillna(0) - j[f'{balance}_old'].fillna(0)).abs()
+    emit(both & (delta > balance_tolerance).values, 'principal_balance', f'{balance}_old', f'{balance}_new')
+
+    if not changes:
+        return DataFrame(columns=CHANGE_LOG_COLUMNS)
+    return concat(changes, ignore_index=True)[CHANGE_LOG_COLUMNS]
+
+def diff_files(dataset='notes', old_path=None, new_path=None, data_dir=None):
+    '''Change log between two snapshot files (default: the dataset's `.bak` and current file).'''
+    new_path = new_path or datasets.dataset_path(dataset, data_dir)
+    old_path = old_path or new_path + '.bak'
+    columns = SNAPSHOT_COLUMNS[dataset]
+    return diff_snapshots(_read_snapshot(old_path, columns), _read_snapshot(new_path, columns), dataset)
+
+def summarize(changes):
+    '''Count of changes by type, as a dict.'''
+    return changes['change'].value_counts().to_dict()
+
+def write_change_log(dataset='notes', data_dir=None):
+    '''Diff the dataset's `.bak` against the fresh pull and write `<name>_changes.csv` next to it.
+    Does nothing (returns None) when there is no previous snapshot.'''
+    fpath = datasets.dataset_path(dataset, data_dir)
+    if not (os.path.exists(fpath) and os.path.exists(fpath + '.bak')):
+        return None
+    changes = diff_files(dataset, data_dir=data_dir)
+    out = fpath[:-len('.bz2')] + '_changes.csv'
+    changes.to_csv(out, index=False)
+    logging.info(f'{dataset} changes since last pull: {summarize(changes)}; change log at {out}')
+    return out
+
+def main():
+    parser = argparse.ArgumentParser(description='Diff two notes/loans snapshots.')
+    parser.add_argument('dataset', choices=list(SNAPSHOT_COLUMNS))
+    parser.add_argument('--old', default=None, help='older snapshot (default: <current file>.bak)')
+    parser.add_argument('--new', default=None, help='newer snapshot (default: current file)')
+    parser.add_argument('--data-dir', default=None)
+    parser.add_argument('--output', default=None, help='write the change log to this csv')
+    args = parser.parse_args()
+    changes = diff_files(args.dataset, args.old, args.new, args.data_dir)
+    print(summarize(changes))
+    if args.output:
+        changes.to_csv(args.output, index=False)
+        print(f'{len(changes)} changes written to {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Vectorized generator for large synthetic Prosper portfolios.
+
+Produces loans, notes, owned listings and payment histories that follow the column
+schemas in `column_schemas` and `listings_attributes` (including
+Experian/TransUnion payloads), written in the same multi-stream bz2 csv format as the ETL
+scripts. Payment histories follow each loan's amortization schedule up to its age, term or
+default month. Everything is generated with NumPy array operations, and payment chunks are
+generated and compressed in a process pool, so tens of millions of rows take minutes.
+
+usage: python -m prosper_etl.synthetic_data --loans 1000000 --listings 500000 --out-dir data_synthetic
+"""
+
+import os, sys, bz2, argparse, logging, time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from . import column_schemas
+from . import listings_attributes as atts
+
+RATINGS = np.array(['AA', 'A', 'B', 'C', 'D', 'E', 'HR'])
+RATING_WEIGHTS = np.array([0.08, 0.17, 0.24, 0.24, 0.14, 0.08, 0.05])
+RATING_RATES = np.array([0.065, 0.09, 0.125, 0.165, 0.215, 0.27, 0.31])
+RATING_DEFAULT_PROB = np.array([0.02, 0.04, 0.07, 0.11, 0.16, 0.22, 0.28])
+TERMS = np.array([12, 36, 60])
+TERM_WEIGHTS = np.array([0.02, 0.68, 0.30])
+STATUS_DESC = np.array(['', 'CURRENT', 'CHARGEOFF', 'DEFAULTED', 'COMPLETED'], dtype=object)
+SERVICE_FEE_RATE = 0.01 / 12
+TRANSUNION_SWITCH = np.datetime64('2017-03-31')
+
+
+# helpers
+#========
+def _month_date(orig, k):
+    '''Date `k` months after `orig` (datetime64[D] arrays), day clipped to 28.'''
+    day = (orig - orig.astype('datetime64[M]').astype('datetime64[D]')).astype(int)
+    return (orig.astype('datetime64[M]') + k).astype('datetime64[D]') + np.minimum(day, 27)
+
+def _balance(amount, r, term, k):
+    '''Scheduled principal balance after `k` payments of an amortizing loan.'''
+    q = 1 + r
+    qn = q ** term
+    return amount * (qn - q ** k) / (qn - 1)
+
+def _strs(a):
+    return a.astype('datetime64[D]').astype(str)
+
+def _dates(col):
+    '''datetime64[D] array from a column of 'yyyy-mm-dd' strings.'''
+    return col.to_numpy(dtype=object).astype('datetime64[D]')
+
+def _n_payments(loans):
+    '''Payments made by each loan: one a month up to its age or term, stopping before its
+    default month.'''
+    n_pay = np.minimum(loans['age_in_months'].values, loans['term'].values)
+    dm = loans['_default_month'].values
+    return np.where((dm > 0) & (dm <= n_pay), dm - 1, n_pay)
+
+def _schedule(loans):
+    '''Payment rows of `loans` as a dict of arrays: 'idx' (row of the loan in `loans`), 'k'
+    (payment number), the 'principal', 'interest', 'service_fee' and 'late_fee' of each
+    payment and the 'balance' after it, in integer cents. Amounts are rounded per payment,
+    and a loan's last scheduled payment takes the principal left after rounding, so a
+    completed loan is paid down to exactly 0.'''
+    n_pay = _n_payments(loans)
+    total = int(n_pay.sum())
+    starts = np.cumsum(n_pay) - n_pay
+    idx = np.repeat(np.arange(len(loans)), n_pay)
+    k = np.arange(total) - np.repeat(starts, n_pay) + 1
+    amount = loans['amount_borrowed'].values[idx]
+    r = loans['borrower_rate'].values[idx] / 12
+    t = loans['term'].values[idx]
+    b_open = _balance(amount, r, t, k - 1)
+    b_close = _balance(amount, r, t, k)
+    amount_c = np.rint(amount * 100).astype(np.int64)
+    principal = np.rint((b_open - b_close) * 100).astype(np.int64)
+
+    def paid_so_far(p):  # running principal paid within each loan, this payment included
+        cum = np.concatenate(([0], np.cumsum(p)))
+        return cum[1:] - np.repeat(cum[starts], n_pay)
+
+    principal = np.where(k == t, amount_c - (paid_so_far(principal) - principal), principal)
+
+    # late fees on the last two payments before a default
+    dm = loans['_default_month'].values[idx]
+    near_default = (dm > 0) & (k >= dm - 2)
+    return {
+        'idx': idx, 'k': k, 'principal': principal,
+        'interest': np.rint(b_open * r * 100).astype(np.int64),
+        'service_fee': np.rint(b_open * SERVICE_FEE_RATE * 100).astype(np.int64),
+        'late_fee': np.where(near_default, 1500, 0),
+        'balance': amount_c - paid_so_far(principal),
+        'near_default': near_default,
+    }
+
+def _payment_totals(loans, loans_per_chunk=100000):
+    '''Per loan sums (cents) of the 'principal', 'interest', 'service_fee' and 'late_fee' of
+    the payments `make_payments` generates for `loans`.'''
+    totals = {c: np.zeros(len(loans), dtype=np.int64) for c in ('principal', 'interest', 'service_fee', 'late_fee')}
+    for s in range(0, len(loans), loans_per_chunk):
+        chunk = loans.iloc[s:s + loans_per_chunk]
+        sched = _schedule(chunk)
+        for c, out in totals.items():
+            # (float weights hold integer cents exactly)
+            out[s:s + len(chunk)] = np.rint(np.bincount(sched['idx'], weights=sched[c], minlength=len(chunk)))
+    return totals
+
+
+# loans and notes
+#================
+def make_loans(n, seed=0, today=None, start='2013-01-01'):
+    '''Generate `n` loans as a DataFrame with `column_schemas.loans_columns` plus a private
+    `_default_month` column (0 = never defaults) used to build consistent payment histories.'''
+    from pandas import DataFrame
+    rng = np.random.default_rng(seed)
+    today = np.datetime64(today or np.datetime64('today', 'D'), 'D')
+    start = np.datetime64(start, 'D')
+
+    ridx = rng.choice(len(RATINGS), n, p=RATING_WEIGHTS)
+    rate = np.round(RATING_RATES[ridx] + rng.normal(0, 0.012, n), 4).clip(0.05, 0.36)
+    term = rng.choice(TERMS, n, p=TERM_WEIGHTS)
+    amount = np.round(np.exp(rng.normal(np.log(9000), 0.6, n)).clip(2000, 40000) / 25) * 25
+    orig = start + rng.integers(0, int((today - start).astype(int)) - 30, n).astype('timedelta64[D]')
+    # months since origination, counting this month's payment only once its date has passed
+    # (payments fall on the origination day, see `_month_date`), so none is dated after `today`
+    age = (today.astype('datetime64[M]') - orig.astype('datetime64[M]')).astype(int)
+    pay_day = np.minimum((orig - orig.astype('datetime64[M]').astype('datetime64[D]')).astype(int), 27)
+    age = (age - (pay_day > (today - today.astype('datetime64[M]').astype('datetime64[D]')).astype(int))).clip(0)
+
+    # default path: a share of loans stop paying at some month and charge off 4 months later
+    defaults = rng.random(n) < RATING_DEFAULT_PROB[ridx]
+    default_month = np.where(defaults, (rng.beta(1.6, 3.5, n) * term).astype(int) + 1, 0)
+    paid = np.minimum(age, term)
+    paid = np.where(defaults & (default_month <= age), default_month - 1, paid)
+    charged_off = defaults & (age >= default_month + 4)
+    late = defaults & (default_month <= age) & ~charged_off
+    completed = ~defaults & (age >= term)
+    status = np.select([completed, charged_off, late], [4, 2, 1], 1)
+    dpd = np.where(late, (age - default_month + 1) * 30, 0)
+
+    r = rate / 12
+    pmt = amount * r / (1 - (1 + r) ** -term.astype(float))
+    next_due = np.where(status == 1, _strs(_month_date(orig, paid + 1)), None)
+    # amounts paid to date: the sums of the payment history `make_payments` generates
+    paid_c = _payment_totals(DataFrame({
+        'age_in_months': age, 'term': term, 'amount_borrowed': amount, 'borrower_rate': rate,
+        '_default_month': default_month,
+    }))
+    principal_paid = paid_c['principal'] / 100
+    bal = amount - principal_paid
+
+    loans = DataFrame({
+        "age_in_months": age,
+        "amount_borrowed": amount,
+        "borrower_rate": rate,
+        "days_past_due": dpd,
+        "group_leader_award": 0.0,
+        "collection_fees_paid": 0.0,
+        "debt_sale_proceeds_received": 0.0,
+        "interest_paid": paid_c['interest'] / 100,
+        "late_fees_paid": paid_c['late_fee'] / 100,
+        "loan_default_reason": np.where(charged_off, 1, None),
+        "loan_default_reason_description": np.where(charged_off, 'Delinquency', None),
+        "loan_number": np.arange(1, n + 1) + 100000,
+        "loan_status": status,
+        "loan_status_description": STATUS_DESC[status],
+        "next_payment_due_date": next_due,
+        "next_payment_due_amount": np.where(status == 1, np.round(pmt, 2), 0.0),
+        "origination_date": _strs(orig),
+        "principal_balance": np.round(np.where(charged_off, 0.0, bal), 2),
+        "principal_paid": np.round(principal_paid, 2),
+        "prosper_fees_paid": 0.0,
+        "prosper_rating": RATINGS[ridx],
+        "service_fees_paid": paid_c['service_fee'] / 100,
+        "term": term,
+    })[column_schemas.loans_columns]
+    loans['_default_month'] = default_month
+    return loans
+
+def make_notes(loans, seed=0):
+    '''One owned note per loan, with pro-rata shares of the loan's amounts (so they reconcile
+    with the loan's payments, see `reconcile`).'''
+    from pandas import DataFrame
+    rng = np.random.default_rng(seed + 1)
+    n = len(loans)
+    ownership = rng.choice([25.0, 50.0, 75.0, 100.0, 250.0], n, p=[0.7, 0.15, 0.05, 0.07, 0.03])
+    share = ownership / loans['amount_borrowed'].values
+    notes = DataFrame({
+        "age_in_months": loans['age_in_months'].values,
+        "amount_borrowed": loans['amount_borrowed'].values,
+        "borrower_rate": loans['borrower_rate'].values,
+        "collection_fees_paid_pro_rata_share": 0.0,
+        "days_past_due": loans['days_past_due'].values,
+        "debt_sale_proceeds_received_pro_rata_share": 0.0,
+        "interest_paid_pro_rata_share": np.round(loans['interest_paid'].values * share, 2),
+        "is_sold": False,
+        "late_fees_paid_pro_rata_share": np.round(loans['late_fees_paid'].values * share, 2),
+        "listing_number": loans['loan_number'].values + 4900000,
+        "loan_note_id": loans['loan_number'].astype(str).values + '-' + rng.integers(1, 99, n).astype(str),
+        "loan_number": loans['loan_number'].values,
+        "next_payment_due_amount_pro_rata_share": np.round(loans['next_payment_due_amount'].values * share, 2),
+        "next_payment_due_date": loans['next_payment_due_date'].values,
+        "note_default_reason": loans['loan_default_reason'].values,
+        "note_default_reason_description": loans['loan_default_reason_description'].values,
+        "note_ownership_amount": ownership,
+        "note_sale_fees_paid": 0.0,
+        "note_sale_gross_amount_received": 0.0,
+        "note_status": loans['loan_status'].values,
+        "note_status_description": loans['loan_status_description'].values,
+        "origination_date": loans['origination_date'].values,
+        "principal_balance_pro_rata_share": np.round(loans['principal_balance'].values * share, 2),
+        "principal_paid_pro_rata_share": np.round(loans['principal_paid'].values * share, 2),
+        "prosper_fees_paid_pro_rata_share": 0.0,
+        "prosper_rating": loans['prosper_rating'].values,
+        "service_fees_paid_pro_rata_share": np.round(loans['service_fees_paid'].values * share, 2),
+        "term": loans['term'].values,
+    })
+    return notes[column_schemas.notes_columns]
+
+
+# listings
+#=========
+def _bureau_payload(rng, fields, n):
+    '''str(dict) payloads like the ones the listings ETL writes for nested json. Values are
+    drawn column-wise; rows are rendered with one %-format each (payloads have hundreds of
+    fields, so building them by repeated string concatenation is far slower).'''
+    fields = list(dict.fromkeys(fields))
+    cols, fmt = [], []
+    for f in fields:
+        if f.endswith('_date') or f.startswith('first_'):
+            cols.append(_strs(np.datetime64('2000-01-01') + rng.integers(0, 6000, n).astype('timedelta64[D]')))
+            fmt.append(f"'{f}': '%s'")
+        elif f == 'fico_score':
+            cols.append(rng.choice(['640-659', '660-679', '680-699', '700-719', '720-739', '740-759'], n))
+            fmt.append(f"'{f}': '%s'")
+        elif f.endswith('utilization'):
+            cols.append(np.round(rng.beta(2, 3, n), 2))
+            fmt.append(f"'{f}': %s")
+        else:
+            cols.append(rng.poisson(4, n))
+            fmt.append(f"'{f}': %d")
+    fmt = '{' + ', '.join(fmt) + '}'
+    return np.array([fmt % row for row in zip(*[c.tolist() for c in cols])], dtype=object)
+
+def make_listings(loans, n=None, seed=0):
+    '''Owned listings for the first `n` loans (default all), with the columns the listings ETL
+    writes (top-level attributes minus deprecated ones) and credit bureau payloads.'''
+    from pandas import DataFrame
+    rng = np.random.default_rng(seed + 2)
+    loans = loans.iloc[:n] if n else loans
+    n = len(loans)
+    orig = _dates(loans['origination_date'])
+    start = orig - rng.integers(3, 15, n).astype('timedelta64[D]')
+    columns = [c for c in atts.top_level_atributes if c not in set(atts.top_level_deprecated)]
+    listings = {}
+    for c in columns:
+        if c.endswith('_date'):
+            listings[c] = _strs(start + rng.integers(0, 3, n).astype('timedelta64[D]'))
+        elif c.startswith(('is_', 'has_')) or c.endswith(('_verifiable', '_indicator')):
+            listings[c] = rng.random(n) < 0.5
+        elif c.endswith(('_id', '_typeid', '_months', '_count')):
+            listings[c] = rng.integers(0, 20, n)
+        elif c.endswith(('_description', '_state', '_range', '_bureau')):
+            listings[c] = rng.choice(['A', 'B', 'C', 'D'], n)
+        else:
+            listings[c] = np.round(rng.random(n) * 100, 2)
+    amount = loans['amount_borrowed'].values
+    listings.update({
+        "listing_number": loans['loan_number'].values + 4900000,
+        "listing_amount": amount, "amount_funded": amount, "amount_remaining": 0.0,
+        "borrower_rate": loans['borrower_rate'].values, "prosper_rating": loans['prosper_rating'].values,
+        "listing_term": loans['term'].values, "listing_status": 6,
+        "listing_start_date": _strs(start), "listing_creation_date": _strs(start),
+        "listing_end_date": _strs(orig), "loan_origination_date": _strs(orig),
+        "income_range": rng.integers(1, 7, n),
+        "income_range_description": rng.choice(['$25,000-49,999', '$50,000-74,999', '$75,000-99,999', '$100,000+'], n),
+        "borrower_state": rng.choice(['CA', 'TX', 'NY', 'FL', 'IL', 'CO', 'WA', 'GA'], n),
+    })
+    experian = start < TRANSUNION_SWITCH
+    ex = np.full(n, None, dtype=object)
+    tu = np.full(n, None, dtype=object)
+    ex[experian] = _bureau_payload(rng, atts.experian_fields, int(experian.sum()))
+    tu[~experian] = _bureau_payload(rng, atts.transunion_fields, int((~experian).sum()))
+    listings["credit_bureau_values_experian"] = ex
+    listings["credit_bureau_values_transunion"] = tu
+    listings["credit_bureau_values_transunion_indexed"] = tu
+    listings["decision_bureau"] = np.where(experian, 'Experian', 'TransUnion')
+    return DataFrame(listings)[columns]
+
+
+# payments
+#=========
+def make_payments(loans, first_transaction_id=1, seed=0):
+    '''Payment rows for a chunk of loans (output of `make_loans`), following each loan's
+    amortization schedule. Loans that default show growing days past due on their last
+    payments before stopping.'''
+    from pandas import DataFrame
+    rng = np.random.default_rng(seed)
+    sched = _schedule(loans)
+    idx, k = sched['idx'], sched['k']
+    total = len(idx)
+    interest, principal = sched['interest'] / 100, sched['principal'] / 100
+    late_fee = sched['late_fee'] / 100
+    eff = _month_date(_dates(loans['origination_date'])[idx], k)
+
+    # rising delinquency on the last two payments before a default
+    dmi = loans['_default_month'].values[idx]
+    near_default = sched['near_default']
+    pre_dpd = np.where(near_default, (k - (dmi - 3)) * 15, 0)
+    late_mask = rng.random(total) < 0.02
+    pre_dpd = np.where(late_mask & ~near_default, rng.integers(1, 20, total), pre_dpd)
+
+    tid = np.arange(first_transaction_id, first_transaction_id + total)
+    eff_s = _strs(eff)
+    pay = DataFrame({
+        "loan_number": loans['loan_number'].values[idx],
+        "transaction_id": tid,
+        "funds_available_date": _strs(eff + np.timedelta64(4, 'D')),
+        "investor_disbursement_date": _strs(eff + np.timedelta64(3, 'D')),
+        "transaction_effective_date": eff_s,
+        "account_effective_date": eff_s,
+        "payment_transaction_code": "ACH",
+        "payment_status": "Success",
+        "match_back_id": tid,
+        "prior_match_back_id": None,
+        "loan_payment_cashflow_type": "Scheduled",
+        "payment_amount": (sched['interest'] + sched['principal'] + sched['late_fee']) / 100,
+        "principal_amount": principal,
+        "interest_amount": interest,
+        "origination_interest_amount": 0.0,
+        "late_fee_amount": late_fee,
+        "service_fee_amount": sched['service_fee'] / 100,
+        "collection_fee_amount": 0.0,
+        "gl_reward_amount": 0.0,
+        "nsf_fee_amount": 0.0,
+        "pre_days_past_due": pre_dpd,
+        "post_days_past_due": 0,
+        "resulting_principal_balance": sched['balance'] / 100,
+    })
+    return pay[column_schemas.payments_columns]
+
+def count_payments(loans):
+    '''Number of payment rows `make_payments` will produce for `loans`.'''
+    return int(_n_payments(loans).sum())
+
+
+# writing
+#========
+def _csv_bz2(df, header):
+    return bz2.compress(df.to_csv(index=False, header=header).encode('utf-8'))
+
+def _payments_chunk_bz2(loans, first_transaction_id, seed, header):
+    return _csv_bz2(make_payments(loans, first_transaction_id, seed), header)
+
+def write_bz2(df, fpath, chunk_rows=200000, processes=None):
+    '''Write a DataFrame as a multi-stream bz2 csv (one stream per chunk, compressed in parallel).'''
+    chunks = [(df.iloc[i:i + chunk_rows], i == 0) for i in range(0, max(len(df), 1), chunk_rows)]
+    with open(fpath, 'wb') as f, ProcessPoolExecutor(processes) as pool:
+        for data in pool.map(_csv_bz2, [c for c, _ in chunks], [h for _, h in chunks]):
+            f.write(data)
+
+def write_payments(loans, fpath, loans_per_chunk=20000, processes=None, seed=0):
+    '''Generate and write the payment history of `loans` chunk by chunk, in a process pool.
+    Memory stays bounded by `loans_per_chunk`. Returns the number of rows written.'''
+    starts = list(range(0, len(loans), loans_per_chunk))
+    first_ids, nxt = [], 1
+    for s in starts:
+        first_ids.append(nxt)
+        nxt += count_payments(loans.iloc[s:s + loans_per_chunk])
+    processes = processes or os.cpu_count()
+    with open(fpath, 'wb') as f, ProcessPoolExecutor(processes) as pool:
+        pending = []
+        for i, s in enumerate(starts):
+            pending.append(pool.submit(
+                _payments_chunk_bz2, loans.iloc[s:s + loans_per_chunk], first_ids[i], seed + i, i == 0
+            ))
+            if len(pending) >= 2 * processes:
+                f.write(pending.pop(0).result())
+        for fut in pending:
+            f.write(fut.result())
+    return nxt - 1
+
+def generate(out_dir, n_loans, n_listings=None, seed=0, processes=None, payments=True):
+    '''Generate a full synthetic portfolio into `out_dir`, using the same sub-directories and
+    file names as the ETL scripts (myloans/, mynotes/, mylistings/).'''
+    for sub in ('myloans', 'mynotes', 'mylistings'):
+        os.makedirs(os.path.join(out_dir, sub), exist_ok=True)
+    t0 = time.time()
+    loans = make_loans(n_loans, seed)
+    write_bz2(loans[column_schemas.loans_columns], os.path.join(out_dir, 'myloans/myloans.bz2'), processes=processes)
+    logging.info(f'{len(loans)} loans written ({time.time() - t0:.1f}s)')
+    write_bz2(make_notes(loans, seed), os.path.join(out_dir, 'mynotes/mynotes.bz2'), processes=processes)
+    logging.info(f'{len(loans)} notes written ({time.time() - t0:.1f}s)')
+    if n_listings != 0:
+        listings = make_listings(loans, n_listings, seed)
+        write_bz2(listings, os.path.join(out_dir, 'mylistings/mylistings.bz2'), chunk_rows=50000, processes=processes)
+        logging.info(f'{len(listings)} listings written ({time.time() - t0:.1f}s)')
+    if payments:
+        rows = write_payments(loans, os.path.join(out_dir, 'myloans/myloan_payments.bz2'), processes=processes, seed=seed)
+        logging.info(f'{rows} payment rows written ({time.time() - t0:.1f}s)')
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a large synthetic Prosper portfolio.')
+    parser.add_argument('--loans', type=int, default=100000, help='number of loans (one owned note each)')
+    parser.add_argument('--listings', type=int, default=None, help='number of owned listings (default: one per loan)')
+    parser.add_argument('--no-payments', action='store_true', help='skip the payment histories')
+    parser.add_argument('--out-dir', default='data_synthetic')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s:%(levelname)s:%(message)s', level=logging.INFO)
+    generate(args.out_dir, args.loans, args.listings, args.seed, args.processes, not args.no_payments)
+
+if __name__ == '__main__':
+    main()
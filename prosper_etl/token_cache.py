@@ -0,0 +1,73 @@
+"""
+On-disk cache of Prosper OAuth tokens, so scheduled runs don't start with a password grant.
+
+Tokens are saved per account profile and API base url under `~/.cache/prosper_etl/`
+(override with the PROSPER_TOKEN_CACHE environment variable; 'off' disables the cache),
+in files only the owner can read, with the absolute times at which the access token and the
+refresh token expire. `prosper_api_tools.get_tokens` reuses a still-valid access token, else
+does a refresh grant while the refresh token is valid, and falls back to the password grant.
+"""
+
+import os, json, time, logging
+
+CACHE_DIR = os.environ.get('PROSPER_TOKEN_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'prosper_etl'))
+REFRESH_TTL = 10 * 3600  # refresh tokens last 10 hours (see `prosper_api_tools.request_access`)
+MARGIN = 60  # treat tokens as expired this many seconds early
+
+
+def enabled():
+    return CACHE_DIR.lower() not in ('off', '0', 'false', '')
+
+def _cache_path(profile=None):
+    return os.path.join(CACHE_DIR, f'tokens_{profile or "default"}.json')
+
+def load(profile, base_url):
+    '''Cached token dict for `profile` against `base_url`, or None. Includes the absolute expiry
+    times 'access_expires_at' and 'refresh_expires_at'.'''
+    fpath = _cache_path(profile)
+    if not enabled() or not os.path.exists(fpath):
+        return None
+    try:
+        with open(fpath) as f:
+            cached = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f'ignoring unreadable token cache {fpath}: {str(e)}')
+        return None
+    if cached.get('base_url') != base_url:
+        return None
+    return cached
+
+def access_valid(cached, now=None):
+    return bool(cached) and cached.get('access_expires_at', 0) - MARGIN > (now or time.time())
+
+def refresh_valid(cached, now=None):
+    return bool(cached) and cached.get('refresh_expires_at', 0) - MARGIN > (now or time.time())
+
+def save(profile, base_url, token_json, previous=None):
+    '''Cache `token_json` (a fresh grant response) for `profile`. Keys starting with '_'
+    (in-process tags like '_profile') are not saved. `previous` is the cached entry this
+    grant refreshed: its refresh token expiry is kept if the refresh token didn't change.'''
+    if not enabled():
+        return
+    now = time.time()
+    entry = {k: v for k, v in token_json.items() if not k.startswith('_') and not k.endswith('_expires_at')}
+    entry['base_url'] = base_url
+    entry['access_expires_at'] = now + float(token_json.get('expires_in', 0))
+    if previous and previous.get('refresh_token') == entry.get('refresh_token'):
+        entry['refresh_expires_at'] = previous.get('refresh_expires_at', now)
+    else:
+        entry['refresh_expires_at'] = now + REFRESH_TTL
+    os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+    fpath = _cache_path(profile)
+    tmp = f'{fpath}.{os.getpid()}.tmp'
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(entry, f)
+    os.replace(tmp, fpath)
+    return entry
+
+def clear(profile=None):
+    '''Forget the cached tokens of `profile`.'''
+    fpath = _cache_path(profile)
+    if os.path.exists(fpath):
+        os.remove(fpath)
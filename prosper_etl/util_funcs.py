@@ -0,0 +1,70 @@
+
+import logging, sys
+from . import metrics, jsonl_stream, partitions
+
+# write data to disk
+def write_response_to_disk(response, file_path, column_schema=None, mode='w', cur_iter='na', total_count='na',
+                           row_filter=None):
+    '''Write data to disk. 
+    response is an expected return object from `requests.request`.
+    `file_path` is the full path to where the file will be written (appended).
+    `row_filter`, if given, is called with the page DataFrame and returns the rows to write
+    (e.g. a `row_hashes.RowHashStore` dropping unchanged rows).
+    If `file_path` is a stream target ('-' or 'unix:<path>', see `jsonl_stream`), the records
+    are emitted as JSON lines instead (`mode` and `row_filter` don't apply). If it's a
+    partition target (see `partitions.partition_target`), the rows are staged in their month
+    partitions instead (`mode` doesn't apply).
+    Returns a tuple of the result count and the total count of objects from the response.
+    '''
+    from pandas import DataFrame
+    try:
+        with metrics.timer('json_decode'):
+            resp_json = response.json()
+        tcnt = resp_json['total_count']
+        res_cnt = resp_json['result_count']
+        if jsonl_stream.is_stream_target(file_path):
+            jsonl_stream.write_page(file_path, resp_json, column_schema)
+            return (int(res_cnt), int(tcnt))
+        if column_schema:
+            with metrics.timer('dataframe'):
+                df = DataFrame(resp_json['result'], columns=column_schema)
+            if set(df.columns) != set(column_schema):
+                logging.warn('response columns don\'t match schema')
+                logging.warn(f'response columns: {df.columns}')
+                logging.warn(f'schema columns: {column_schema}')
+                # logging.exception('')
+                # sys.exit(1)
+        else:
+            logging.warn('no column schema provided: columns may conflict accross data pulls')
+            with metrics.timer('dataframe'):
+                df = DataFrame(resp_json['result'])
+        if row_filter is not None:
+            df = row_filter(df)
+        if partitions.is_partition_target(file_path):
+            with metrics.timer('write'):
+                partitions.writer(file_path).write(df)
+            metrics.add_rows(len(df))
+            return (int(res_cnt), int(tcnt))
+        if (mode == 'w') and (int(res_cnt)>0):
+            logging.debug('writing new csv file')
+            with metrics.timer('write'):
+                df.to_csv(file_path, index=False, compression='bz2', mode='w')
+            metrics.add_rows(len(df))
+        elif (mode == 'a') and (int(res_cnt)>0) and len(df):
+            logging.debug('appending to existing csv')
+            with metrics.timer('write'):
+                df.to_csv(file_path, index=False, compression='bz2', mode='a', header=False)
+            metrics.add_rows(len(df))
+        elif int(res_cnt)>0 and mode not in ('w', 'a'):
+            raise Exception('mode must be set to "w" or "a"')
+        else:
+            logging.debug(f'file mode was {mode}')
+            logging.debug(f'results = {resp_json}')
+            pass  # no data to write
+    except Exception as e:
+        if isinstance(e, BrokenPipeError) and jsonl_stream.is_stream_target(file_path):
+            raise  # the stream's consumer went away: stop the pull
+        logging.exception(
+            f'on write at iteration {cur_iter} of {total_count}: {str(e)}'
+        )
+    return (int(res_cnt), int(tcnt))
\ No newline at end of file
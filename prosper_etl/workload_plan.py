@@ -0,0 +1,269 @@
+"""
+Pre-flight sizing of a pull: how many requests it will take, how to run it, and how long.
+
+`plan` issues cheap `limit=1` probes - one per loans/notes/listings endpoint and a few per
+sampled payments (loan batch, 90 day window) pair - and from their `total_count`s and
+latencies works out
+  - the page count of every stage;
+  - the payments batch size needing the fewest requests (from the rows per loan and window
+    seen in the samples, after skipping windows already in the payments window cache);
+  - the concurrent page fetchers per stage that the rate budget (or `MAX_WORKERS`) allows;
+  - an ETA.
+`format_plan` renders it as a table, and `EtaReporter` keeps re-estimating the ETA from the
+requests actually made while the pull runs.
+
+usage: python -m prosper_etl.workload_plan [--stages loans notes listings payments] [--rate-limit 5] [--profile acct1]
+"""
+
+import os, sys, math, time, bisect, logging, argparse, threading
+import datetime as dt
+from . import metrics
+
+PAGE_LIMITS = {'loans': 25, 'notes': 50, 'listings': 100, 'payments': 100}  # the `get_many_*` page sizes
+BATCH_SIZES = (5, 10, 15, 20, 25)  # payments batch sizes to choose from (25: prosper_payments_ETL.py)
+MAX_WORKERS = 8  # fetchers per stage without a rate budget
+WINDOW_DAYS = 90
+
+
+def _probe(fetch):
+    '''(total_count, seconds) of one `limit=1` request.'''
+    t0 = time.perf_counter()
+    response = fetch()
+    seconds = time.perf_counter() - t0
+    return int(response.json().get('total_count') or 0), seconds
+
+def _loan_batches(data_dir, tokens):
+    '''(loan_numbers, origination dates), oldest first: from the last loans pull if there is one,
+    else the first page of loans (enough for a sample batch).'''
+    from . import datasets, prosper_api_tools
+    if data_dir is not None and datasets.exists('loans', data_dir):
+        loans = datasets.read_all(
+            'loans', columns=['loan_number', 'origination_date'], latest=True, data_dir=data_dir
+        )
+        loans = loans.sort_values(by='origination_date', kind='stable')  # (ties in file order, as run_all_ETL)
+        return loans['loan_number'].astype(str).tolist(), [str(d)[:10] for d in loans['origination_date']]
+    page = prosper_api_tools.get_loans_page(tokens, 0).json().get('result') or []
+    return [str(r['loan_number']) for r in page], [str(r.get('origination_date'))[:10] for r in page]
+
+def _date(value):
+    '''The date of a 'yyyy-mm-dd...' string, or None (e.g. for a missing origination_date).'''
+    return dt.date.fromisoformat(value[:10]) if value[:1].isdigit() else None
+
+def _window_starts(first_date, today=None):
+    from pandas import date_range
+    return [d.date() for d in date_range(first_date, today or dt.date.today(), freq=f'{WINDOW_DAYS}D')]
+
+def _active_windows(windows, first):
+    '''How many of `windows` (sorted start dates) end after `first` (all of them if it's None).'''
+    if first is None:
+        return len(windows)
+    return len(windows) - bisect.bisect_right(windows, first - dt.timedelta(days=WINDOW_DAYS))
+
+def _cached_batch_size(loans, windows, base_url, cached_keys):
+    '''The batch size (of `BATCH_SIZES`) the payments window cache was filled with, judged by
+    the closed windows of the first batch, or None. (A window's key depends on the exact loans
+    of its batch, so other batch sizes find nothing in the cache.)'''
+    from . import payment_windows
+    closed = [w for w in windows if payment_windows.is_closed(w)]
+    for size in BATCH_SIZES:
+        if any(payment_windows.window_key(base_url, loans[:size], w) in cached_keys for w in closed):
+            return size
+    return None
+
+def _payments_requests(loans, orig_dates, n_loans, windows, rows_per_loan, batch_size, base_url, cached_keys=()):
+    '''(requests, windows fetched, rows) of a payments pull with `batch_size` loans per batch:
+    each window of each batch costs one request, plus more for windows with more than a page
+    of rows, except closed windows whose keys are in `cached_keys` (see `_cached_batch_size`:
+    only the batch size the cache was filled with needs them).'''
+    from . import payment_windows
+    limit = PAGE_LIMITS['payments']
+    requests = fetched = rows = 0
+    n_batches = math.ceil(n_loans / batch_size)
+    for b in range(n_batches):
+        batch = loans[b * batch_size:(b + 1) * batch_size]
+        size = len(batch) or min(batch_size, n_loans - b * batch_size)  # (loans not known yet: estimated)
+        first = _date(orig_dates[b * batch_size]) if batch else None
+        active = _active_windows(windows, first)
+        per_window = max(1, math.ceil(size * rows_per_loan / limit))
+        rows += size * rows_per_loan * active
+        requests += active * per_window + len(windows) - active  # (windows before the batch: one empty page)
+        fetched += len(windows)
+        if batch and cached_keys:
+            for w in windows:
+                if payment_windows.is_closed(w) and payment_windows.window_key(base_url, batch, w) in cached_keys:
+                    requests -= per_window if first is None or w + dt.timedelta(days=WINDOW_DAYS) > first else 1
+                    fetched -= 1
+    return requests, fetched, int(round(rows))
+
+def plan(tokens, stages, data_dir=None, rate_limit=None, samples=4, workers=None, max_workers=MAX_WORKERS):
+    '''Size a pull of `stages` (loans, notes, listings, payments). With `workers` the fetchers
+    per stage are fixed instead of tuned. Returns a dict with a per-stage breakdown ('stages':
+    records, pages, requests, workers, seconds), 'latency', 'probes', 'payments_batch_size',
+    'total_requests' and 'eta_seconds'.'''
+    from . import prosper_api_tools, payment_windows
+    result = {'stages': {}, 'rate_limit': rate_limit}
+    latencies = []
+    probes = {
+        'loans': lambda: prosper_api_tools.get_loans_page(tokens, 0, limit=1),
+        'notes': lambda: prosper_api_tools.get_notes_page(tokens, 0, limit=1),
+        'listings': lambda: prosper_api_tools.get_listings_page(tokens, 0, limit=1),
+    }
+    for name in stages:
+        if name in probes:
+            total, seconds = _probe(probes[name])
+            latencies.append(seconds)
+            result['stages'][name] = {'records': total, 'pages': max(1, math.ceil(total / PAGE_LIMITS[name]))}
+
+    batch_size = 25
+    if 'payments' in stages:
+        loans, orig_dates = _loan_batches(data_dir, tokens)
+        n_loans = result['stages'].get('loans', {}).get('records') or len(loans)
+        if not loans:
+            result['stages']['payments'] = {'records': 0, 'pages': 0}
+        else:
+            dates = [d for d in map(_date, orig_dates) if d is not None]
+            windows = _window_starts(min(dates) if dates else dt.date.today() - dt.timedelta(days=WINDOW_DAYS))
+            # sample (batch, window) pairs spread over the portfolio, in windows after the batch originated
+            rows_per_loan, sampled = [], set()
+            n_known = math.ceil(len(loans) / batch_size)
+            for k in range(samples):
+                b = (k * n_known) // samples
+                batch = loans[b * batch_size:(b + 1) * batch_size]
+                first = _date(orig_dates[b * batch_size])
+                active = [w for w in windows if first is None or w + dt.timedelta(days=WINDOW_DAYS) > first] or windows
+                w = active[((2 * k + 1) * len(active)) // (2 * samples)]
+                if (b, w) in sampled:
+                    continue
+                sampled.add((b, w))
+                total, seconds = _probe(lambda: prosper_api_tools.get_payment_page(
+                    tokens, 0, ','.join(batch), limit=1, transaction_effective_date=f'{w:%Y-%m-%d}'))
+                latencies.append(seconds)
+                rows_per_loan.append(total / len(batch))
+            rate = sum(rows_per_loan) / len(rows_per_loan)
+            keys = payment_windows.cached_keys()
+            cached_size = _cached_batch_size(loans, windows, prosper_api_tools.BASE_URL, keys) if keys else None
+            options = {
+                b: _payments_requests(
+                    loans, orig_dates, n_loans, windows, rate, b, prosper_api_tools.BASE_URL,
+                    keys if b == cached_size else ()
+                )
+                for b in BATCH_SIZES
+            }
+            batch_size = min(options, key=lambda b: (options[b][0], -b))
+            requests, fetched, rows = options[batch_size]
+            result['stages']['payments'] = {
+                'records': rows, 'pages': requests, 'windows': fetched, 'rows_per_loan_window': round(rate, 2),
+            }
+    result['probes'] = len(latencies)
+    result['payments_batch_size'] = batch_size
+
+    # fetchers: enough to keep `rate_limit` requests in flight at the observed latency
+    latency = sorted(latencies)[len(latencies) // 2] if latencies else 0.0
+    result['latency'] = round(latency, 4)
+    budget = max(1, math.ceil(rate_limit * latency * 1.2)) if rate_limit else max_workers
+    for name, st in result['stages'].items():
+        if name == 'payments':  # (fetchers only help within one window's pages)
+            per_window = max(1, math.ceil(st['pages'] / max(1, st.get('windows', 1))))
+            w = workers or min(budget, per_window, max_workers)
+            st['seconds'] = st.get('windows', 0) * math.ceil(per_window / w) * latency
+        else:
+            w = workers or min(budget, st['pages'], max_workers)
+            st['seconds'] = math.ceil(st['pages'] / w) * latency
+        st['requests'] = st['pages']
+        st['workers'] = w
+    total = sum(st['requests'] for st in result['stages'].values())
+    result['total_requests'] = total
+    eta = max([st['seconds'] for st in result['stages'].values()] or [0.0])  # (stages run concurrently)
+    if rate_limit:
+        eta = max(eta, total / rate_limit)
+    result['eta_seconds'] = round(eta, 1)
+    return result
+
+def _fmt_seconds(s):
+    s = int(round(s))
+    return f'{s // 3600}:{s % 3600 // 60:02d}:{s % 60:02d}'
+
+def format_plan(p, title='work plan'):
+    lines = [
+        f'{title}: {p["total_requests"]} requests, ETA {_fmt_seconds(p["eta_seconds"])} '
+        f'(latency {p["latency"] * 1000:.0f}ms, rate limit {p["rate_limit"] or "none"}, {p["probes"]} probes)',
+        f'  {"stage":9s} {"records":>9s} {"requests":>9s} {"workers":>8s} {"time":>9s}',
+    ]
+    for name, st in p['stages'].items():
+        lines.append(
+            f'  {name:9s} {st["records"]:9d} {st["requests"]:9d} {st["workers"]:8d} {_fmt_seconds(st["seconds"]):>9s}'
+        )
+    if 'payments' in p['stages']:
+        st = p['stages']['payments']
+        lines.append(f'  payments: {p["payments_batch_size"]} loans per batch, {st.get("windows", 0)} windows to '
+                     f'fetch, ~{st.get("rows_per_loan_window", 0)} rows per loan and window')
+    return '\n'.join(lines)
+
+
+# live ETA
+#=========
+class EtaReporter():
+    '''Re-estimates the ETA every `interval` seconds from the requests made so far (see
+    `metrics`) against the planned total, and prints it to stderr.'''
+    def __init__(self, interval=15, out=None):
+        self.interval, self.out = interval, out or sys.stderr
+        self.planned = 0
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start = self._base = None
+
+    def add_planned(self, n):
+        with self.lock:
+            self.planned += n
+
+    def _done(self):
+        return sum(r['count'] for r in metrics.summary()['requests'].values())
+
+    def status(self):
+        '''(requests done, planned, ETA seconds or None).'''
+        done = self._done() - self._base
+        elapsed = time.monotonic() - self._start
+        with self.lock:
+            planned = max(self.planned, done)
+        eta = (planned - done) * elapsed / done if done else None
+        return done, planned, eta
+
+    def report(self):
+        done, planned, eta = self.status()
+        msg = f'progress: {done}/{planned} requests, ETA {_fmt_seconds(eta) if eta is not None else "?"}'
+        logging.info(msg)
+        print(msg, file=self.out, flush=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def start(self):
+        self._start, self._base = time.monotonic(), self._done()
+        self._thread = threading.Thread(target=self._run, name='eta', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+def main():
+    parser = argparse.ArgumentParser(description='Size a pull with limit=1 probes and print the work plan.')
+    parser.add_argument('--stages', nargs='+', choices=['loans', 'notes', 'listings', 'payments'],
+                        default=['loans', 'notes', 'listings', 'payments'])
+    parser.add_argument('--rate-limit', type=float, default=None, help='max API requests per second')
+    parser.add_argument('--samples', type=int, default=4, help='payments (batch, window) pairs to probe')
+    parser.add_argument('--data-dir', default=None, help='where the last loans pull is (default: PROSPER_DATA_DIR, else ./data)')
+    parser.add_argument('--profile', default=None, help='credential profile (see creds)')
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s:%(levelname)s:%(message)s', level=logging.WARNING)
+    from . import prosper_api_tools, datasets
+    tokens = prosper_api_tools.account_tokens(args.profile)
+    p = plan(tokens, args.stages, args.data_dir or datasets.DATA_DIR, args.rate_limit, args.samples)
+    print(format_plan(p))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+'''
+Shared fixtures: a `mock_prosper_server` on a free local port, serving a small synthetic
+portfolio, with `prosper_api_tools` pointed at it and the token and response caches off.
+'''
+
+import pytest
+from prosper_etl import mock_prosper_server, prosper_api_tools, datasets, http_cache, token_cache, payment_windows
+
+N_LOANS = 100
+FAKE_CREDS = {'P2P_USER': 'eA==', 'P2P_PASSWORD': 'eA==', 'P2P_ID': 'eA==', 'P2P_SECRET': 'eA=='}
+
+
+@pytest.fixture(scope='session')
+def mock_api(tmp_path_factory):
+    '''The running mock server's `MockState` (its `portfolio` is what the API serves).'''
+    state = mock_prosper_server.MockState(mock_prosper_server.make_portfolio(N_LOANS, seed=0))
+    server, base_url = mock_prosper_server.start_server(state)
+    mp = pytest.MonkeyPatch()
+    for k, v in FAKE_CREDS.items():
+        mp.setenv(k, v)
+    mp.setattr(prosper_api_tools, 'BASE_URL', base_url)
+    mp.setattr(token_cache, 'CACHE_DIR', 'off')
+    mp.setattr(http_cache, 'CACHE_DIR', 'off')
+    mp.setattr(payment_windows, 'CACHE_DIR', str(tmp_path_factory.mktemp('payment_windows')))
+    mp.setattr(datasets, 'LOG_DIR', str(tmp_path_factory.mktemp('logs')))
+    yield state
+    mp.undo()
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture(scope='session')
+def tokens(mock_api):
+    return prosper_api_tools.initiate_conn().json()
+
+@pytest.fixture(scope='session')
+def pulled(mock_api, tmp_path_factory):
+    '''Data directory holding a full pull of the mock API's loans, notes and payments.'''
+    from prosper_etl import run_all_ETL
+    data_dir = str(tmp_path_factory.mktemp('data'))
+    results = run_all_ETL.run_account(None, ('loans', 'notes', 'payments'), data_dir=data_dir, plan=False, reconcile=False)
+    assert not any(results.values()), results
+    return data_dir
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+from prosper_etl import balance_panel, datasets
+
+
+def test_month_index_and_label():
+    months, _ = balance_panel._month_index(pd.Series(['2020-01-15', '2019-12-31', None, '2020-01-01']))
+    assert months.tolist() == [2020 * 12, 2019 * 12 + 11, -1, 2020 * 12]
+    assert balance_panel._month_label(months[[0, 1]]).tolist() == [202001, 201912]
+    m = np.arange(2018 * 12, 2022 * 12)
+    labels = balance_panel._month_label(m)
+    assert (labels // 100 * 12 + labels % 100 - 1 == m).all()
+
+def _frames():
+    payments = pd.DataFrame({
+        'loan_number': [1, 1, 1, 1],
+        'transaction_id': [10, 11, 12, 13],
+        'transaction_effective_date': ['2019-12-20', '2020-02-20', '2020-02-25', '2020-03-20'],
+        'interest_amount': [100, 90, 5, 80],
+        'resulting_principal_balance': [8000, 6000, 5000, 0],
+        'post_days_past_due': [0, 31, 0, 0],
+    })
+    notes = pd.DataFrame({
+        'loan_note_id': ['1-1', '2-1'],
+        'loan_number': [1, 2],
+        'origination_date': ['2019-11-20', '2019-10-05'],
+        'note_ownership_amount': [2500, 5000],
+        'amount_borrowed': [10000, 10000],
+    })
+    return payments, notes
+
+def test_build_panel_months():
+    payments, notes = _frames()
+    panel = pd.DataFrame(balance_panel.build_panel(payments, notes, end_month='2020-04'))
+    assert list(panel.columns) == balance_panel.PANEL_COLUMNS
+    paid = panel[panel['loan_note_id'] == '1-1']
+    # from origination to the month the loan is paid down; January carries December forward
+    assert paid['month'].tolist() == [201911, 201912, 202001, 202002, 202003]
+    assert paid['principal_balance_cents'].tolist() == [2500, 2000, 2000, 1250, 0]
+    assert paid['interest_received_cents'].tolist() == [0, 25, 0, 24, 20]
+    assert paid['days_past_due'].tolist() == [0, 0, 0, 0, 0]
+    # no payments: every month up to the end month, at the amount borrowed
+    unpaid = panel[panel['loan_note_id'] == '2-1']
+    assert unpaid['month'].tolist() == [201910, 201911, 201912, 202001, 202002, 202003, 202004]
+    assert (unpaid['principal_balance_cents'] == 5000).all()
+
+def test_build_panel_defaults_to_last_payment_month():
+    payments, notes = _frames()
+    panel = balance_panel.build_panel(payments, notes)
+    assert panel['month'][panel['loan_note_id'] == '2-1'].max() == 202003
+
+def test_panel_from_mock_pull(pulled, tmp_path):
+    panel = balance_panel.build_from_files(pulled)
+    fpath = str(tmp_path / 'panel.npz')
+    balance_panel.write_panel(panel, fpath)
+    df = balance_panel.read_panel(fpath)
+    assert len(df) == len(panel['month'])
+    notes = datasets.read_all('notes', columns=['loan_note_id', 'origination_date'], latest=True, data_dir=pulled)
+    assert set(df['loan_note_id']) == set(notes['loan_note_id'])
+    # each note's months run without a gap from its origination month
+    index = df['month'] // 100 * 12 + df['month'] % 100 - 1
+    first = dict(zip(notes['loan_note_id'], notes['origination_date'].str[:7].str.replace('-', '').astype(int)))
+    for note_id, months in index.groupby(df['loan_note_id']):
+        assert (np.diff(months.to_numpy()) == 1).all()
+        assert df['month'][months.index[0]] == first[note_id]
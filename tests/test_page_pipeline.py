@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+from prosper_etl import page_pipeline, prosper_api_tools, column_schemas, metrics
+
+
+def _note_ids(state):
+    '''loan_note_ids in the order the notes endpoint pages them.'''
+    notes = sorted(state.portfolio['notes'], key=lambda r: r.get('origination_date') or '')
+    return [n['loan_note_id'] for n in notes]
+
+def _pull(tokens, fpath, page_size, limit=25, **kwargs):
+    '''Pull the notes through the pipeline, with the API serving `page_size(offset, limit)` rows
+    per page. Returns the loan_note_ids of the pages, in the order `on_page` saw them.'''
+    seen = []
+
+    def fetch(offset, lim):
+        return prosper_api_tools.get_notes_page(tokens, offset, page_size(offset, lim))
+
+    def on_page(response):
+        seen.extend(r['loan_note_id'] for r in response.json()['result'])
+
+    metrics.reset()
+    page_pipeline.pipelined_pages(
+        fetch, fpath, column_schemas.notes_columns, limit=limit, fetch_workers=4, on_page=on_page, **kwargs
+    )
+    return seen
+
+def _written(fpath):
+    return pd.read_csv(fpath, compression='bz2', dtype=str)['loan_note_id'].tolist()
+
+@pytest.mark.parametrize('compress_processes', [0, 1])
+def test_full_pages_are_pipelined(mock_api, tokens, tmp_path, compress_processes):
+    fpath = str(tmp_path / 'mynotes.bz2')
+    seen = _pull(tokens, fpath, lambda offset, lim: lim, compress_processes=compress_processes)
+    assert _written(fpath) == _note_ids(mock_api)
+    assert seen == _note_ids(mock_api)
+    assert metrics.summary()['counters'].get('pipeline_fallbacks', 0) == 0
+
+def test_capped_page_size_falls_back_to_sequential(mock_api, tokens, tmp_path):
+    # the API serves at most 20 rows a page, whatever the limit
+    fpath = str(tmp_path / 'mynotes.bz2')
+    seen = _pull(tokens, fpath, lambda offset, lim: min(lim, 20))
+    assert _written(fpath) == _note_ids(mock_api)
+    assert seen == _note_ids(mock_api)
+    assert metrics.summary()['counters']['pipeline_fallbacks'] == 1
+
+def test_short_page_within_a_round(mock_api, tokens, tmp_path):
+    # one short page in the middle: the pages fetched after it are dropped and re-paged
+    fpath = str(tmp_path / 'mynotes.bz2')
+    seen = _pull(tokens, fpath, lambda offset, lim: 10 if offset == 50 else lim)
+    assert _written(fpath) == _note_ids(mock_api)
+    assert seen == _note_ids(mock_api)
+    assert metrics.summary()['counters']['pipeline_fallbacks'] == 1
@@ -0,0 +1,51 @@
+import pandas as pd
+from prosper_etl import partitions, prosper_api_tools, column_schemas
+
+
+def _notes(state):
+    return pd.DataFrame(state.portfolio['notes'], columns=column_schemas.notes_columns)
+
+def _write(df, data_dir, chunks=1):
+    w = partitions.MonthWriter('notes', str(data_dir))
+    for i in range(chunks):
+        w.write(df.iloc[i::chunks])
+    return w.commit()
+
+def _manifest(data_dir):
+    return partitions.read_manifest(partitions.partition_dir('notes', str(data_dir)))
+
+def test_pull_into_partitions(mock_api, tokens, tmp_path):
+    with partitions.partition_target('notes', str(tmp_path)) as target:
+        prosper_api_tools.get_many_notes(target, tokens, column_schema=column_schemas.notes_columns, workers=4)
+    manifest = _manifest(tmp_path)
+    assert sum(m['rows'] for m in manifest.values()) == len(mock_api.portfolio['notes'])
+    # the same rows, in another order and other pages, hash the same
+    result = _write(_notes(mock_api).sample(frac=1, random_state=0), tmp_path, chunks=3)
+    assert result == {'written': [], 'unchanged': sorted(manifest), 'deleted': []}
+    assert _manifest(tmp_path) == manifest
+
+def test_row_order_does_not_change_hashes(mock_api, tmp_path):
+    notes = _notes(mock_api)
+    first = _write(notes, tmp_path)
+    manifest = _manifest(tmp_path)
+    assert first['written'] == sorted(manifest)
+    result = _write(notes.iloc[::-1], tmp_path, chunks=4)
+    assert result['written'] == [] and result['unchanged'] == sorted(manifest)
+    assert _manifest(tmp_path) == manifest
+
+def test_only_changed_months_are_rewritten(mock_api, tmp_path):
+    notes = _notes(mock_api)
+    _write(notes, tmp_path)
+    manifest = _manifest(tmp_path)
+    changed = notes.copy()
+    changed.loc[0, 'note_status_description'] = 'CHARGEOFF'
+    month = changed.loc[0, 'origination_date'][:7]
+    dropped = sorted(manifest)[-1]
+    if dropped == month:
+        dropped = sorted(manifest)[0]
+    changed = changed[changed['origination_date'].str[:7] != dropped]
+    result = _write(changed, tmp_path)
+    assert result['written'] == [month]
+    assert result['deleted'] == [dropped]
+    assert sorted(result['unchanged']) == sorted(set(manifest) - {month, dropped})
+    assert _manifest(tmp_path)[month]['sha1'] != manifest[month]['sha1']
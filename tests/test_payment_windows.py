@@ -0,0 +1,91 @@
+import datetime as dt
+import pandas as pd
+from prosper_etl import payment_windows, page_pipeline, prosper_api_tools, column_schemas, metrics
+
+LIMIT = 5
+
+
+def _window_records(state, loans, start):
+    end = str(start + dt.timedelta(days=payment_windows.WINDOW_DAYS))
+    records = [p for ln in loans for p in state.payments_by_loan[ln] if str(start) <= p['transaction_effective_date'] < end]
+    return sorted(records, key=lambda p: (p['transaction_effective_date'], p['transaction_id']))
+
+def _window(state):
+    '''(loan numbers, window start, the window's payments in API order) of a closed window.'''
+    loans = sorted(state.payments_by_loan)[:25]
+    start = dt.date.today() - dt.timedelta(days=payment_windows.WINDOW_DAYS + payment_windows.SETTLE_DAYS + 180)
+    records = _window_records(state, loans, start)
+    assert len(records) > 4 * LIMIT
+    return ','.join(loans), start, records
+
+def _fetch(tokens, loans, start, page_size=lambda offset, lim: lim):
+    return lambda offset, lim: prosper_api_tools.get_payment_page(
+        tokens, offset, loan_number=loans, limit=page_size(offset, lim), transaction_effective_date=str(start)
+    )
+
+def _ids(records):
+    return [r['transaction_id'] for r in records]
+
+def test_records_need_contiguous_pages(mock_api, tokens):
+    loans, start, expected = _window(mock_api)
+    rec = payment_windows.Recorder(_fetch(tokens, loans, start))
+    for offset in range(0, len(expected), LIMIT):
+        if offset != 2 * LIMIT:
+            rec(offset, LIMIT)
+    assert rec.records() is None  # (a gap)
+    rec(2 * LIMIT, LIMIT)
+    assert _ids(rec.records()) == _ids(expected)
+    del rec.pages[max(rec.pages)]
+    assert rec.records() is None  # (the last page is missing)
+
+def test_records_skip_pages_after_a_short_page(mock_api, tokens):
+    # a short page at offset LIMIT: the page fetched at 2 * LIMIT overlaps the re-paged ones
+    loans, start, expected = _window(mock_api)
+    rec = payment_windows.Recorder(_fetch(tokens, loans, start, lambda offset, lim: 2 if offset == LIMIT else lim))
+    rec(0, LIMIT)
+    rec(LIMIT, LIMIT)
+    rec(2 * LIMIT, LIMIT)
+    for offset in range(LIMIT + 2, len(expected), LIMIT):
+        rec(offset, LIMIT)
+    assert 2 * LIMIT in rec.pages
+    assert _ids(rec.records()) == _ids(expected)
+
+def test_pipelined_window_is_recorded_in_order(mock_api, tokens, tmp_path):
+    loans, start, expected = _window(mock_api)
+    rec = payment_windows.Recorder(_fetch(tokens, loans, start, lambda offset, lim: 2 if offset == 2 * LIMIT else lim))
+    fpath = str(tmp_path / 'payments.bz2')
+    page_pipeline.pipelined_pages(
+        rec, fpath, column_schemas.payments_columns, limit=LIMIT, fetch_workers=4, compress_processes=0
+    )
+    assert _ids(rec.records()) == _ids(expected)
+    written = pd.read_csv(fpath, compression='bz2')['transaction_id'].tolist()
+    assert written == _ids(expected)
+
+def test_closed_windows_are_served_from_the_cache(mock_api, tokens, tmp_path, monkeypatch):
+    monkeypatch.setattr(payment_windows, 'CACHE_DIR', str(tmp_path / 'cache'))
+    loans, start, _ = _window(mock_api)
+    first_date = start - dt.timedelta(days=3 * payment_windows.WINDOW_DAYS)
+    windows = [d.date() for d in pd.date_range(first_date, dt.date.today(), freq='90D')]
+    closed = [d for d in windows if payment_windows.is_closed(d)]
+    assert len(closed) >= 4
+
+    def pull(name):
+        fpath = str(tmp_path / name)
+        served = mock_api.requests_served
+        prosper_api_tools.get_many_payments(
+            fpath, tokens, loan_number=loans, limit=LIMIT, column_schema=column_schemas.payments_columns,
+            transaction_effective_date=str(first_date), workers=4
+        )
+        return fpath, mock_api.requests_served - served
+
+    def pages(starts):
+        return sum(max(1, -(-len(_window_records(mock_api, loans.split(','), d)) // LIMIT)) for d in starts)
+
+    first, requests = pull('first.bz2')
+    assert requests == pages(windows)
+    metrics.reset()
+    second, requests = pull('second.bz2')
+    # only the windows still open are requested again
+    assert metrics.summary()['counters']['payment_windows_cached'] == len(closed)
+    assert requests == pages(set(windows) - set(closed))
+    pd.testing.assert_frame_equal(pd.read_csv(first, compression='bz2'), pd.read_csv(second, compression='bz2'))
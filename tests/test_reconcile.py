@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from prosper_etl import reconcile, datasets
+
+
+def _loans(data_dir):
+    return datasets.read_all(
+        'loans', columns=['loan_number'] + [l for l, _ in reconcile.FIELDS.values()], cents=True, latest=True,
+        data_dir=data_dir
+    )
+
+def _notes(data_dir):
+    return datasets.read_all(
+        'notes', columns=['loan_note_id', 'loan_number', 'note_ownership_amount', 'amount_borrowed']
+                         + [n for _, n in reconcile.FIELDS.values()],
+        cents=True, latest=True, data_dir=data_dir
+    )
+
+def test_mock_pull_reconciles(pulled):
+    mismatches = reconcile.reconcile_files(pulled)
+    assert list(mismatches.columns) == reconcile.REPORT_COLUMNS
+    assert len(mismatches) == 0
+
+@pytest.mark.parametrize('tolerance,shift,flagged', [(1, 1, False), (1, 2, True), (0, 1, True), (5, -5, False)])
+def test_loan_tolerance(pulled, tolerance, shift, flagged):
+    sums = reconcile.payment_sums(pulled)
+    loans = _loans(pulled)
+    ln = sums.index[0]
+    loans.loc[loans['loan_number'] == ln, 'interest_paid'] = sums.loc[ln, 'interest_amount'] + shift
+    mismatches = reconcile.reconcile(sums, loans=loans, tolerance_cents=tolerance)
+    if not flagged:
+        assert len(mismatches) == 0
+        return
+    assert len(mismatches) == 1
+    row = mismatches.iloc[0]
+    assert (row['check'], row['loan_number'], row['field']) == ('loans', ln, 'interest_paid')
+    assert (row['expected_cents'], row['diff_cents']) == (sums.loc[ln, 'interest_amount'], shift)
+
+def test_note_tolerance_allows_a_cent_per_payment(pulled):
+    sums = reconcile.payment_sums(pulled)
+    notes = _notes(pulled)
+    i = notes.index[notes['loan_number'].isin(sums.index[sums['payments'] > 1])][0]
+    ln = notes.loc[i, 'loan_number']
+    share = notes.loc[i, 'note_ownership_amount'] / notes.loc[i, 'amount_borrowed']
+    expected = int(np.rint(sums.loc[ln, 'principal_amount'] * share))
+    allowance = 1 + int(sums.loc[ln, 'payments'])
+
+    notes.loc[i, 'principal_paid_pro_rata_share'] = expected + allowance
+    assert len(reconcile.reconcile(sums, notes=notes)) == 0
+    notes.loc[i, 'principal_paid_pro_rata_share'] = expected - allowance - 1
+    mismatches = reconcile.reconcile(sums, notes=notes)
+    assert len(mismatches) == 1
+    row = mismatches.iloc[0]
+    assert (row['check'], row['loan_note_id'], row['field']) == ('notes', notes.loc[i, 'loan_note_id'], 'principal_paid_pro_rata_share')
+    assert row['diff_cents'] == -allowance - 1
+
+def test_missing_payments_are_flagged(pulled):
+    sums = reconcile.payment_sums(pulled)
+    loans = _loans(pulled)
+    paid = loans[loans['principal_paid'] > 1]['loan_number'].iloc[0]
+    mismatches = reconcile.reconcile(sums.drop(index=paid), loans=loans)
+    assert set(mismatches['loan_number']) == {paid}
+    assert (mismatches['expected_cents'] == 0).all()
@@ -0,0 +1,55 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from prosper_etl import row_hashes, prosper_api_tools, column_schemas
+
+
+def _pull(tokens, fpath, store=None, workers=None):
+    prosper_api_tools.get_many_notes(
+        fpath, tokens, column_schema=column_schemas.notes_columns, workers=workers, row_filter=store
+    )
+
+def _store(fpath):
+    return row_hashes.RowHashStore(fpath, 'loan_note_id', column_schemas.notes_columns)
+
+def _rows(fpath):
+    return pd.read_csv(fpath, compression='bz2', dtype=str)
+
+def test_hash_rows_canonical_values():
+    h = lambda values: row_hashes.hash_rows(pd.DataFrame({'a': values}))
+    assert h(['0012'])[0] != h(['12'])[0]
+    assert h([5])[0] == h([5.0])[0]
+    assert (h([1, None]) == h([1.0, np.nan])).all()
+    assert h([True])[0] != h([1])[0]
+    # column order doesn't matter
+    df = pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']})
+    assert (row_hashes.hash_rows(df) == row_hashes.hash_rows(df[['b', 'a']])).all()
+
+@pytest.mark.parametrize('workers', [None, 4])
+def test_incremental_pull_skips_unchanged_rows(mock_api, tokens, tmp_path, monkeypatch, workers):
+    fpath = str(tmp_path / 'mynotes.bz2')
+    n = len(mock_api.portfolio['notes'])
+    _pull(tokens, fpath, workers=workers)
+    before = _rows(fpath)
+    assert len(before) == n
+
+    # no store yet: it's built from the full pull, and nothing is appended
+    store = _store(fpath)
+    _pull(tokens, fpath, store, workers)
+    assert store.counts == {'new': 0, 'changed': 0, 'unchanged': n}
+    pd.testing.assert_frame_equal(_rows(fpath), before)
+    store.save()
+    assert os.path.exists(fpath + row_hashes.STORE_SUFFIX)
+
+    # one changed note: only it is appended, from the saved store
+    note = mock_api.portfolio['notes'][5]
+    monkeypatch.setitem(note, 'note_status_description', 'CHARGEOFF')
+    store = _store(fpath)
+    assert len(store) == n
+    _pull(tokens, fpath, store, workers)
+    assert store.counts == {'new': 0, 'changed': 1, 'unchanged': n - 1}
+    after = _rows(fpath)
+    assert len(after) == n + 1
+    assert after.iloc[-1]['loan_note_id'] == note['loan_note_id']
+    assert after.iloc[-1]['note_status_description'] == 'CHARGEOFF'